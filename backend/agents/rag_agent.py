@@ -1,10 +1,15 @@
 import os
+import asyncio
+import hashlib
 import logging
 import time
 from typing import List
 from dotenv import load_dotenv
-from openai import OpenAI
 from core.s3_client import S3FileManager
+from core.llm import RAG_LLM_PROVIDER, LLM_PROVIDER
+from core.llm_cache import get_cached_provider
+from core.embeddings import get_embeddings
+from core.vector_store import load_chunk_index
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -13,7 +18,10 @@ def load_environment():
     dotenv_path = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), '.env')
     load_dotenv(dotenv_path)
 
-    required_vars = ["AWS_BUCKET_NAME", "OPENAI_API_KEY"]
+    required_vars = ["AWS_BUCKET_NAME"]
+    # The fake provider answers and embeds offline
+    if LLM_PROVIDER != "fake":
+        required_vars.append("OPENAI_API_KEY")
     missing_vars = [var for var in required_vars if not os.getenv(var)]
     if missing_vars:
         logger.error(f"Missing required environment variables: {', '.join(missing_vars)}")
@@ -24,44 +32,69 @@ def load_environment():
         "openai_api_key": os.getenv("OPENAI_API_KEY")
     }
 
+def cite_pages(pages) -> str:
+    """' p. 3' / ' pp. 3-5' suffix for a chunk citation; empty when pages are unknown."""
+    if not pages:
+        return ""
+    return f" p. {pages[0]}" if len(pages) == 1 else f" pp. {pages[0]}-{pages[-1]}"
+
 class RAGAgent:
     def __init__(self):
         self.config = load_environment()
-        self.openai_client = OpenAI(api_key=self.config['openai_api_key'])
+        self.llm = get_cached_provider(RAG_LLM_PROVIDER)
         self.s3_client = S3FileManager(self.config['aws_bucket'])
 
     async def fetch_documents_from_s3(self, query: str) -> List[str]:
+        # S3 reads and PDF parsing block; keep them off the event loop
+        return await asyncio.to_thread(self._fetch_documents_from_s3, query)
+
+    def _fetch_documents_from_s3(self, query: str) -> List[str]:
         logger.info(f"Fetching documents for query: {query}")
-        files = self.s3_client.list_files()
-        if not files:
+        objects = self.s3_client.list_objects()
+        if not objects:
             logger.warning("No files found in S3")
             return []
 
         # Only pick PDFs
-        pdf_files = [f for f in files if f.endswith(".pdf")]
+        pdf_objects = [o for o in objects if o["key"].endswith(".pdf")]
 
         # Extract cancer type
         detected_cancer = next((ct for ct in ["brain", "blood", "skin", "lung", "breast"] if ct in query.lower()), None)
         
         # Filter for relevant ones or fallback to first 3
-        relevant_files = [f for f in pdf_files if detected_cancer and detected_cancer in f.lower()]
-        if not relevant_files:
+        relevant_objects = [o for o in pdf_objects if detected_cancer and detected_cancer in o["key"].lower()]
+        if not relevant_objects:
             logger.warning("No cancer-type specific files found, using fallback")
-            relevant_files = pdf_files
+            relevant_objects = pdf_objects
 
         documents = []
-        for file in relevant_files[:3]:  # limit to top 3
+        for obj in relevant_objects[:3]:  # limit to top 3
             try:
-                from features.mistral_parser import pdf_mistralocr_converter
-                pdf_content = self.s3_client.load_s3_pdf(file)
-                _, markdown = pdf_mistralocr_converter(pdf_content, "research-papers", self.s3_client)
-                documents.append(markdown)
+                documents.append(self.load_markdown(obj))
             except Exception as e:
-                logger.exception(f"Error processing PDF {file}")
+                logger.exception(f"Error processing PDF {obj['key']}")
 
         logger.info(f"Returning {len(documents)} documents for query")
         return documents
 
+    async def retrieve_chunks(self, query: str, k: int = 8) -> List[str]:
+        """Top-k chunks from the ingested corpus index; empty if no index has been built."""
+        return await asyncio.to_thread(self._retrieve_chunks, query, k)
+
+    def _retrieve_chunks(self, query: str, k: int) -> List[str]:
+        index = load_chunk_index()
+        if index is None or not len(index):
+            return []
+        query_vec = get_embeddings([query])[0]
+        hits = index.search(query_vec, k)
+        logger.info(f"Retrieved {len(hits)} chunks from index of {len(index)}")
+        return [f"[{h['key']}{cite_pages(h.get('pages'))}]\n{h['text']}" for h in hits]
+
+    def load_markdown(self, obj: dict) -> str:
+        """Parsed markdown for an S3 object, served from the doc cache while its ETag is unchanged."""
+        from features.mistral_parser import load_parsed_pdf
+        return load_parsed_pdf(self.s3_client, obj)["markdown"]
+
     async def generate_response(self, query: str, documents: List[str]) -> str:
         logger.info(f"Generating response from {len(documents)} documents")
         if not documents:
@@ -76,19 +109,20 @@ class RAGAgent:
         """
 
         start = time.time()
-        response = self.openai_client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.7,
-            max_tokens=800
-        )
-        logger.info(f"OpenAI response took {time.time() - start:.2f}s")
+        # The prompt is mostly retrieved context: match answers on the question alone, among answers over the same documents
+        scope = hashlib.sha256(context.encode("utf-8")).hexdigest()
+        answer = await self.llm.generate(prompt, temperature=0.7, max_tokens=800, semantic=True,
+                                         match_text=query, scope=scope)
+        logger.info(f"{self.llm.label} response took {time.time() - start:.2f}s")
 
-        return response.choices[0].message.content
+        return answer
 
 async def get_rag_response(query: str) -> str:
-    agent = RAGAgent()
-    documents = await agent.fetch_documents_from_s3(query)
+    """RAG answer for ``query``; runs on the caller's event loop with blocking I/O in worker threads."""
+    agent = await asyncio.to_thread(RAGAgent)
+    documents = await agent.retrieve_chunks(query)
+    if not documents:
+        documents = await agent.fetch_documents_from_s3(query)
     if not documents:
         return "No documents found for the query."
     return await agent.generate_response(query, documents)
@@ -96,11 +96,19 @@
 
 
 
-import snowflake.connector
+from snowflake.connector.errors import NotSupportedError
 import os
+import re
+import asyncio
+import pandas as pd
 import logging
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
 from dotenv import load_dotenv
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple
+from core.snowflake_pool import SnowflakeConnectionPool, is_connection_error
+from core.query_cache import QueryResultCache, default_query_cache
+from core.epi_store import STAT_TABLES, EPI_STORE_DIR, EpiStore
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -111,9 +119,203 @@ os.environ["SF_OCSP_FAIL_OPEN"] = "true"
 os.environ["SF_OCSP_RESPONSE_CACHE_SERVER_ENABLED"] = "false"
 os.environ["SF_OCSP_TESTMODE"] = "true"
 
+# === Query Builder ===
+
+# Query keyword -> ILIKE patterns matched against SITE / CANCERTYPE
+SITE_KEYWORDS = {
+    "brain": ["%brain%"],
+    "nervous system": ["%nervous system%"],
+    "lung": ["%lung%"],
+    "breast": ["%breast%"],
+    "prostate": ["%prostate%"],
+    "colorectal": ["%colon%"],
+    "colon": ["%colon%"],
+    "rectal": ["%rect%"],
+    "kidney": ["%kidney%"],
+    "renal": ["%kidney%"],
+    "liver": ["%liver%"],
+    "bladder": ["%bladder%"],
+    "pancrea": ["%pancrea%"],
+    "ovar": ["%ovar%"],
+    "cervi": ["%cervi%"],
+    "uter": ["%uter%"],
+    "thyroid": ["%thyroid%"],
+    "stomach": ["%stomach%"],
+    "esophag": ["%esophag%"],
+    "melanoma": ["%melanoma%"],
+    "skin": ["%melanoma%", "%skin%"],
+    "bone": ["%bone%"],
+    "soft tissue": ["%soft tissue%"],
+    "leukemia": ["%leukemia%", "%lymphocytic%", "%myeloid%"],
+    "leukaemia": ["%leukemia%", "%lymphocytic%", "%myeloid%"],
+    "lymphoma": ["%lymphoma%"],
+    "myeloma": ["%myeloma%"],
+    "blood": ["%leukemia%", "%lymphoma%", "%myeloma%", "%lymphocytic%", "%myeloid%"],
+}
+# Word stems that take any ending ("ovarian", "uterine"); other keywords match as whole words, plural allowed
+_SITE_STEMS = {"pancrea", "ovar", "cervi", "uter", "esophag"}
+# Matched on word boundaries so "delivery" isn't liver and "computer" isn't uterine
+_SITE_PATTERNS = [
+    (re.compile(r"\b" + re.escape(k) + (r"\w*" if k in _SITE_STEMS else r"s?\b")), patterns)
+    for k, patterns in SITE_KEYWORDS.items()
+]
+
+US_AREAS = [
+    "Alabama", "Alaska", "Arizona", "Arkansas", "California", "Colorado", "Connecticut", "Delaware",
+    "District of Columbia", "Florida", "Georgia", "Hawaii", "Idaho", "Illinois", "Indiana", "Iowa",
+    "Kansas", "Kentucky", "Louisiana", "Maine", "Maryland", "Massachusetts", "Michigan", "Minnesota",
+    "Mississippi", "Missouri", "Montana", "Nebraska", "Nevada", "New Hampshire", "New Jersey",
+    "New Mexico", "New York", "North Carolina", "North Dakota", "Ohio", "Oklahoma", "Oregon",
+    "Pennsylvania", "Puerto Rico", "Rhode Island", "South Carolina", "South Dakota", "Tennessee",
+    "Texas", "Utah", "Vermont", "Virginia", "Washington", "West Virginia", "Wisconsin", "Wyoming",
+]
+# Longest names first so "West Virginia" wins over "Virginia"
+_AREA_PATTERN = re.compile(r"\b(" + "|".join(sorted(map(re.escape, US_AREAS), key=len, reverse=True)) + r")\b", re.IGNORECASE)
+_YEAR_PATTERN = re.compile(r"\b(19[5-9]\d|20\d{2})\b")
+_FEMALE_PATTERN = re.compile(r"\b(female|females|women|woman|girls?)\b", re.IGNORECASE)
+_MALE_PATTERN = re.compile(r"\b(male|males|men|man|boys?)\b", re.IGNORECASE)
+
+# Aggregated result sets are capped so an unfiltered query can't pull whole tables
+MAX_AGGREGATE_ROWS = int(os.getenv("SNOWFLAKE_MAX_AGGREGATE_ROWS", "500"))
+
+
+@dataclass
+class QueryFilters:
+    site_patterns: List[str] = field(default_factory=list)
+    area: Optional[str] = None
+    sex: Optional[str] = None
+    year_from: Optional[int] = None
+    year_to: Optional[int] = None
+
+
+def parse_query_filters(query: str) -> QueryFilters:
+    """Pull cancer site, US area, sex and year range out of a free-text research query."""
+    text = query.lower()
+    filters = QueryFilters()
+
+    for keyword, patterns in _SITE_PATTERNS:
+        if keyword.search(text):
+            filters.site_patterns.extend(p for p in patterns if p not in filters.site_patterns)
+
+    area = _AREA_PATTERN.search(query)
+    if area:
+        filters.area = next(a for a in US_AREAS if a.lower() == area.group(1).lower())
+
+    female, male = _FEMALE_PATTERN.search(query), _MALE_PATTERN.search(query)
+    if female and not male:
+        filters.sex = "Female"
+    elif male and not female:
+        filters.sex = "Male"
+
+    years = sorted(int(y) for y in _YEAR_PATTERN.findall(query))
+    if len(years) >= 2:
+        filters.year_from, filters.year_to = years[0], years[-1]
+    elif years:
+        if re.search(r"\b(since|after|from)\s+" + str(years[0]), text):
+            filters.year_from = years[0]
+        elif re.search(r"\b(before|until|through)\s+" + str(years[0]), text):
+            filters.year_to = years[0]
+        else:
+            filters.year_from = filters.year_to = years[0]
+    return filters
+
+
+# YEAR is VARCHAR and may be a span such as '2017-2021'; ranges compare on its first year
+_YEAR_START = "TRY_TO_NUMBER(LEFT(YEAR, 4))"
+# RLIKE matches the whole string
+_SINGLE_YEAR = "RLIKE(YEAR, '[0-9]{4}')"
+
+
+def _where(filters: QueryFilters, site_column: Optional[str] = "SITE", area: bool = False,
+           sex: bool = False, base: Optional[List[str]] = None) -> Tuple[str, Dict[str, Any]]:
+    clauses, params = list(base or []), {}
+    if site_column and filters.site_patterns:
+        ors = []
+        for i, pattern in enumerate(filters.site_patterns):
+            params[f"site_{i}"] = pattern
+            ors.append(f"{site_column} ILIKE %(site_{i})s")
+        clauses.append("(" + " OR ".join(ors) + ")")
+    if area and filters.area:
+        params["area"] = filters.area
+        clauses.append("AREA = %(area)s")
+    if sex and filters.sex:
+        # Keep combined-sex rows too; some tables only publish 'Male and Female'
+        params["sex"], params["sex_all"] = filters.sex, "Male and Female"
+        clauses.append("SEX IN (%(sex)s, %(sex_all)s)")
+    if filters.year_from is not None:
+        params["year_from"] = filters.year_from
+        clauses.append(f"{_YEAR_START} >= %(year_from)s")
+    if filters.year_to is not None:
+        params["year_to"] = filters.year_to
+        clauses.append(f"{_YEAR_START} <= %(year_to)s")
+    return ("WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+
+def _rate_query(table: str, dimensions: List[str], count_column: str, where: str) -> str:
+    """Cases, population, rate per 100k and year-over-year % change of the rate, grouped in Snowflake.
+
+    The change is only computed between single-year rows, in numeric year
+    order; span rows ('2016-2020') get no YOY_CHANGE_PCT.
+    """
+    dims = ", ".join(dimensions)
+    partition = ", ".join([d for d in dimensions if d != "YEAR"] + [_SINGLE_YEAR])
+    previous = f"LAG(RATE_PER_100K) OVER (PARTITION BY {partition} ORDER BY TRY_TO_NUMBER(YEAR))"
+    return f"""
+        WITH agg AS (
+            SELECT {dims},
+                   SUM(TRY_TO_NUMBER({count_column})) AS CASES,
+                   SUM(TRY_TO_NUMBER(POPULATION)) AS POPULATION
+            FROM {table}
+            {where}
+            GROUP BY {dims}
+            HAVING SUM(TRY_TO_NUMBER({count_column})) IS NOT NULL AND SUM(TRY_TO_NUMBER(POPULATION)) > 0
+        ),
+        rated AS (
+            SELECT agg.*, ROUND(CASES / POPULATION * 100000, 2) AS RATE_PER_100K
+            FROM agg
+        )
+        SELECT rated.*,
+               CASE WHEN {_SINGLE_YEAR}
+                    THEN ROUND((RATE_PER_100K - {previous}) / NULLIF({previous}, 0) * 100, 2)
+               END AS YOY_CHANGE_PCT
+        FROM rated
+        ORDER BY YEAR DESC, CASES DESC
+        LIMIT {MAX_AGGREGATE_ROWS}
+    """
+
+
+def build_statistics_queries(filters: QueryFilters) -> Dict[str, Tuple[str, Dict[str, Any]]]:
+    """Filtered, aggregated SQL (with bind parameters) for each statistics table."""
+    queries = {}
+    for name, spec in STAT_TABLES.items():
+        where, params = _where(filters, spec.site_column, area=spec.area, sex=spec.sex)
+        if spec.count_column:
+            sql = _rate_query(spec.table, spec.dimensions, spec.count_column, where)
+        else:
+            sql = f"""
+                SELECT SITE, MIN(YEAR) AS FIRST_YEAR, MAX(YEAR) AS LAST_YEAR, COUNT(*) AS RECORDS
+                FROM {spec.table}
+                {where}
+                GROUP BY SITE
+                ORDER BY RECORDS DESC
+                LIMIT {MAX_AGGREGATE_ROWS}
+            """
+        queries[name] = (sql, params)
+    return queries
+
+
 class SnowflakeAgent:
-    def __init__(self):
+    """Statistics from Snowflake (or the local snapshot).
+
+    Failed queries are logged and come back empty, unless ``raise_errors`` is set:
+    then they propagate, so a caller with its own fallback (the MCP) can tell
+    "no data" from "query failed".
+    """
+
+    def __init__(self, cache: Optional[QueryResultCache] = None, mode: Optional[str] = None,
+                 raise_errors: bool = False):
         load_dotenv()
+        self.raise_errors = raise_errors
 
         self.account = os.getenv('SNOWFLAKE_ACCOUNT')
         self.user = os.getenv('SNOWFLAKE_USER')
@@ -121,71 +323,135 @@ class SnowflakeAgent:
         self.warehouse = os.getenv('SNOWFLAKE_WAREHOUSE')
         self.database = os.getenv('SNOWFLAKE_DATABASE')
         self.schema = os.getenv('SNOWFLAKE_SCHEMA', 'cdc')
+        # "local" answers statistics from the Parquet snapshot written by features.epi_sync
+        self.mode = (mode or os.getenv('SNOWFLAKE_MODE', 'remote')).lower()
 
-        if not all([self.account, self.user, self.password, self.warehouse, self.database]):
+        self.store = None
+        if self.mode == "local":
+            try:
+                self.store = EpiStore(os.getenv("EPI_STORE_DIR", EPI_STORE_DIR))
+            except FileNotFoundError:
+                raise ValueError("SNOWFLAKE_MODE=local but no epidemiology store found; run python -m features.epi_sync")
+        elif not all([self.account, self.user, self.password, self.warehouse, self.database]):
             raise ValueError("Missing Snowflake credentials")
 
+        # Connections are opened on first query, not when the agent is constructed
+        pool_size = int(os.getenv("SNOWFLAKE_POOL_SIZE", "4"))
+        self.pool = SnowflakeConnectionPool(
+            {
+                "user": self.user,
+                "password": self.password,
+                "account": self.account,
+                "warehouse": self.warehouse,
+                "database": self.database,
+                "schema": self.schema,
+            },
+            max_size=pool_size,
+            validate_after=float(os.getenv("SNOWFLAKE_VALIDATE_AFTER", "300")),
+        )
+        self._executor = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix="snowflake")
+        self.cache = cache or default_query_cache()
+
+    def _run_query(self, query: str, params: Optional[Dict[str, Any]], fetch):
+        """Run ``fetch(cursor)`` on a pooled connection, retrying once on a fresh one if the session dropped."""
+        for attempt in range(2):
+            try:
+                with self.pool.connection() as conn:
+                    with conn.cursor() as cur:
+                        cur.execute(query, params)
+                        return fetch(cur)
+            except Exception as e:
+                if attempt == 0 and is_connection_error(e):
+                    logger.warning(f"Snowflake connection lost, reconnecting: {e}")
+                    continue
+                raise
+
+    def execute_query(self, query: str, params: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        def fetch(cur):
+            columns = [desc[0] for desc in cur.description]
+            return [dict(zip(columns, row)) for row in cur.fetchall()]
+
+        try:
+            return self.cache.get_or_load(query, params, "rows", lambda: self._run_query(query, params, fetch))
+        except Exception as e:
+            logger.error(f"Query failed: {e}")
+            if self.raise_errors:
+                raise
+            return []
+
+    def execute_query_df(self, query: str, params: Optional[Dict[str, Any]] = None) -> pd.DataFrame:
+        """Columnar fetch: Arrow result batches straight into one DataFrame, no per-row dicts."""
+        def fetch(cur):
+            columns = [desc[0] for desc in cur.description]
+            try:
+                batches = list(cur.fetch_pandas_batches())
+            except NotSupportedError:
+                # Non-Arrow result (e.g. SHOW/DDL): fall back to row tuples
+                return pd.DataFrame.from_records(cur.fetchall(), columns=columns)
+            if not batches:
+                return pd.DataFrame(columns=columns)
+            return pd.concat(batches, ignore_index=True) if len(batches) > 1 else batches[0]
+
         try:
-            self.conn = snowflake.connector.connect(
-                user=self.user,
-                password=self.password,
-                account=self.account,
-                warehouse=self.warehouse,
-                database=self.database,
-                schema=self.schema
-            )
-            logger.info("✅ Connected to Snowflake")
+            return self.cache.get_or_load(query, params, "df", lambda: self._run_query(query, params, fetch))
         except Exception as e:
-            logger.error(f"❌ Snowflake connection failed: {str(e)}")
-            raise
+            logger.error(f"Query failed: {e}")
+            if self.raise_errors:
+                raise
+            return pd.DataFrame()
+
+    def execute_query_arrow(self, query: str, params: Optional[Dict[str, Any]] = None, cache: bool = True):
+        """Columnar fetch as a pyarrow.Table (None if the query failed)."""
+        def load():
+            return self._run_query(query, params, lambda cur: cur.fetch_arrow_all(force_return_table=True))
 
-    def execute_query(self, query: str) -> List[Dict[str, Any]]:
         try:
-            with self.conn.cursor() as cur:
-                cur.execute(query)
-                columns = [desc[0] for desc in cur.description]
-                results = [dict(zip(columns, row)) for row in cur.fetchall()]
-                return results
+            return self.cache.get_or_load(query, params, "arrow", load) if cache else load()
         except Exception as e:
             logger.error(f"Query failed: {e}")
-            return []
+            if self.raise_errors:
+                raise
+            return None
+
+    def get_cancer_statistics(self, query: str = "", columnar: bool = False) -> Dict[str, Any]:
+        """Aggregated statistics for the query's site, area, sex and years, computed in Snowflake
+        (or from the local snapshot when ``SNOWFLAKE_MODE=local``).
 
-    def get_cancer_statistics(self) -> Dict[str, List[Dict[str, Any]]]:
+        Each table comes back as a list of row dicts, or as a DataFrame when ``columnar`` is set.
+        """
         try:
-            return {
-                
-                "by_site": self.execute_query("""
-                    SELECT YEAR, SEX, SITE, COUNT, POPULATION, EVENT_TYPE
-                    FROM BY_SITE
-                """),
-
-                "incident": self.execute_query("""
-                    SELECT AREA, CANCERTYPE, YEAR, SEX, TYPE, CASECOUNT, POPULATION
-                    FROM CANCER_INCIDENT
-                    WHERE CASECOUNT IS NOT NULL AND POPULATION IS NOT NULL
-                """),
-
-                "mortality": self.execute_query("""
-                    SELECT SITE, YEAR
-                    FROM CANCER_MORTALITY_RATE
-                """),
-
-                "child_cases": self.execute_query("""
-                    SELECT SITE, YEAR, AGE, COUNT, POPULATION, EVENT_TYPE
-                    FROM CHILD_AGE_GROUP
-                    WHERE COUNT IS NOT NULL AND POPULATION IS NOT NULL
-                """)
+            filters = parse_query_filters(query)
+            logger.info(f"Snowflake filters for query: {filters}")
+            if self.store is not None:
+                return self.store.statistics(filters, MAX_AGGREGATE_ROWS, columnar=columnar)
+            fetch = self.execute_query_df if columnar else self.execute_query
+            # The four tables are queried in parallel on separate pooled connections
+            futures = {
+                name: self._executor.submit(fetch, sql, params)
+                for name, (sql, params) in build_statistics_queries(filters).items()
             }
+            return {name: future.result() for name, future in futures.items()}
         except Exception as e:
             logger.error(f"❌ Failed to fetch cancer statistics: {e}")
+            if self.raise_errors:
+                raise
+            empty = pd.DataFrame if columnar else list
             return {
-                "by_site": [],
-                "incident": [],
-                "mortality": [],
-                "child_cases": []
+                "by_site": empty(),
+                "incident": empty(),
+                "mortality": empty(),
+                "child_cases": empty()
             }
 
+    def refresh_statistics(self, query: str = "", columnar: bool = False) -> Dict[str, Any]:
+        """Drop cached results (e.g. after the source tables are reloaded) and re-warm them for ``query``."""
+        self.cache.clear()
+        return self.get_cancer_statistics(query, columnar=columnar)
+
+    async def aget_cancer_statistics(self, query: str = "", columnar: bool = False) -> Dict[str, Any]:
+        """Event-loop friendly wrapper: the blocking connector calls run in a worker thread."""
+        return await asyncio.to_thread(self.get_cancer_statistics, query, columnar)
+
     def close(self):
-        if self.conn:
-            self.conn.close()
-            logger.info("✅ Snowflake connection closed")
+        self.pool.close_all()
+        self._executor.shutdown(wait=False)
@@ -1,90 +1,72 @@
 
 import requests
+import httpx
 import os
+import asyncio
+import random
 import logging
-import re
-from datetime import datetime
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional, Tuple
 from urllib.parse import urlparse
 
+from core.search_cache import SearchCache, get_search_cache, search_key
+from features.web_extraction import extract_trials, extract_hospitals, extract_location
+
 # Configure Logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-class WebAgent:
-    def __init__(self):
+TAVILY_TIMEOUT = float(os.getenv("TAVILY_TIMEOUT", "20"))
+TAVILY_MAX_RETRIES = int(os.getenv("TAVILY_MAX_RETRIES", "2"))
+TAVILY_BACKOFF_BASE = float(os.getenv("TAVILY_BACKOFF_BASE", "0.5"))
+TAVILY_CONCURRENCY = int(os.getenv("TAVILY_CONCURRENCY", "5"))
+
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+# category -> (query template, search options, result extractor)
+SEARCHES = {
+    "treatment_costs": ("{} cancer treatment costs detailed insurance coverage duration regional",
+                        {"search_depth": "advanced"}, "_extract_treatment_costs"),
+    "clinical_trials": ("active clinical trials {} cancer treatment",
+                        {"search_depth": "advanced"}, "_extract_clinical_trials"),
+    "statistics": ("cancer statistics {}",
+                   {"search_depth": "advanced", "include_answer": True}, "_extract_statistics"),
+    "literature": ("medical literature {}",
+                   {"search_depth": "advanced", "include_answer": True, "max_results": 5}, "_extract_medical_literature"),
+    "funding": ("cancer research funding opportunities for {}",
+                {"search_depth": "advanced", "max_results": 10}, "_extract_funding"),
+    "hospitals": ("best cancer treatment centers in {} with address and rating",
+                  {"search_depth": "advanced", "max_results": 10}, "_extract_hospitals"),
+}
+
+
+class BaseWebAgent:
+    """Tavily configuration and result extraction shared by the sync and async agents."""
+
+    def __init__(self, cache: Optional[SearchCache] = None, raise_errors: bool = False):
         load_dotenv()
+        # Failed searches propagate instead of coming back as empty results
+        self.raise_errors = raise_errors
         self.tavily_api_key = os.getenv('TAVILY_API_KEY')
         if not self.tavily_api_key:
             logger.error("TAVILY_API_KEY not found in environment variables")
             raise ValueError("TAVILY_API_KEY is required")
-        self.session = requests.Session()
-        self.tavily_endpoint = "https://api.tavily.com/search"
+        # Overridable so the agent can be pointed at a local stub server
+        self.tavily_endpoint = os.getenv("TAVILY_ENDPOINT", "https://api.tavily.com/search")
+        # One process-wide cache, so sync and async agents share results
+        self.cache = cache or get_search_cache()
 
-    def _tavily_search(self, query: str, search_depth: str = "basic", include_answer: bool = False, max_results: int = 10) -> Dict[str, Any]:
-        headers = {"Content-Type": "application/json"}
-        payload = {
+    def _payload(self, query: str, search_depth: str = "basic", include_answer: bool = False, max_results: int = 10) -> Dict[str, Any]:
+        return {
             "api_key": self.tavily_api_key,
             "query": query,
             "search_depth": search_depth if search_depth in ["basic", "advanced"] else "advanced",
             "include_answer": include_answer,
             "max_results": max_results
         }
-        try:
-            response = self.session.post(self.tavily_endpoint, headers=headers, json=payload)
-            response.raise_for_status()
-            return response.json()
-        except Exception as e:
-            logger.error(f"Error in Tavily search: {e}")
-            return {"results": []}
-
-    def get_treatment_costs_from_serp(self, query: str) -> List[Dict[str, Any]]:
-        results = self._tavily_search(
-            f"{query} cancer treatment costs detailed insurance coverage duration regional",
-            search_depth="advanced"
-        )
-        return self._extract_treatment_costs(results.get('results', []))
-
-    def get_clinical_trials(self, condition: str) -> List[Dict[str, Any]]:
-        results = self._tavily_search(
-            f"active clinical trials {condition} cancer treatment",
-            search_depth="advanced"
-        )
-        return self._extract_clinical_trials(results.get('results', []))
-
-    def get_cancer_statistics_from_serp(self, query: str = "") -> Dict[str, Any]:
-        results = self._tavily_search(
-            f"cancer statistics {query}",
-            search_depth="advanced",
-            include_answer=True
-        )
-        return self._extract_statistics(results.get('results', []))
-
-    def search_medical_literature(self, query: str) -> List[Dict[str, Any]]:
-        results = self._tavily_search(
-            f"medical literature {query}",
-            search_depth="advanced",
-            include_answer=True,
-            max_results=5
-        )
-        return self._extract_medical_literature(results.get('results', []))
-
-    def get_funding_opportunities(self, condition: str) -> List[Dict[str, Any]]:
-        results = self._tavily_search(
-            f"cancer research funding opportunities for {condition}",
-            search_depth="advanced",
-            max_results=10
-        )
-        return self._extract_funding(results.get('results', []))
-
-    def get_hospitals_by_location(self, location: str) -> List[Dict[str, Any]]:
-        results = self._tavily_search(
-            f"best cancer treatment centers in {location} with address and rating",
-            search_depth="advanced",
-            max_results=10
-        )
-        return self._extract_hospitals(results.get('results', []))
 
     def _extract_treatment_costs(self, results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         return [
@@ -93,20 +75,7 @@ class WebAgent:
         ]
 
     def _extract_clinical_trials(self, results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-        trials = []
-        for res in results:
-            title = res.get('title', '')
-            content = res.get('content', '')
-            phase_match = re.search(r'phase (i{1,3}|[1-3])', (title + ' ' + content).lower())
-            status_match = re.search(r'(recruiting|completed|active)', content.lower())
-            trials.append({
-                "title": title,
-                "description": content,
-                "phase": phase_match.group(0).title() if phase_match else "Unknown",
-                "status": status_match.group(0).title() if status_match else "Unknown",
-                "source_url": res.get('url', '')
-            })
-        return trials
+        return extract_trials(results)
 
     def _extract_statistics(self, results: List[Dict[str, Any]]) -> Dict[str, Any]:
         if not results:
@@ -136,18 +105,7 @@ class WebAgent:
         ]
 
     def _extract_hospitals(self, results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-        hospitals = []
-        for res in results:
-            content = res.get("content", "")
-            address_match = re.search(r"\d{1,5}\s+\w+[\w\s,]+", content)
-            rating_match = re.search(r"(\d\.\d)\s*/\s*5", content)
-            hospitals.append({
-                "name": res.get("title", "Unknown"),
-                "address": address_match.group(0) if address_match else "Unknown address",
-                "rating": float(rating_match.group(1)) if rating_match else None,
-                "source_url": res.get("url", "")
-            })
-        return hospitals
+        return extract_hospitals(results)
 
     def _extract_source(self, url: str) -> str:
         try:
@@ -156,12 +114,70 @@ class WebAgent:
             return "Unknown Source"
 
     def _extract_location(self, query: str) -> str:
-        # Look for 'in LOCATION', 'at LOCATION', or 'near LOCATION'
-        for pat in [r'in ([A-Z][\w\s,]+)', r'at ([A-Z][\w\s,]+)', r'near ([A-Z][\w\s,]+)']:
-            m = re.search(pat, query)
-            if m:
-                return m.group(1).strip()
-        return "United States"
+        return extract_location(query)
+
+
+class WebAgent(BaseWebAgent):
+    def __init__(self, cache: Optional[SearchCache] = None, raise_errors: bool = False):
+        super().__init__(cache, raise_errors)
+        self.session = requests.Session()
+        self._refresher = ThreadPoolExecutor(max_workers=2, thread_name_prefix="tavily-refresh")
+
+    def _post(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        headers = {"Content-Type": "application/json"}
+        response = self.session.post(self.tavily_endpoint, headers=headers, json=payload, timeout=TAVILY_TIMEOUT)
+        response.raise_for_status()
+        return response.json()
+
+    def _refresh(self, key: str, payload: Dict[str, Any], category: Optional[str]) -> None:
+        try:
+            self.cache.set(key, self._post(payload), category)
+        except Exception as e:
+            logger.warning(f"Background refresh of Tavily search failed: {e}")
+        finally:
+            self.cache.end_refresh(key)
+
+    def _tavily_search(self, query: str, search_depth: str = "basic", include_answer: bool = False, max_results: int = 10,
+                       category: Optional[str] = None) -> Dict[str, Any]:
+        payload = self._payload(query, search_depth, include_answer, max_results)
+        key = search_key(payload)
+        cached, fresh = self.cache.get(key)
+        if cached is not None:
+            if not fresh and self.cache.begin_refresh(key):
+                self._refresher.submit(self._refresh, key, payload, category)
+            return cached
+        try:
+            response = self._post(payload)
+        except Exception as e:
+            logger.error(f"Error in Tavily search: {e}")
+            if self.raise_errors:
+                raise
+            return {"results": []}
+        self.cache.set(key, response, category)
+        return response
+
+    def _search(self, category: str, text: str) -> Any:
+        template, options, extractor = SEARCHES[category]
+        results = self._tavily_search(template.format(text), category=category, **options)
+        return getattr(self, extractor)(results.get('results', []))
+
+    def get_treatment_costs_from_serp(self, query: str) -> List[Dict[str, Any]]:
+        return self._search("treatment_costs", query)
+
+    def get_clinical_trials(self, condition: str) -> List[Dict[str, Any]]:
+        return self._search("clinical_trials", condition)
+
+    def get_cancer_statistics_from_serp(self, query: str = "") -> Dict[str, Any]:
+        return self._search("statistics", query)
+
+    def search_medical_literature(self, query: str) -> List[Dict[str, Any]]:
+        return self._search("literature", query)
+
+    def get_funding_opportunities(self, condition: str) -> List[Dict[str, Any]]:
+        return self._search("funding", condition)
+
+    def get_hospitals_by_location(self, location: str) -> List[Dict[str, Any]]:
+        return self._search("hospitals", location)
 
     def get_all_web_data(self, query: str) -> Dict[str, Any]:
         logger.info(f"Running full web search pipeline for: {query}")
@@ -172,4 +188,134 @@ class WebAgent:
             "treatment_costs": self.get_treatment_costs_from_serp(query),
             "clinical_trials": self.get_clinical_trials(query),
             "hospitals_in_region": self.get_hospitals_by_location(loc),
-        }
\ No newline at end of file
+        }
+
+
+class AsyncWebAgent(BaseWebAgent):
+    """WebAgent on a pooled ``httpx.AsyncClient``: searches run concurrently, capped at
+    ``TAVILY_CONCURRENCY`` in flight, each with a timeout and retried with backoff on
+    transport errors, 429 and 5xx.
+    """
+
+    def __init__(self, concurrency: int = TAVILY_CONCURRENCY, timeout: float = TAVILY_TIMEOUT,
+                 max_retries: int = TAVILY_MAX_RETRIES, cache: Optional[SearchCache] = None,
+                 raise_errors: bool = False):
+        super().__init__(cache, raise_errors)
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.max_retries = max_retries
+        # One client and semaphore per event loop, as in core/llm.py: both are bound to the loop they were made on
+        self._clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Tuple[httpx.AsyncClient, asyncio.Semaphore]]" = weakref.WeakKeyDictionary()
+        self._clients_lock = threading.Lock()
+        self._background = set()
+
+    def _ensure_client(self) -> Tuple[httpx.AsyncClient, asyncio.Semaphore]:
+        loop = asyncio.get_running_loop()
+        with self._clients_lock:
+            entry = self._clients.get(loop)
+            if entry is None:
+                client = httpx.AsyncClient(
+                    timeout=httpx.Timeout(self.timeout, connect=min(self.timeout, 5.0)),
+                    limits=httpx.Limits(max_connections=self.concurrency, max_keepalive_connections=self.concurrency),
+                    headers={"Content-Type": "application/json"},
+                )
+                entry = self._clients[loop] = (client, asyncio.Semaphore(self.concurrency))
+        return entry
+
+    async def _post(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        client, semaphore = self._ensure_client()
+        for attempt in range(self.max_retries + 1):
+            try:
+                async with semaphore:
+                    response = await client.post(self.tavily_endpoint, json=payload)
+                if response.status_code not in RETRY_STATUS:
+                    response.raise_for_status()
+                    return response.json()
+                error = f"HTTP {response.status_code}"
+            except (httpx.TimeoutException, httpx.TransportError) as e:
+                error = repr(e)
+            if attempt == self.max_retries:
+                raise RuntimeError(f"Tavily search failed after {attempt + 1} attempts: {error}")
+            delay = random.uniform(0, TAVILY_BACKOFF_BASE * 2 ** attempt)
+            logger.warning(f"Tavily search failed ({error}), retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+    async def _refresh(self, key: str, payload: Dict[str, Any], category: Optional[str]) -> None:
+        try:
+            self.cache.set(key, await self._post(payload), category)
+        except Exception as e:
+            logger.warning(f"Background refresh of Tavily search failed: {e}")
+        finally:
+            self.cache.end_refresh(key)
+
+    async def _tavily_search(self, query: str, search_depth: str = "basic", include_answer: bool = False, max_results: int = 10,
+                             category: Optional[str] = None) -> Dict[str, Any]:
+        payload = self._payload(query, search_depth, include_answer, max_results)
+        key = search_key(payload)
+        cached, fresh = self.cache.get(key)
+        if cached is not None:
+            if not fresh and self.cache.begin_refresh(key):
+                # Answer from the stale copy now; keep a reference so the refresh task isn't collected
+                task = asyncio.create_task(self._refresh(key, payload, category))
+                self._background.add(task)
+                task.add_done_callback(self._background.discard)
+            return cached
+        try:
+            response = await self._post(payload)
+        except Exception as e:
+            logger.error(f"Error in Tavily search: {e}")
+            if self.raise_errors:
+                raise
+            return {"results": []}
+        self.cache.set(key, response, category)
+        return response
+
+    async def _search(self, category: str, text: str) -> Any:
+        template, options, extractor = SEARCHES[category]
+        results = await self._tavily_search(template.format(text), category=category, **options)
+        return getattr(self, extractor)(results.get('results', []))
+
+    async def get_treatment_costs_from_serp(self, query: str) -> List[Dict[str, Any]]:
+        return await self._search("treatment_costs", query)
+
+    async def get_clinical_trials(self, condition: str) -> List[Dict[str, Any]]:
+        return await self._search("clinical_trials", condition)
+
+    async def get_cancer_statistics_from_serp(self, query: str = "") -> Dict[str, Any]:
+        return await self._search("statistics", query)
+
+    async def search_medical_literature(self, query: str) -> List[Dict[str, Any]]:
+        return await self._search("literature", query)
+
+    async def get_funding_opportunities(self, condition: str) -> List[Dict[str, Any]]:
+        return await self._search("funding", condition)
+
+    async def get_hospitals_by_location(self, location: str) -> List[Dict[str, Any]]:
+        return await self._search("hospitals", location)
+
+    async def get_all_web_data(self, query: str) -> Dict[str, Any]:
+        logger.info(f"Running full web search pipeline for: {query}")
+        loc = self._extract_location(query)
+        names = ["statistics", "literature", "treatment_costs", "clinical_trials", "hospitals_in_region"]
+        results = await asyncio.gather(
+            self.get_cancer_statistics_from_serp(query),
+            self.search_medical_literature(query),
+            self.get_treatment_costs_from_serp(query),
+            self.get_clinical_trials(query),
+            self.get_hospitals_by_location(loc),
+        )
+        return dict(zip(names, results))
+
+    async def aclose(self) -> None:
+        for task in list(self._background):
+            task.cancel()
+        current = asyncio.get_running_loop()
+        with self._clients_lock:
+            entries = list(self._clients.items())
+            self._clients.clear()
+        for loop, (client, _) in entries:
+            if loop is current:
+                await client.aclose()
+            elif loop.is_running():
+                # A client must be closed on its own loop
+                asyncio.run_coroutine_threadsafe(client.aclose(), loop)
@@ -0,0 +1,134 @@
+# benchmarks/bench_chunking.py
+"""
+Chunking throughput and retrieval quality per chunk size, on a fixed local
+corpus, for the token chunker versus the previous heading + 300-word split.
+
+The corpus is every PDF / .md / .txt file under --corpus (default: the sample
+report PDFs at the repository root). Retrieval is scored without any API:
+chunks and queries are embedded with a hashed TF-IDF bag of words, and each
+query is a corpus sentence with a third of its words dropped; a hit is a
+retrieved chunk containing the middle of that sentence.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_chunking [--corpus DIR] [--sizes 128 256 400 800] [--overlap 0.125]
+"""
+
+import os
+import re
+import time
+import zlib
+import glob
+import random
+import argparse
+import numpy as np
+from typing import Callable, List, Tuple
+
+from core.tokens import count_tokens
+from core.vector_index import normalize
+from features.mistral_parser import pdf_mistralocr_converter
+from features.chunking_stratergy import (
+    markdown_chunking, split_long_chunks, iter_token_chunks, markdown_units,
+)
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+HASH_DIM = 1 << 14
+_WORD = re.compile(r"\w+")
+
+
+def load_corpus(path: str) -> List[str]:
+    docs = []
+    for file in sorted(glob.glob(os.path.join(path, "**", "*"), recursive=True)):
+        if file.endswith(".pdf"):
+            with open(file, "rb") as f:
+                docs.append(pdf_mistralocr_converter(f.read(), "", None)[1])
+        elif file.endswith((".md", ".txt")):
+            with open(file, encoding="utf-8") as f:
+                docs.append(f.read())
+    return docs
+
+
+def embed(texts: List[str], idf: np.ndarray = None) -> Tuple[np.ndarray, np.ndarray]:
+    """Hashed TF-IDF vectors (idf computed from ``texts`` unless given)."""
+    counts = np.zeros((len(texts), HASH_DIM), dtype=np.float32)
+    for row, text in enumerate(texts):
+        for word in _WORD.findall(text.lower()):
+            counts[row, zlib.crc32(word.encode('utf-8')) % HASH_DIM] += 1
+    if idf is None:
+        df = (counts > 0).sum(axis=0)
+        idf = np.log((1 + len(texts)) / (1 + df)).astype(np.float32) + 1
+    return normalize(np.log1p(counts) * idf), idf
+
+
+def make_queries(docs: List[str], n: int, rng: random.Random) -> List[Tuple[str, str]]:
+    """(query, key) pairs: a sentence with words dropped, and the middle 8 words it must be found by."""
+    sentences = [s for doc in docs for _, s, _ in markdown_units(doc) if len(s.split()) >= 12]
+    queries = []
+    for sentence in rng.sample(sentences, min(n, len(sentences))):
+        words = sentence.split()
+        mid = len(words) // 2
+        key = " ".join(words[mid - 4:mid + 4])
+        kept = [w for w in words if rng.random() > 0.33]
+        queries.append((" ".join(kept), key))
+    return queries
+
+
+def evaluate(chunks: List[str], queries: List[Tuple[str, str]], k: int = 5) -> Tuple[float, float, float]:
+    flat = [" ".join(c.split()) for c in chunks]
+    chunk_vecs, idf = embed(chunks)
+    query_vecs, _ = embed([q for q, _ in queries], idf)
+    scores = query_vecs @ chunk_vecs.T
+    hits1 = hitsk = rr = 0.0
+    for (_, key), row in zip(queries, scores):
+        ranked = np.argsort(-row)[:20]
+        rank = next((r for r, i in enumerate(ranked) if key in flat[i]), None)
+        if rank is not None:
+            hits1 += rank == 0
+            hitsk += rank < k
+            rr += 1 / (rank + 1)
+    n = len(queries)
+    return hits1 / n, hitsk / n, rr / n
+
+
+def timed(chunker: Callable[[str], List[str]], docs: List[str], repeat: int) -> Tuple[float, List[str]]:
+    best, chunks = float("inf"), []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        chunks = [c for doc in docs for c in chunker(doc)]
+        best = min(best, time.perf_counter() - start)
+    return best, chunks
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark chunk sizes for throughput and retrieval quality.")
+    parser.add_argument("--corpus", default=REPO_ROOT, help="Directory of PDF/.md/.txt files")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[128, 256, 400, 800], help="Chunk sizes in tokens")
+    parser.add_argument("--overlap", type=float, default=0.125, help="Overlap as a fraction of the chunk size")
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    docs = load_corpus(args.corpus)
+    if not docs:
+        raise SystemExit(f"No PDF/.md/.txt files under {args.corpus}")
+    size_mb = sum(len(d.encode("utf-8")) for d in docs) / 1e6
+    queries = make_queries(docs, args.queries, random.Random(0))
+    print(f"Corpus: {len(docs)} documents, {size_mb:.2f} MB of markdown, {len(queries)} queries")
+
+    rows = [("words-300 (previous)", lambda doc: split_long_chunks(markdown_chunking(doc, heading_level=3)))]
+    for size in args.sizes:
+        overlap = int(size * args.overlap)
+        rows.append((f"tokens-{size}/{overlap}",
+                     lambda doc, size=size, overlap=overlap: [c["text"] for c in iter_token_chunks(markdown_units(doc), size, overlap)]))
+
+    print(f"{'chunker':<22} {'MB/s':>7} {'chunks':>7} {'avg tok':>8} {'max tok':>8} {'hit@1':>6} {'hit@5':>6} {'MRR':>6} {'ctx@5 tok':>10}")
+    for name, chunker in rows:
+        seconds, chunks = timed(chunker, docs, args.repeat)
+        tokens = [count_tokens(c) for c in chunks]
+        hit1, hit5, mrr = evaluate(chunks, queries)
+        print(f"{name:<22} {size_mb / seconds:>7.1f} {len(chunks):>7} {np.mean(tokens):>8.0f} {max(tokens):>8} "
+              f"{hit1:>6.2f} {hit5:>6.2f} {mrr:>6.2f} {5 * np.mean(tokens):>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+# benchmarks/bench_snowflake_fetch.py
+"""
+Time and memory of SnowflakeAgent's row-dict fetch path versus the columnar
+Arrow/pandas path on a synthetic BY_SITE-shaped result.
+
+No warehouse is needed: the fixture is built as Arrow record batches (what the
+connector receives) and each path does the conversion work the connector and
+execute_query / execute_query_df would do on top of it.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_snowflake_fetch --rows 1000000
+"""
+
+import gc
+import time
+import argparse
+import tracemalloc
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+SITES = ["Brain and Other Nervous System", "Lung and Bronchus", "Female Breast", "Leukemias",
+         "Colon and Rectum", "Prostate", "Melanoma of the Skin", "Urinary Bladder"]
+
+
+def make_batches(rows: int, batch_size: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    batches = []
+    for start in range(0, rows, batch_size):
+        n = min(batch_size, rows - start)
+        counts = rng.integers(0, 50000, n).astype(str)
+        counts[rng.random(n) < 0.05] = "Data not presented"
+        batches.append(pa.RecordBatch.from_pydict({
+            "YEAR": pa.array(rng.integers(1999, 2022, n).astype(str)),
+            "SEX": pa.array(rng.choice(["Male", "Female", "Male and Female"], n)),
+            "SITE": pa.array(rng.choice(SITES, n)),
+            "COUNT": pa.array(counts),
+            "POPULATION": pa.array(rng.integers(1_000_000, 330_000_000, n)),
+            "EVENT_TYPE": pa.array(rng.choice(["Incidence", "Mortality"], n)),
+        }))
+    return batches
+
+
+def dict_path(batches):
+    # fetchall() materialises every row as a tuple, then execute_query zips each into a dict
+    columns = batches[0].schema.names
+    rows = [row for batch in batches for row in zip(*(col.to_pylist() for col in batch.columns))]
+    return [dict(zip(columns, row)) for row in rows]
+
+
+def columnar_path(batches):
+    # fetch_pandas_batches() converts each Arrow batch directly; execute_query_df concatenates
+    return pd.concat([batch.to_pandas() for batch in batches], ignore_index=True)
+
+
+def measure(fn, batches):
+    # Timed without tracemalloc (it slows allocation-heavy code), then a second traced run for memory
+    gc.collect()
+    start = time.perf_counter()
+    result = fn(batches)
+    elapsed = time.perf_counter() - start
+    del result
+
+    gc.collect()
+    pool = pa.default_memory_pool()
+    arrow_before = pool.bytes_allocated()
+    tracemalloc.start()
+    result = fn(batches)
+    _, python_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    arrow_peak = max(pool.max_memory() - arrow_before, 0)
+    del result
+    return elapsed, (python_peak + arrow_peak) / 1024 ** 2
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--batch-size", type=int, default=100_000)
+    args = parser.parse_args()
+
+    batches = make_batches(args.rows, args.batch_size)
+    print(f"{'path':>10} {'seconds':>8} {'peak_MB':>9}")
+    for name, fn in [("dict", dict_path), ("columnar", columnar_path)]:
+        elapsed, peak = measure(fn, batches)
+        print(f"{name:>10} {elapsed:>8.2f} {peak:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
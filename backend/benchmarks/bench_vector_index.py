@@ -0,0 +1,70 @@
+# benchmarks/bench_vector_index.py
+"""
+Recall and latency of the IVF index against the exact baseline on synthetic,
+clustered embeddings. Use it to pick RAG_INDEX_MODE / IVF_MIN_VECTORS for a
+corpus size.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_vector_index --sizes 10000 50000 200000 --dim 1536
+"""
+
+import time
+import argparse
+import numpy as np
+
+from core.vector_index import ExactIndex, IVFIndex, normalize
+
+
+def synthetic_corpus(n: int, dim: int, n_topics: int, rng: np.random.Generator) -> np.ndarray:
+    # Chunks of the same paper/topic sit close together, like real embeddings
+    topics = rng.normal(size=(n_topics, dim)).astype(np.float32)
+    labels = rng.integers(0, n_topics, n)
+    return normalize(topics[labels] + 0.6 * rng.normal(size=(n, dim)).astype(np.float32))
+
+
+def time_queries(search, queries: np.ndarray):
+    latencies, results = [], []
+    for q in queries:
+        start = time.perf_counter()
+        idx, _ = search(q)
+        latencies.append((time.perf_counter() - start) * 1000)
+        results.append(idx)
+    return np.percentile(latencies, 50), np.percentile(latencies, 95), results
+
+
+def recall(approx, exact, k: int) -> float:
+    return float(np.mean([len(set(a[:k]) & set(e[:k])) / k for a, e in zip(approx, exact)]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 50000, 200000])
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[4, 8, 16, 32])
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    print(f"{'n':>9} {'mode':>12} {'build_s':>8} {'p50_ms':>8} {'p95_ms':>8} {'recall@k':>9}")
+    for n in args.sizes:
+        vectors = synthetic_corpus(n, args.dim, max(10, n // 500), rng)
+        queries = normalize(vectors[rng.choice(n, args.queries)] + 0.3 * rng.normal(size=(args.queries, args.dim)))
+
+        exact = ExactIndex(vectors, normalized=True)
+        p50, p95, exact_results = time_queries(lambda q: exact.search(q, args.k), queries)
+        print(f"{n:>9} {'exact':>12} {0.0:>8.2f} {p50:>8.2f} {p95:>8.2f} {1.0:>9.3f}")
+
+        start = time.perf_counter()
+        ivf = IVFIndex.train(vectors, normalized=True)
+        build = time.perf_counter() - start
+        for nprobe in args.nprobe:
+            p50, p95, results = time_queries(lambda q: ivf.search(q, args.k, nprobe=nprobe), queries)
+            label = f"ivf/np={nprobe}"
+            print(f"{n:>9} {label:>12} {build:>8.2f} {p50:>8.2f} {p95:>8.2f} {recall(results, exact_results, args.k):>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
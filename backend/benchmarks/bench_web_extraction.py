@@ -0,0 +1,145 @@
+# benchmarks/bench_web_extraction.py
+"""
+Throughput of the WebAgent result parsers: the previous per-result ad-hoc
+regexes versus features.web_extraction.
+
+By default the corpus is synthetic Tavily-shaped results (trial and hospital
+snippets with the phrasing seen in real responses). Pass --corpus with a JSON
+or JSONL file of recorded Tavily responses (each a dict with a "results" list)
+to benchmark on real traffic instead.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_web_extraction [--results 20000] [--corpus responses.jsonl]
+"""
+
+import re
+import json
+import time
+import random
+import argparse
+from typing import Any, Dict, List
+
+from features.web_extraction import extract_trials, extract_hospitals, extract_location
+
+STATUSES = ["Recruiting", "Not yet recruiting", "Active, not recruiting", "Completed", "Terminated"]
+PHASES = ["Phase 1", "Phase II", "phase 2/3", "Phase III", "Early Phase 1", "Phase IV", "Phase 1b", "Phase Ib/II"]
+STREETS = ["Holcombe Blvd", "First Street SW", "Euclid Avenue", "Charles St", "Pike Road"]
+CITIES = [("Houston", "TX", "77030"), ("Rochester", "MN", "55905"), ("Cleveland", "OH", "44195"),
+          ("Baltimore", "MD", "21287"), ("Boston", "MA", "02215")]
+QUERIES = ["Brain cancer treatment options in Ohio", "pediatric leukemia trials at Mayo Clinic in Rochester",
+           "lung cancer hospitals near Boston", "breast cancer survival rates"]
+
+
+def synthetic_corpus(n: int, seed: int = 0) -> List[Dict[str, Any]]:
+    rng = random.Random(seed)
+    results = []
+    for i in range(n):
+        if i % 2:
+            city, state, zip_code = rng.choice(CITIES)
+            content = (f"{city} Cancer Center is ranked among the top programs. Located at "
+                       f"{rng.randint(1, 9999)} {rng.choice(STREETS)}, {city}, {state} {zip_code}. "
+                       f"Patients rate it {rng.randint(30, 50) / 10}/5 across {rng.randint(50, 900)} reviews. "
+                       + "Multidisciplinary tumor boards and survivorship clinics. " * rng.randint(1, 4))
+            results.append({"title": f"{city} Cancer Center", "content": content, "url": f"https://example.org/h{i}"})
+        else:
+            content = (f"A {rng.choice(PHASES)} randomized study (NCT{rng.randint(0, 99999999):08d}) of "
+                       f"targeted therapy. Status: {rng.choice(STATUSES)}. Estimated Enrollment: "
+                       f"{rng.randint(20, 3000)} participants. " + "Eligibility includes adults with measurable disease. " * rng.randint(1, 4))
+            results.append({"title": f"Trial {i}: {rng.choice(PHASES)} study", "content": content,
+                            "url": f"https://clinicaltrials.gov/study/NCT{rng.randint(0, 99999999):08d}"})
+    return results
+
+
+def load_corpus(path: str) -> List[Dict[str, Any]]:
+    with open(path, encoding="utf-8") as f:
+        text = f.read()
+    try:
+        responses = json.loads(text)
+        responses = responses if isinstance(responses, list) else [responses]
+    except json.JSONDecodeError:
+        responses = [json.loads(line) for line in text.splitlines() if line.strip()]
+    return [r for resp in responses for r in resp.get("results", [])]
+
+
+# Previous WebAgent parsers, kept verbatim as the baseline
+def legacy_trials(results):
+    trials = []
+    for res in results:
+        title = res.get('title', '')
+        content = res.get('content', '')
+        phase_match = re.search(r'phase (i{1,3}|[1-3])', (title + ' ' + content).lower())
+        status_match = re.search(r'(recruiting|completed|active)', content.lower())
+        trials.append({
+            "title": title,
+            "description": content,
+            "phase": phase_match.group(0).title() if phase_match else "Unknown",
+            "status": status_match.group(0).title() if status_match else "Unknown",
+            "source_url": res.get('url', '')
+        })
+    return trials
+
+
+def legacy_hospitals(results):
+    hospitals = []
+    for res in results:
+        content = res.get("content", "")
+        address_match = re.search(r"\d{1,5}\s+\w+[\w\s,]+", content)
+        rating_match = re.search(r"(\d\.\d)\s*/\s*5", content)
+        hospitals.append({
+            "name": res.get("title", "Unknown"),
+            "address": address_match.group(0) if address_match else "Unknown address",
+            "rating": float(rating_match.group(1)) if rating_match else None,
+            "source_url": res.get("url", "")
+        })
+    return hospitals
+
+
+def legacy_location(query):
+    for pat in [r'in ([A-Z][\w\s,]+)', r'at ([A-Z][\w\s,]+)', r'near ([A-Z][\w\s,]+)']:
+        m = re.search(pat, query)
+        if m:
+            return m.group(1).strip()
+    return "United States"
+
+
+def timed(fn, arg, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(arg)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark WebAgent result extraction.")
+    parser.add_argument("--results", type=int, default=20000, help="Synthetic results to generate")
+    parser.add_argument("--corpus", help="JSON/JSONL file of recorded Tavily responses")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus) if args.corpus else synthetic_corpus(args.results)
+    queries = QUERIES * 5000
+    print(f"Corpus: {len(corpus)} results ({'recorded' if args.corpus else 'synthetic'})")
+
+    rows = [
+        ("trials", legacy_trials, extract_trials, corpus),
+        ("hospitals", legacy_hospitals, extract_hospitals, corpus),
+        ("location", lambda qs: [legacy_location(q) for q in qs], lambda qs: [extract_location(q) for q in qs], queries),
+    ]
+    print(f"{'parser':<10} {'legacy ms':>10} {'new ms':>10} {'speedup':>8}")
+    for name, old, new, data in rows:
+        t_old, t_new = timed(old, data, args.repeat), timed(new, data, args.repeat)
+        print(f"{name:<10} {t_old * 1000:>10.1f} {t_new * 1000:>10.1f} {t_old / t_new:>7.2f}x")
+
+    trials = extract_trials(corpus)
+    found = {field: sum(1 for t in trials if t[field] not in (None, "Unknown", [])) for field in ("phase", "status", "nct_ids", "enrollment")}
+    hospitals = extract_hospitals(corpus)
+    found["address"] = sum(1 for h in hospitals if h["address"] != "Unknown address")
+    found["rating"] = sum(1 for h in hospitals if h["rating"] is not None)
+    print("Fields extracted:", found)
+
+
+if __name__ == "__main__":
+    main()
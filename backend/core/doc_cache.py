@@ -0,0 +1,53 @@
+# core/doc_cache.py
+
+import os
+import json
+import hashlib
+import logging
+from typing import Any, Dict, Optional
+
+from core.cache import DiskLRUCache, cache_path
+
+logger = logging.getLogger(__name__)
+
+DOC_CACHE_MAX_BYTES = int(os.getenv("DOC_CACHE_MAX_MB", "1024")) * 1024 * 1024
+
+
+class ParsedDocumentCache:
+    """On-disk cache of parsed PDFs keyed by bucket, key and object version (ETag/LastModified).
+
+    A ``variant`` (parse mode and settings) keeps differently parsed copies of
+    one object side by side.
+    """
+
+    def __init__(self, path: Optional[str] = None, max_bytes: int = DOC_CACHE_MAX_BYTES):
+        self.store = DiskLRUCache(path or cache_path("parsed_docs.sqlite"), max_bytes=max_bytes)
+
+    @staticmethod
+    def _key(bucket: str, key: str, version: str, variant: str = "") -> str:
+        suffix = f"#{variant}" if variant else ""
+        return hashlib.sha256(f"{bucket}/{key}@{version}{suffix}".encode("utf-8")).hexdigest()
+
+    def get(self, bucket: str, key: str, version: str, variant: str = "") -> Optional[Dict[str, Any]]:
+        raw = self.store.get(self._key(bucket, key, version, variant))
+        if raw is None:
+            return None
+        return json.loads(raw)
+
+    def put(self, bucket: str, key: str, version: str, parsed: Dict[str, Any], variant: str = "") -> None:
+        # Tagging by bucket/key (and variant) drops any entry parsed from an older version of the object
+        self.store.set(
+            self._key(bucket, key, version, variant),
+            json.dumps(parsed).encode("utf-8"),
+            tag=f"{bucket}/{key}" + (f"#{variant}" if variant else ""),
+        )
+
+
+_doc_cache: Optional[ParsedDocumentCache] = None
+
+
+def get_doc_cache() -> ParsedDocumentCache:
+    global _doc_cache
+    if _doc_cache is None:
+        _doc_cache = ParsedDocumentCache()
+    return _doc_cache
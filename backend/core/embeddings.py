@@ -0,0 +1,152 @@
+# core/embeddings.py
+
+import os
+import hashlib
+import logging
+import threading
+import numpy as np
+from typing import Dict, List, Optional
+
+from openai import OpenAI
+
+from core.cache import MemoryLRUCache, DiskLRUCache, cache_path
+from core.tokens import count_tokens, truncate_tokens
+from core.llm import LLM_PROVIDER, FakeEmbeddingClient
+
+logger = logging.getLogger(__name__)
+
+EMBED_MODEL = os.getenv("EMBED_MODEL", "text-embedding-ada-002")
+
+# OpenAI embedding request limits
+MAX_BATCH_INPUTS = 2048
+MAX_BATCH_TOKENS = 300000
+MAX_INPUT_TOKENS = 8191
+
+EMBED_CACHE_ITEMS = int(os.getenv("EMBED_CACHE_ITEMS", "50000"))
+EMBED_CACHE_DISK = os.getenv("EMBED_CACHE_DISK", "false").lower() in ("1", "true", "yes")
+EMBED_CACHE_DISK_MB = int(os.getenv("EMBED_CACHE_DISK_MB", "1024"))
+
+
+class EmbeddingService:
+    """Pooled embedding client with a content-hash cache and automatic request batching.
+
+    Lookups go memory LRU -> optional SQLite tier -> API. Texts repeated within
+    one call are embedded once, and misses are packed into as few requests as the
+    API's input and token limits allow.
+    """
+
+    def __init__(self, model: str = EMBED_MODEL, client: Optional[OpenAI] = None,
+                 memory_items: int = EMBED_CACHE_ITEMS, disk_path: Optional[str] = None):
+        self.model = model
+        self._client = client
+        self._client_lock = threading.Lock()
+        self.memory = MemoryLRUCache(max_items=memory_items)
+        self.disk = DiskLRUCache(disk_path, max_bytes=EMBED_CACHE_DISK_MB * 1024 * 1024) if disk_path else None
+        self.api_calls = 0
+
+    @property
+    def client(self) -> OpenAI:
+        # One client (and its HTTP connection pool) for the whole process
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    self._client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        return self._client
+
+    def _key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.model}\0{text}".encode("utf-8")).hexdigest()
+
+    def _lookup(self, key: str) -> Optional[np.ndarray]:
+        vec = self.memory.get(key)
+        if vec is not None:
+            return vec
+        if self.disk is not None:
+            raw = self.disk.get(key)
+            if raw is not None:
+                vec = np.frombuffer(raw, dtype=np.float32)
+                self.memory.set(key, vec)
+                return vec
+        return None
+
+    def _store(self, key: str, vec: np.ndarray) -> None:
+        self.memory.set(key, vec)
+        if self.disk is not None:
+            self.disk.set(key, vec.tobytes())
+
+    def _prepare(self, text: str):
+        """(text, token count), with empty strings and over-long inputs made API-safe."""
+        if not text.strip():
+            return " ", 1
+        tokens = count_tokens(text)
+        if tokens > MAX_INPUT_TOKENS:
+            return truncate_tokens(text, MAX_INPUT_TOKENS), MAX_INPUT_TOKENS
+        return text, tokens
+
+    def _batches(self, prepared: List[tuple]) -> List[List[int]]:
+        """Group positions of prepared inputs into requests within the API's input and token limits."""
+        batches, current, current_tokens = [], [], 0
+        for i, (_, tokens) in enumerate(prepared):
+            if current and (len(current) >= MAX_BATCH_INPUTS or current_tokens + tokens > MAX_BATCH_TOKENS):
+                batches.append(current)
+                current, current_tokens = [], 0
+            current.append(i)
+            current_tokens += tokens
+        if current:
+            batches.append(current)
+        return batches
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        if not texts:
+            return np.empty((0, 0), dtype=np.float32)
+
+        unique: Dict[str, str] = {}
+        for text in texts:
+            if text not in unique:
+                unique[text] = self._key(text)
+
+        vectors: Dict[str, np.ndarray] = {}
+        missing = []
+        for text, key in unique.items():
+            vec = self._lookup(key)
+            if vec is None:
+                missing.append(text)
+            else:
+                vectors[text] = vec
+
+        prepared = [self._prepare(text) for text in missing]
+        for batch in self._batches(prepared):
+            resp = self.client.embeddings.create(input=[prepared[i][0] for i in batch], model=self.model)
+            self.api_calls += 1
+            for i, item in zip(batch, resp.data):
+                vec = np.asarray(item.embedding, dtype=np.float32)
+                vectors[missing[i]] = vec
+                self._store(unique[missing[i]], vec)
+
+        logger.info(f"Embedded {len(texts)} texts: {len(unique)} unique, {len(missing)} sent to the API")
+        return np.stack([vectors[t] for t in texts])
+
+    def stats(self) -> Dict[str, int]:
+        return {**self.memory.stats(), "api_calls": self.api_calls}
+
+
+_embedding_service: Optional[EmbeddingService] = None
+_service_lock = threading.Lock()
+
+
+def get_embedding_service() -> EmbeddingService:
+    global _embedding_service
+    if _embedding_service is None:
+        with _service_lock:
+            if _embedding_service is None:
+                disk_path = cache_path("embeddings.sqlite") if EMBED_CACHE_DISK else None
+                if LLM_PROVIDER == "fake":
+                    # Own model name so fake vectors never mix with real ones in the disk cache
+                    _embedding_service = EmbeddingService(model="fake-embedding", client=FakeEmbeddingClient(),
+                                                          disk_path=disk_path)
+                else:
+                    _embedding_service = EmbeddingService(disk_path=disk_path)
+    return _embedding_service
+
+
+def get_embeddings(texts: List[str]) -> np.ndarray:
+    return get_embedding_service().embed(texts)
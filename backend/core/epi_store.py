@@ -0,0 +1,164 @@
+# core/epi_store.py
+
+import os
+import json
+import shutil
+import logging
+import numpy as np
+import pandas as pd
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from core.cache import CACHE_ROOT
+
+logger = logging.getLogger(__name__)
+
+EPI_STORE_DIR = os.getenv("EPI_STORE_DIR", os.path.join(CACHE_ROOT, "epi_store"))
+MANIFEST_FILE = "manifest.json"
+
+
+@dataclass
+class StatTable:
+    """How one epidemiology table is filtered and aggregated (shared by the SQL and local paths)."""
+    table: str
+    site_column: str
+    count_column: Optional[str] = None
+    dimensions: List[str] = field(default_factory=list)
+    area: bool = False
+    sex: bool = False
+
+
+STAT_TABLES = {
+    "by_site": StatTable("BY_SITE", "SITE", "COUNT", ["SITE", "SEX", "EVENT_TYPE", "YEAR"], sex=True),
+    "incident": StatTable("CANCER_INCIDENT", "CANCERTYPE", "CASECOUNT",
+                          ["AREA", "CANCERTYPE", "SEX", "TYPE", "YEAR"], area=True, sex=True),
+    "mortality": StatTable("CANCER_MORTALITY_RATE", "SITE"),
+    "child_cases": StatTable("CHILD_AGE_GROUP", "SITE", "COUNT", ["SITE", "AGE", "EVENT_TYPE", "YEAR"]),
+}
+
+
+def clean_table(df: pd.DataFrame, spec: StatTable) -> pd.DataFrame:
+    """Numeric counts/population (placeholders such as 'Data not presented' become NaN) plus YEAR_START."""
+    df = df.copy()
+    for column in (spec.count_column, "POPULATION"):
+        if column and column in df.columns:
+            df[column] = pd.to_numeric(df[column], errors="coerce")
+    if "YEAR" in df.columns:
+        df["YEAR"] = df["YEAR"].astype("string")
+        # Same semantics as TRY_TO_NUMBER(LEFT(YEAR, 4)): spans such as '2017-2021' use their first year
+        df["YEAR_START"] = pd.to_numeric(df["YEAR"].str[:4], errors="coerce").astype("Int64")
+    return df.sort_values(spec.site_column, kind="stable").reset_index(drop=True)
+
+
+def _ilike(value: str, pattern: str) -> bool:
+    # Site patterns are all of the form '%text%'
+    return pattern.strip("%").lower() in value.lower()
+
+
+def rate_frame(df: pd.DataFrame, dimensions: List[str], count_column: str, max_rows: int) -> pd.DataFrame:
+    """Local equivalent of the Snowflake rate query: cases, population, rate per 100k and YoY change."""
+    columns = dimensions + ["CASES", "POPULATION", "RATE_PER_100K", "YOY_CHANGE_PCT"]
+    if df.empty:
+        return pd.DataFrame(columns=columns)
+    agg = (df.groupby(dimensions, dropna=False, sort=False)[[count_column, "POPULATION"]]
+             .sum(min_count=1)
+             .rename(columns={count_column: "CASES"})
+             .reset_index())
+    agg = agg[agg["CASES"].notna() & (agg["POPULATION"] > 0)]
+    agg["RATE_PER_100K"] = (agg["CASES"] / agg["POPULATION"] * 100000).round(2)
+
+    # Year-over-year change between single years only; span rows ('2016-2020') get none
+    partition = [d for d in dimensions if d != "YEAR"]
+    single = agg["YEAR"].astype("string").str.fullmatch(r"\d{4}").fillna(False).astype(bool)
+    years = agg.loc[single].sort_values(partition + ["YEAR"], kind="stable")
+    previous = years.groupby(partition, dropna=False, sort=False)["RATE_PER_100K"].shift(1)
+    agg["YOY_CHANGE_PCT"] = ((years["RATE_PER_100K"] - previous) / previous.replace(0, np.nan) * 100).round(2)
+    agg = agg.sort_values(["YEAR", "CASES"], ascending=False, kind="stable")
+    return agg[columns].head(max_rows).reset_index(drop=True)
+
+
+def mortality_frame(df: pd.DataFrame, max_rows: int) -> pd.DataFrame:
+    columns = ["SITE", "FIRST_YEAR", "LAST_YEAR", "RECORDS"]
+    if df.empty:
+        return pd.DataFrame(columns=columns)
+    out = (df.groupby("SITE", dropna=False, sort=False)["YEAR"]
+             .agg(FIRST_YEAR="min", LAST_YEAR="max", RECORDS="size")
+             .reset_index())
+    return out.sort_values("RECORDS", ascending=False, kind="stable")[columns].head(max_rows).reset_index(drop=True)
+
+
+class EpiStore:
+    """Parquet snapshot of the Snowflake epidemiology tables, aggregated locally with pandas.
+
+    Each table is loaded once with per-site (and, for incidence, per-area) row
+    indexes, so a filter only touches the rows it selects. Filters and output
+    columns match ``build_statistics_queries`` in the Snowflake agent.
+    """
+
+    def __init__(self, store_dir: str = EPI_STORE_DIR):
+        self.store_dir = store_dir
+        with open(os.path.join(store_dir, MANIFEST_FILE), encoding="utf-8") as f:
+            self.manifest = json.load(f)
+        self.tables: Dict[str, pd.DataFrame] = {}
+        self.site_index: Dict[str, Dict[str, np.ndarray]] = {}
+        self.area_index: Dict[str, Dict[str, np.ndarray]] = {}
+        for name, spec in STAT_TABLES.items():
+            df = pd.read_parquet(os.path.join(store_dir, f"{name}.parquet"))
+            self.tables[name] = df
+            self.site_index[name] = df.groupby(spec.site_column, sort=False).indices
+            if spec.area:
+                self.area_index[name] = df.groupby("AREA", sort=False).indices
+        logger.info(f"Loaded epidemiology store {self.version} from {store_dir}")
+
+    @property
+    def version(self) -> str:
+        return self.manifest.get("created", "")
+
+    def _rows(self, name: str, filters) -> pd.DataFrame:
+        spec, df = STAT_TABLES[name], self.tables[name]
+        positions = None
+        if filters.site_patterns:
+            matched = [idx for site, idx in self.site_index[name].items()
+                       if any(_ilike(str(site), p) for p in filters.site_patterns)]
+            positions = np.concatenate(matched) if matched else np.empty(0, dtype=np.int64)
+        if spec.area and filters.area:
+            area_rows = self.area_index[name].get(filters.area, np.empty(0, dtype=np.int64))
+            positions = area_rows if positions is None else np.intersect1d(positions, area_rows)
+        rows = df if positions is None else df.iloc[np.sort(positions)]
+
+        mask = pd.Series(True, index=rows.index)
+        if spec.sex and filters.sex:
+            mask &= rows["SEX"].isin([filters.sex, "Male and Female"])
+        if filters.year_from is not None:
+            mask &= rows["YEAR_START"].ge(filters.year_from).fillna(False)
+        if filters.year_to is not None:
+            mask &= rows["YEAR_START"].le(filters.year_to).fillna(False)
+        return rows[mask]
+
+    def statistics(self, filters, max_rows: int, columnar: bool = False) -> Dict[str, Any]:
+        results = {}
+        for name, spec in STAT_TABLES.items():
+            rows = self._rows(name, filters)
+            if spec.count_column:
+                frame = rate_frame(rows, spec.dimensions, spec.count_column, max_rows)
+            else:
+                frame = mortality_frame(rows, max_rows)
+            results[name] = frame if columnar else frame.astype(object).where(frame.notna(), None).to_dict("records")
+        return results
+
+
+def write_store(tables: Dict[str, pd.DataFrame], manifest: Dict[str, Any], store_dir: str = EPI_STORE_DIR) -> None:
+    """Clean and write every table to a temporary directory, then swap it in atomically."""
+    tmp_dir = store_dir + ".tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    counts = {}
+    for name, spec in STAT_TABLES.items():
+        df = clean_table(tables[name], spec)
+        df.to_parquet(os.path.join(tmp_dir, f"{name}.parquet"), index=False)
+        counts[name] = len(df)
+    with open(os.path.join(tmp_dir, MANIFEST_FILE), "w", encoding="utf-8") as f:
+        json.dump({**manifest, "rows": counts}, f, indent=2)
+    shutil.rmtree(store_dir, ignore_errors=True)
+    os.replace(tmp_dir, store_dir)
+    logger.info(f"Wrote epidemiology store to {store_dir}: {counts}")
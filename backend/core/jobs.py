@@ -0,0 +1,202 @@
+# core/jobs.py
+
+import os
+import json
+import time
+import uuid
+import asyncio
+import sqlite3
+import logging
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+from core.cache import cache_path
+
+logger = logging.getLogger(__name__)
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_QUEUE_MAX = int(os.getenv("JOB_QUEUE_MAX", "50"))
+
+QUEUED, RUNNING, SUCCEEDED, FAILED = "queued", "running", "succeeded", "failed"
+
+
+class QueueFullError(Exception):
+    pass
+
+
+class JobStore:
+    """SQLite table of report jobs, so submitted work and results survive restarts."""
+
+    def __init__(self, path: Optional[str] = None):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path or cache_path("jobs.sqlite"), check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                query TEXT NOT NULL,
+                status TEXT NOT NULL,
+                stage TEXT,
+                progress TEXT,
+                result TEXT,
+                error TEXT,
+                created REAL NOT NULL,
+                updated REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status, created)")
+        self._conn.commit()
+
+    def create(self, query: str) -> str:
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (id, query, status, progress, created, updated) VALUES (?, ?, ?, ?, ?, ?)",
+                (job_id, query, QUEUED, json.dumps({}), now, now),
+            )
+            self._conn.commit()
+        return job_id
+
+    def update(self, job_id: str, **fields: Any) -> None:
+        if "progress" in fields:
+            fields["progress"] = json.dumps(fields["progress"])
+        fields["updated"] = time.time()
+        columns = ", ".join(f"{name} = ?" for name in fields)
+        with self._lock:
+            self._conn.execute(f"UPDATE jobs SET {columns} WHERE id = ?", (*fields.values(), job_id))
+            self._conn.commit()
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job["progress"] = json.loads(job["progress"] or "{}")
+        return job
+
+    def count(self, status: str) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM jobs WHERE status = ?", (status,)).fetchone()[0]
+
+    def pending_ids(self) -> List[str]:
+        """Jobs to resume on startup: still queued, or running when the process died."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id FROM jobs WHERE status IN (?, ?) ORDER BY created", (QUEUED, RUNNING)
+            ).fetchall()
+        return [row["id"] for row in rows]
+
+
+class JobManager:
+    """Bounded pool of asyncio workers running report pipelines for queued jobs.
+
+    ``runner(query)`` must return an async iterator of report events (see
+    ``CancerResearchMCP.run_stream``); stage and agent events are recorded as
+    job progress and token events are assembled into the result.
+    """
+
+    def __init__(self, runner: Callable, store: Optional[JobStore] = None,
+                 workers: int = JOB_WORKERS, queue_max: int = JOB_QUEUE_MAX):
+        self.runner = runner
+        self.store = store or JobStore()
+        self.workers = workers
+        self.queue_max = queue_max
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+
+    async def start(self) -> None:
+        # Queue entries are futures of job ids, so submit can hold its slot while the job row is written
+        self._queue = asyncio.Queue(maxsize=self.queue_max)
+        pending = await asyncio.to_thread(self.store.pending_ids)
+        self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+        if pending:
+            # Resumed jobs wait for room like new ones rather than overflowing the queue
+            self._tasks.append(asyncio.create_task(self._resume(pending)))
+        logger.info(f"Job manager started with {self.workers} workers, {len(pending)} jobs resumed")
+
+    async def _resume(self, job_ids: List[str]) -> None:
+        for job_id in job_ids:
+            await self._update(job_id, status=QUEUED)
+            slot = asyncio.get_running_loop().create_future()
+            slot.set_result(job_id)
+            await self._queue.put(slot)
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def submit(self, query: str) -> str:
+        slot = asyncio.get_running_loop().create_future()
+        try:
+            self._queue.put_nowait(slot)
+        except asyncio.QueueFull:
+            raise QueueFullError(f"Job queue is full ({self.queue_max} jobs waiting)")
+        try:
+            job_id = await asyncio.to_thread(self.store.create, query)
+        except BaseException:
+            # Give the slot back: the worker that takes it skips it
+            slot.set_result(None)
+            raise
+        slot.set_result(job_id)
+        return job_id
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return await asyncio.to_thread(self.store.get, job_id)
+
+    async def _update(self, job_id: str, **fields: Any) -> None:
+        # SQLite writes commit to disk; keep them off the event loop
+        await asyncio.to_thread(self.store.update, job_id, **fields)
+
+    async def _worker(self, worker_id: int) -> None:
+        while True:
+            slot = await self._queue.get()
+            job_id = None
+            try:
+                # Shielded: a worker stopping mustn't cancel a slot its submit() still resolves
+                job_id = await asyncio.shield(slot)
+                if job_id is None:
+                    continue
+                await self._run_job(job_id)
+            except asyncio.CancelledError:
+                # Shutting down: leave the job queued so it resumes on the next start
+                if job_id is not None:
+                    await self._update(job_id, status=QUEUED)
+                raise
+            except Exception as e:
+                logger.exception(f"Job {job_id} crashed")
+                await self._update(job_id, status=FAILED, error=str(e))
+            finally:
+                self._queue.task_done()
+
+    async def _run_job(self, job_id: str) -> None:
+        job = await self.get(job_id)
+        if job is None:
+            return
+        logger.info(f"Running job {job_id}: {job['query']}")
+        progress: Dict[str, Any] = {"agents": {}}
+        await self._update(job_id, status=RUNNING, stage="starting", progress=progress)
+
+        tokens = []
+        async for event in self.runner(job["query"]):
+            kind = event.get("event")
+            if kind == "stage":
+                await self._update(job_id, stage=event["stage"])
+            elif kind == "agent":
+                progress["agents"][event["name"]] = event["status"]
+                await self._update(job_id, progress=progress)
+            elif kind == "context":
+                progress["prompt_tokens"] = event["prompt_tokens"]
+                progress["context"] = {k: v["kept"] for k, v in event["sections"].items()}
+                await self._update(job_id, progress=progress)
+            elif kind == "token":
+                tokens.append(event["text"])
+            elif kind == "error":
+                await self._update(job_id, status=FAILED, stage="failed", error=event["message"])
+                return
+        await self._update(job_id, status=SUCCEEDED, stage="done", result="".join(tokens))
+        logger.info(f"Job {job_id} finished")
@@ -0,0 +1,460 @@
+# core/llm.py
+"""
+One place for every LLM call: async provider backends behind a common
+interface, each with pooled clients, a token-bucket rate limiter per
+provider/model and a shared retry/backoff policy.
+
+- ``OpenAIProvider`` (``AsyncOpenAI``) and ``GeminiProvider`` (``genai.Client().aio``)
+  share one client per event loop: on the server every agent runs on its loop,
+  so there is a single pooled client per provider; CLIs and scripts that call
+  ``asyncio.run`` get a client valid in theirs
+- requests and (estimated) tokens per minute are throttled before each call;
+  ``LLM_RPM_<PROVIDER>`` / ``LLM_TPM_<PROVIDER>`` set the limits, optionally
+  per model as ``LLM_RPM_<PROVIDER>_<MODEL>``; 0 disables a limit
+- rate limits, server errors and dropped connections are retried with
+  exponential backoff and full jitter, honouring ``Retry-After`` when sent;
+  a stream is only retried before its first chunk
+- ``FakeProvider`` returns deterministic text derived from the prompt, with
+  optional latency and injected rate-limit errors; ``LLM_PROVIDER=fake``
+  routes every call (and embeddings) to it for offline load tests
+"""
+
+import os
+import re
+import time
+import random
+import asyncio
+import hashlib
+import logging
+import threading
+import weakref
+from dataclasses import dataclass
+from types import SimpleNamespace
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from core.tokens import count_tokens
+
+logger = logging.getLogger(__name__)
+
+# Forces one provider for every call (e.g. "fake"); empty uses each caller's provider
+LLM_PROVIDER = os.getenv("LLM_PROVIDER", "").lower()
+REPORT_LLM_PROVIDER = os.getenv("REPORT_LLM_PROVIDER", "gemini").lower()
+RAG_LLM_PROVIDER = os.getenv("RAG_LLM_PROVIDER", "openai").lower()
+
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-2.0-flash-001")
+OPENAI_CHAT_MODEL = os.getenv("OPENAI_CHAT_MODEL", "gpt-4o-mini")
+FAKE_MODEL = "fake"
+
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "5"))
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "2"))
+LLM_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", "60"))
+RETRY_STATUS = {408, 429, 500, 502, 503, 504}
+
+# Default (requests, tokens) per minute; the tokens limit counts prompt + expected output
+DEFAULT_LIMITS = {
+    "gemini": (60, 1_000_000),
+    "openai": (500, 200_000),
+    "fake": (0, 0),
+}
+# Output assumed for rate limiting when the call sets no max_tokens
+LLM_OUTPUT_TOKENS_ESTIMATE = int(os.getenv("LLM_OUTPUT_TOKENS_ESTIMATE", "512"))
+# A bucket holds this many seconds' worth of its rate, the largest burst allowed
+BURST_SECONDS = 15
+
+LLM_FAKE_LATENCY = float(os.getenv("LLM_FAKE_LATENCY", "0"))
+LLM_FAKE_ERROR_RATE = float(os.getenv("LLM_FAKE_ERROR_RATE", "0"))
+FAKE_WORDS = 120
+FAKE_EMBED_DIM = 1536
+
+
+class LLMRateLimitError(Exception):
+    """Raised by the fake provider to exercise the retry path; carries a 429 like the real SDK errors."""
+    status_code = 429
+
+
+def _sdk_error_types() -> Tuple[tuple, tuple]:
+    """(rate-limit, connection) exception types of the installed SDKs; both backends are optional imports."""
+    rate_limit, connection = [LLMRateLimitError], [asyncio.TimeoutError, ConnectionError]
+    try:
+        import openai
+        rate_limit.append(openai.RateLimitError)
+        connection.append(openai.APIConnectionError)  # includes APITimeoutError
+    except ImportError:
+        pass
+    try:
+        from google.api_core import exceptions as google_exceptions
+        rate_limit.append(google_exceptions.ResourceExhausted)
+    except ImportError:
+        pass
+    try:
+        import httpx
+        connection.append(httpx.TransportError)
+    except ImportError:
+        pass
+    return tuple(rate_limit), tuple(connection)
+
+
+_RATE_LIMIT_ERRORS, _CONNECTION_ERRORS = _sdk_error_types()
+
+
+def error_status(e: Exception) -> Optional[int]:
+    """HTTP status of an SDK error: ``status_code`` on OpenAI errors, ``code`` on google-genai / api-core ones."""
+    for attr in ("status_code", "code"):
+        status = getattr(e, attr, None)
+        if isinstance(status, int):
+            return status
+    return None
+
+
+def is_rate_limit_error(e: Exception) -> bool:
+    if isinstance(e, _RATE_LIMIT_ERRORS):
+        return True
+    # google-genai raises ClientError for every 4xx; its code / status say which
+    return error_status(e) == 429 or getattr(e, "status", None) == "RESOURCE_EXHAUSTED"
+
+
+def is_transient_error(e: Exception) -> bool:
+    """Rate limits, server errors, timeouts and dropped connections; other errors won't change on retry."""
+    return is_rate_limit_error(e) or error_status(e) in RETRY_STATUS or isinstance(e, _CONNECTION_ERRORS)
+
+
+def _retry_after(e: Exception) -> Optional[float]:
+    response = getattr(e, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+@dataclass
+class RetryPolicy:
+    max_retries: int = LLM_MAX_RETRIES
+    backoff_base: float = LLM_BACKOFF_BASE
+    backoff_max: float = LLM_BACKOFF_MAX
+
+    def should_retry(self, e: Exception, attempt: int) -> bool:
+        return attempt < self.max_retries and is_transient_error(e)
+
+    def delay(self, e: Exception, attempt: int) -> float:
+        retry_after = _retry_after(e)
+        if retry_after is not None:
+            return min(self.backoff_max, retry_after)
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+
+class TokenBucket:
+    """Refills at ``rate`` per second up to ``capacity``.
+
+    Callers reserve what they need up front, which may take the bucket below
+    zero, and sleep until it would have refilled: waiters are served in
+    arrival order without polling. Thread-safe, and not tied to an event loop.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount: float) -> float:
+        """Take ``amount`` (capped at the capacity) and return the seconds to wait before using it."""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= min(amount, self.capacity)
+            return max(0.0, -self.tokens / self.rate)
+
+
+class RateLimiter:
+    """Requests-per-minute and tokens-per-minute buckets for one provider/model."""
+
+    def __init__(self, rpm: float, tpm: float):
+        self.rpm, self.tpm = rpm, tpm
+        self.requests = TokenBucket(rpm / 60, max(1.0, rpm / 60 * BURST_SECONDS)) if rpm else None
+        self.tokens = TokenBucket(tpm / 60, max(1.0, tpm / 60 * BURST_SECONDS)) if tpm else None
+        self.waited = 0.0
+
+    async def acquire(self, tokens: int) -> float:
+        wait = max(self.requests.reserve(1) if self.requests else 0.0,
+                   self.tokens.reserve(tokens) if self.tokens else 0.0)
+        if wait > 0:
+            self.waited += wait
+            await asyncio.sleep(wait)
+        return wait
+
+
+def _env_suffix(name: str) -> str:
+    return re.sub(r"\W", "_", name).upper()
+
+
+def rate_limits(provider: str, model: str) -> Tuple[float, float]:
+    rpm, tpm = DEFAULT_LIMITS.get(provider, (0, 0))
+    limits = []
+    for kind, default in (("RPM", rpm), ("TPM", tpm)):
+        value = (os.getenv(f"LLM_{kind}_{_env_suffix(provider)}_{_env_suffix(model)}")
+                 or os.getenv(f"LLM_{kind}_{_env_suffix(provider)}"))
+        limits.append(float(value) if value else float(default))
+    return limits[0], limits[1]
+
+
+_limiters: Dict[Tuple[str, str], RateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(provider: str, model: str) -> RateLimiter:
+    """Process-wide limiter for a provider/model, shared by every caller and event loop."""
+    key = (provider, model)
+    with _limiters_lock:
+        if key not in _limiters:
+            _limiters[key] = RateLimiter(*rate_limits(provider, model))
+        return _limiters[key]
+
+
+class LLMProvider:
+    """Text generation backend. Subclasses implement ``_generate`` / ``_stream`` and ``_make_client``."""
+
+    name = "base"
+    label = "LLM"
+
+    def __init__(self, model: str, retry: Optional[RetryPolicy] = None):
+        self.model = model
+        self.retry = retry or RetryPolicy()
+        # One SDK client (and its connection pool) per event loop
+        self._clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Any]" = weakref.WeakKeyDictionary()
+        self._clients_lock = threading.Lock()
+        self.calls = 0
+        self.retries = 0
+
+    def _make_client(self) -> Any:
+        return None
+
+    def client(self) -> Any:
+        loop = asyncio.get_running_loop()
+        with self._clients_lock:
+            client = self._clients.get(loop)
+            if client is None:
+                client = self._clients[loop] = self._make_client()
+        return client
+
+    @staticmethod
+    def _params(temperature: Optional[float], max_tokens: Optional[int]) -> Dict[str, Any]:
+        params = {}
+        if temperature is not None:
+            params["temperature"] = temperature
+        if max_tokens is not None:
+            params["max_tokens"] = max_tokens
+        return params
+
+    async def _throttle(self, model: str, prompt: str, max_tokens: Optional[int]) -> None:
+        estimate = count_tokens(prompt) + (max_tokens or LLM_OUTPUT_TOKENS_ESTIMATE)
+        wait = await get_limiter(self.name, model).acquire(estimate)
+        if wait > 1:
+            logger.info(f"{self.label} {model} throttled for {wait:.1f}s by the local rate limit")
+
+    async def _backoff(self, e: Exception, attempt: int, model: str) -> None:
+        delay = self.retry.delay(e, attempt)
+        self.retries += 1
+        logger.warning(f"{self.label} {model} call failed ({type(e).__name__}: {e}), "
+                       f"retrying in {delay:.1f}s (attempt {attempt + 1})")
+        await asyncio.sleep(delay)
+
+    async def generate(self, prompt: str, model: Optional[str] = None, temperature: Optional[float] = None,
+                       max_tokens: Optional[int] = None) -> str:
+        """Complete ``prompt``; transient errors are retried per the provider's policy."""
+        model = model or self.model
+        params = self._params(temperature, max_tokens)
+        attempt = 0
+        while True:
+            await self._throttle(model, prompt, max_tokens)
+            self.calls += 1
+            try:
+                return await self._generate(prompt, model, params)
+            except Exception as e:
+                if not self.retry.should_retry(e, attempt):
+                    raise
+                await self._backoff(e, attempt, model)
+                attempt += 1
+
+    async def stream(self, prompt: str, model: Optional[str] = None, temperature: Optional[float] = None,
+                     max_tokens: Optional[int] = None) -> AsyncIterator[str]:
+        """Yield output text as it is generated; errors before the first chunk are retried."""
+        model = model or self.model
+        params = self._params(temperature, max_tokens)
+        attempt = 0
+        while True:
+            await self._throttle(model, prompt, max_tokens)
+            self.calls += 1
+            started = False
+            try:
+                async for text in self._stream(prompt, model, params):
+                    if text:
+                        started = True
+                        yield text
+                return
+            except Exception as e:
+                if started or not self.retry.should_retry(e, attempt):
+                    raise
+                await self._backoff(e, attempt, model)
+                attempt += 1
+
+    async def _generate(self, prompt: str, model: str, params: Dict[str, Any]) -> str:
+        raise NotImplementedError
+
+    async def _stream(self, prompt: str, model: str, params: Dict[str, Any]) -> AsyncIterator[str]:
+        # Backends without streaming return the whole completion as one chunk
+        yield await self._generate(prompt, model, params)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"provider": self.name, "model": self.model, "calls": self.calls, "retries": self.retries}
+
+
+class OpenAIProvider(LLMProvider):
+    name = "openai"
+    label = "OpenAI"
+
+    def __init__(self, model: str = OPENAI_CHAT_MODEL, retry: Optional[RetryPolicy] = None):
+        super().__init__(model, retry)
+
+    def _make_client(self):
+        from openai import AsyncOpenAI
+        # Retries happen here, under the shared policy and rate limit
+        return AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"), max_retries=0)
+
+    async def _generate(self, prompt: str, model: str, params: Dict[str, Any]) -> str:
+        response = await self.client().chat.completions.create(
+            model=model, messages=[{"role": "user", "content": prompt}], **params)
+        return response.choices[0].message.content or ""
+
+    async def _stream(self, prompt: str, model: str, params: Dict[str, Any]) -> AsyncIterator[str]:
+        stream = await self.client().chat.completions.create(
+            model=model, messages=[{"role": "user", "content": prompt}], stream=True, **params)
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+
+class GeminiProvider(LLMProvider):
+    name = "gemini"
+    label = "Gemini"
+
+    def __init__(self, model: str = GEMINI_MODEL, retry: Optional[RetryPolicy] = None):
+        super().__init__(model, retry)
+
+    def _make_client(self):
+        from google import genai
+        return genai.Client(api_key=os.getenv("GEMINI_API_KEY"))
+
+    @staticmethod
+    def _config(params: Dict[str, Any]):
+        if not params:
+            return None
+        from google.genai import types
+        return types.GenerateContentConfig(temperature=params.get("temperature"),
+                                           max_output_tokens=params.get("max_tokens"))
+
+    async def _generate(self, prompt: str, model: str, params: Dict[str, Any]) -> str:
+        response = await self.client().aio.models.generate_content(
+            model=model, contents=prompt, config=self._config(params))
+        return response.text or ""
+
+    async def _stream(self, prompt: str, model: str, params: Dict[str, Any]) -> AsyncIterator[str]:
+        stream = await self.client().aio.models.generate_content_stream(
+            model=model, contents=prompt, config=self._config(params))
+        async for chunk in stream:
+            if chunk.text:
+                yield chunk.text
+
+
+_FAKE_WORD = re.compile(r"[A-Za-z][A-Za-z-]{2,}")
+
+
+def fake_completion(prompt: str, model: str = FAKE_MODEL, max_words: int = FAKE_WORDS) -> str:
+    """Same prompt and model, same text: words drawn from the prompt with a seed from its hash."""
+    digest = hashlib.sha256(f"{model}\0{prompt}".encode("utf-8")).hexdigest()
+    words = _FAKE_WORD.findall(prompt) or ["lorem", "ipsum"]
+    rng = random.Random(digest)
+    body = " ".join(rng.choice(words) for _ in range(max_words))
+    return f"## Response {digest[:12]}\n\n{body}\n"
+
+
+class FakeProvider(LLMProvider):
+    """Offline stand-in: deterministic output, configurable latency and injected 429s."""
+
+    name = "fake"
+    label = "Fake LLM"
+
+    def __init__(self, model: str = FAKE_MODEL, retry: Optional[RetryPolicy] = None,
+                 latency: float = LLM_FAKE_LATENCY, error_rate: float = LLM_FAKE_ERROR_RATE):
+        super().__init__(model, retry)
+        self.latency = latency
+        self.error_rate = error_rate
+        self._errors = random.Random(0)
+
+    def _text(self, prompt: str, model: str, params: Dict[str, Any]) -> str:
+        max_words = min(FAKE_WORDS, params.get("max_tokens") or FAKE_WORDS)
+        return fake_completion(prompt, model, max_words)
+
+    async def _maybe_fail(self) -> None:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if self.error_rate and self._errors.random() < self.error_rate:
+            raise LLMRateLimitError("429 RESOURCE_EXHAUSTED (injected by the fake provider)")
+
+    async def _generate(self, prompt: str, model: str, params: Dict[str, Any]) -> str:
+        await self._maybe_fail()
+        return self._text(prompt, model, params)
+
+    async def _stream(self, prompt: str, model: str, params: Dict[str, Any]) -> AsyncIterator[str]:
+        await self._maybe_fail()
+        words = self._text(prompt, model, params).split(" ")
+        for i in range(0, len(words), 8):
+            if self.latency:
+                await asyncio.sleep(self.latency / 10)
+            yield " ".join(words[i:i + 8]) + (" " if i + 8 < len(words) else "")
+
+
+class FakeEmbeddingClient:
+    """Drop-in for ``OpenAI().embeddings``: hashed bag-of-words vectors, so similar texts stay similar."""
+
+    def __init__(self, dim: int = FAKE_EMBED_DIM):
+        self.dim = dim
+        self.embeddings = self
+
+    def _vector(self, text: str) -> List[float]:
+        vec = np.zeros(self.dim, dtype=np.float32)
+        for word in re.findall(r"\w+", text.lower()):
+            h = int.from_bytes(hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest(), "little")
+            vec[h % self.dim] += 1.0 if (h >> 32) & 1 else -1.0
+        norm = np.linalg.norm(vec)
+        return (vec / norm if norm else vec).tolist()
+
+    def create(self, input: List[str], model: str) -> Any:
+        return SimpleNamespace(data=[SimpleNamespace(embedding=self._vector(t)) for t in input])
+
+
+PROVIDERS = {
+    "openai": OpenAIProvider,
+    "gemini": GeminiProvider,
+    "fake": FakeProvider,
+}
+
+_providers: Dict[str, LLMProvider] = {}
+_providers_lock = threading.Lock()
+
+
+def get_provider(name: str = REPORT_LLM_PROVIDER) -> LLMProvider:
+    """Process-wide provider by name; ``LLM_PROVIDER`` overrides the name for every caller."""
+    name = (LLM_PROVIDER or name).lower()
+    if name not in PROVIDERS:
+        raise ValueError(f"Unknown LLM provider '{name}', expected one of {', '.join(PROVIDERS)}")
+    with _providers_lock:
+        if name not in _providers:
+            _providers[name] = PROVIDERS[name]()
+        return _providers[name]
@@ -0,0 +1,270 @@
+# core/llm_cache.py
+"""
+Response cache in front of the LLM providers, in two layers:
+
+- exact: prompt hash + provider + model + generation parameters, in a memory
+  LRU with an optional SQLite tier (``LLM_CACHE_DISK``), both with a TTL
+- semantic (``LLM_SEMANTIC_CACHE``, off by default): a prompt whose embedding
+  is within ``LLM_SEMANTIC_THRESHOLD`` cosine similarity of a cached prompt for
+  the same provider/model/parameters reuses that response. Callers opt in per
+  call, and may match on a shorter ``match_text`` within a ``scope`` (e.g. the
+  question, among answers over the same documents) when most of the prompt is
+  context the embedding would be dominated by. The index lives in memory and
+  points at exact-layer entries, so it is bounded and expires with them.
+
+``CachedProvider`` wraps an ``LLMProvider`` with the same ``generate`` /
+``stream`` calls; a streamed hit yields the cached text in one chunk, and a
+streamed miss is stored only once the stream completes.
+"""
+
+import os
+import json
+import time
+import asyncio
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from core.cache import MemoryLRUCache, DiskLRUCache, cache_path
+from core.llm import LLMProvider, get_provider
+
+logger = logging.getLogger(__name__)
+
+LLM_CACHE = os.getenv("LLM_CACHE", "true").lower() in ("1", "true", "yes")
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", str(7 * 24 * 3600)))
+LLM_CACHE_ITEMS = int(os.getenv("LLM_CACHE_ITEMS", "5000"))
+LLM_CACHE_DISK = os.getenv("LLM_CACHE_DISK", "false").lower() in ("1", "true", "yes")
+LLM_CACHE_DISK_MB = int(os.getenv("LLM_CACHE_DISK_MB", "256"))
+LLM_SEMANTIC_CACHE = os.getenv("LLM_SEMANTIC_CACHE", "false").lower() in ("1", "true", "yes")
+LLM_SEMANTIC_THRESHOLD = float(os.getenv("LLM_SEMANTIC_THRESHOLD", "0.97"))
+LLM_SEMANTIC_ITEMS = int(os.getenv("LLM_SEMANTIC_ITEMS", "2000"))
+
+
+def namespace(provider: str, model: str, params: Dict[str, Any], scope: Optional[str] = None) -> str:
+    """Responses are only shared between calls to the same provider, model, parameters and scope."""
+    return json.dumps({"provider": provider, "model": model, **params, **({"scope": scope} if scope else {})},
+                      sort_keys=True)
+
+
+def exact_key(ns: str, prompt: str) -> str:
+    return hashlib.sha256(f"{ns}\0{prompt}".encode("utf-8")).hexdigest()
+
+
+class SemanticIndex:
+    """Prompt embeddings per namespace, LRU-bounded, searched by cosine similarity."""
+
+    def __init__(self, max_items: int = LLM_SEMANTIC_ITEMS):
+        self.max_items = max_items
+        self._entries: "OrderedDict[str, Tuple[str, np.ndarray]]" = OrderedDict()
+        # Stacked vectors per namespace, rebuilt after the entries change
+        self._matrices: Dict[str, Tuple[List[str], np.ndarray]] = {}
+        self._lock = threading.Lock()
+
+    def add(self, ns: str, key: str, vec: np.ndarray) -> None:
+        vec = np.asarray(vec, dtype=np.float32)
+        norm = np.linalg.norm(vec)
+        with self._lock:
+            self._entries[key] = (ns, vec / norm if norm else vec)
+            self._entries.move_to_end(key)
+            self._matrices.pop(ns, None)
+            while len(self._entries) > self.max_items:
+                _, (old_ns, _) = self._entries.popitem(last=False)
+                self._matrices.pop(old_ns, None)
+
+    def remove(self, key: str) -> None:
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self._matrices.pop(entry[0], None)
+
+    def search(self, ns: str, vec: np.ndarray, threshold: float) -> Optional[Tuple[str, float]]:
+        """Most similar cached prompt at or above ``threshold``, as (exact key, similarity)."""
+        vec = np.asarray(vec, dtype=np.float32)
+        norm = np.linalg.norm(vec)
+        if not norm:
+            return None
+        with self._lock:
+            if ns not in self._matrices:
+                keys = [k for k, (n, _) in self._entries.items() if n == ns]
+                if not keys:
+                    return None
+                self._matrices[ns] = (keys, np.stack([self._entries[k][1] for k in keys]))
+            keys, matrix = self._matrices[ns]
+            scores = matrix @ (vec / norm)
+            best = int(np.argmax(scores))
+            if scores[best] < threshold:
+                return None
+            self._entries.move_to_end(keys[best])
+            return keys[best], float(scores[best])
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class LLMResponseCache:
+    def __init__(self, ttl: float = LLM_CACHE_TTL, max_items: int = LLM_CACHE_ITEMS,
+                 disk_path: Optional[str] = None, semantic: bool = LLM_SEMANTIC_CACHE,
+                 threshold: float = LLM_SEMANTIC_THRESHOLD, embed=None):
+        self.ttl = ttl
+        self.memory = MemoryLRUCache(max_items=max_items, ttl=ttl)
+        self.disk = DiskLRUCache(disk_path, max_bytes=LLM_CACHE_DISK_MB * 1024 * 1024) if disk_path else None
+        self.semantic = SemanticIndex() if semantic else None
+        self.threshold = threshold
+        self._embed = embed
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def _count(self, counter: str) -> None:
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def get_exact(self, key: str) -> Optional[str]:
+        text = self.memory.get(key)
+        if text is None and self.disk is not None:
+            raw = self.disk.get(key)
+            if raw is not None:
+                entry = json.loads(raw)
+                text = entry["text"]
+                self.memory.set(key, text, ttl=max(entry["expires"] - time.time(), 1))
+        return text
+
+    def put(self, key: str, text: str) -> None:
+        self.memory.set(key, text)
+        if self.disk is not None:
+            entry = {"text": text, "expires": time.time() + self.ttl}
+            self.disk.set(key, json.dumps(entry).encode("utf-8"), ttl=self.ttl)
+
+    async def _prompt_embedding(self, prompt: str) -> Optional[np.ndarray]:
+        if self._embed is None:
+            from core.embeddings import get_embeddings
+            self._embed = get_embeddings
+        try:
+            loop = asyncio.get_running_loop()
+            return (await loop.run_in_executor(None, self._embed, [prompt]))[0]
+        except Exception as e:
+            logger.warning(f"Semantic LLM cache lookup skipped, embedding failed: {e}")
+            return None
+
+    async def lookup(self, ns: str, prompt: str, semantic: bool = False,
+                     match_text: Optional[str] = None) -> Tuple[str, Optional[str], Optional[np.ndarray]]:
+        """(exact key, cached text or None, embedding of ``match_text`` (default: the prompt) when the semantic layer was searched)."""
+        key = exact_key(ns, prompt)
+        text = self.get_exact(key)
+        if text is not None:
+            self._count("exact_hits")
+            return key, text, None
+        vec = None
+        if semantic and self.semantic is not None:
+            vec = await self._prompt_embedding(match_text or prompt)
+            match = self.semantic.search(ns, vec, self.threshold) if vec is not None else None
+            if match is not None:
+                text = self.get_exact(match[0])
+                if text is not None:
+                    self._count("semantic_hits")
+                    logger.info(f"Semantic LLM cache hit (similarity {match[1]:.3f})")
+                    return key, text, vec
+                # The response it pointed at has expired or been evicted
+                self.semantic.remove(match[0])
+        self._count("misses")
+        return key, None, vec
+
+    def store(self, ns: str, key: str, text: str, vec: Optional[np.ndarray]) -> None:
+        if not text:
+            return
+        self.put(key, text)
+        if vec is not None and self.semantic is not None:
+            self.semantic.add(ns, key, vec)
+
+    def clear(self) -> None:
+        self.memory.clear()
+        if self.disk is not None:
+            self.disk.clear()
+        if self.semantic is not None:
+            self.semantic = SemanticIndex(self.semantic.max_items)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "exact_hits": self.exact_hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "size": len(self.memory),
+            "semantic_size": len(self.semantic) if self.semantic is not None else 0,
+        }
+
+
+class CachedProvider:
+    """An ``LLMProvider`` behind the response cache; ``semantic=True`` also allows near-duplicate prompts to hit."""
+
+    def __init__(self, provider: LLMProvider, cache: Optional[LLMResponseCache]):
+        self.provider = provider
+        self.cache = cache
+        self.name = provider.name
+        self.label = provider.label
+        self.model = provider.model
+
+    def _namespace(self, model: Optional[str], temperature: Optional[float], max_tokens: Optional[int],
+                   scope: Optional[str]) -> str:
+        return namespace(self.provider.name, model or self.provider.model,
+                         LLMProvider._params(temperature, max_tokens), scope)
+
+    async def generate(self, prompt: str, model: Optional[str] = None, temperature: Optional[float] = None,
+                       max_tokens: Optional[int] = None, semantic: bool = False,
+                       match_text: Optional[str] = None, scope: Optional[str] = None) -> str:
+        if self.cache is None:
+            return await self.provider.generate(prompt, model, temperature, max_tokens)
+        ns = self._namespace(model, temperature, max_tokens, scope)
+        key, text, vec = await self.cache.lookup(ns, prompt, semantic, match_text)
+        if text is not None:
+            return text
+        text = await self.provider.generate(prompt, model, temperature, max_tokens)
+        self.cache.store(ns, key, text, vec)
+        return text
+
+    async def stream(self, prompt: str, model: Optional[str] = None, temperature: Optional[float] = None,
+                     max_tokens: Optional[int] = None, semantic: bool = False,
+                     match_text: Optional[str] = None, scope: Optional[str] = None) -> AsyncIterator[str]:
+        if self.cache is None:
+            async for text in self.provider.stream(prompt, model, temperature, max_tokens):
+                yield text
+            return
+        ns = self._namespace(model, temperature, max_tokens, scope)
+        key, cached, vec = await self.cache.lookup(ns, prompt, semantic, match_text)
+        if cached is not None:
+            yield cached
+            return
+        parts = []
+        async for text in self.provider.stream(prompt, model, temperature, max_tokens):
+            parts.append(text)
+            yield text
+        # Only a stream that ran to completion is cached
+        self.cache.store(ns, key, "".join(parts), vec)
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self.provider.stats(), "cache": self.cache.stats() if self.cache is not None else None}
+
+
+_llm_cache: Optional[LLMResponseCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_llm_cache() -> Optional[LLMResponseCache]:
+    """Process-wide response cache, or None when ``LLM_CACHE`` is off."""
+    global _llm_cache
+    if not LLM_CACHE:
+        return None
+    if _llm_cache is None:
+        with _cache_lock:
+            if _llm_cache is None:
+                disk_path = cache_path("llm_responses.sqlite") if LLM_CACHE_DISK else None
+                _llm_cache = LLMResponseCache(disk_path=disk_path)
+    return _llm_cache
+
+
+def get_cached_provider(name: str) -> CachedProvider:
+    return CachedProvider(get_provider(name), get_llm_cache())
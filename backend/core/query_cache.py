@@ -0,0 +1,191 @@
+# core/query_cache.py
+
+import os
+import re
+import json
+import time
+import hashlib
+import logging
+import threading
+from typing import Any, Callable, Dict, Optional
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from core.cache import MemoryLRUCache, CACHE_ROOT
+
+logger = logging.getLogger(__name__)
+
+# Epidemiology tables are reference data refreshed a few times a year, so a day is conservative
+QUERY_CACHE_TTL = float(os.getenv("SNOWFLAKE_CACHE_TTL", "86400"))
+QUERY_CACHE_ITEMS = int(os.getenv("SNOWFLAKE_CACHE_ITEMS", "256"))
+QUERY_CACHE_DISK = os.getenv("SNOWFLAKE_CACHE_DISK", "false").lower() in ("1", "true", "yes")
+QUERY_CACHE_DISK_MB = int(os.getenv("SNOWFLAKE_CACHE_DISK_MB", "512"))
+
+_QUOTED = re.compile(r"('(?:[^']|'')*')")
+
+
+def normalize_sql(sql: str) -> str:
+    """Collapse whitespace outside string literals and drop a trailing semicolon."""
+    parts = _QUOTED.split(sql.strip().rstrip(";"))
+    return "".join(part if i % 2 else re.sub(r"\s+", " ", part) for i, part in enumerate(parts)).strip()
+
+
+def query_key(sql: str, params: Optional[Dict[str, Any]], kind: str) -> str:
+    payload = json.dumps({"sql": normalize_sql(sql), "params": params or {}, "kind": kind},
+                         sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _to_arrow(value: Any, kind: str) -> pa.Table:
+    if kind == "arrow":
+        return value
+    if kind == "df":
+        return pa.Table.from_pandas(value, preserve_index=False)
+    return pa.Table.from_pylist(value)
+
+
+def _from_arrow(table: pa.Table, kind: str) -> Any:
+    if kind == "arrow":
+        return table
+    if kind == "df":
+        return table.to_pandas()
+    return table.to_pylist()
+
+
+def _copy(value: Any, kind: str) -> Any:
+    # Callers reshape results freely; hand out copies so the cached entry stays intact
+    if kind == "df":
+        return value.copy()
+    if kind == "rows":
+        return [dict(row) for row in value]
+    return value
+
+
+class QueryResultCache:
+    """TTL cache of query results keyed by normalised SQL + bound parameters.
+
+    ``kind`` is ``rows`` (list of dicts), ``df`` (DataFrame) or ``arrow`` (Table).
+    Results live in a memory LRU and, with ``disk_dir``, as Parquet files that
+    survive restarts. Only successful loads are cached: a loader that raises
+    leaves the cache untouched.
+    """
+
+    def __init__(self, ttl: float = QUERY_CACHE_TTL, max_items: int = QUERY_CACHE_ITEMS,
+                 disk_dir: Optional[str] = None, disk_max_bytes: int = QUERY_CACHE_DISK_MB * 1024 * 1024):
+        self.ttl = ttl
+        self.memory = MemoryLRUCache(max_items=max_items, ttl=ttl)
+        self.disk_dir = disk_dir
+        self.disk_max_bytes = disk_max_bytes
+        self.disk_hits = 0
+        self.loads = 0
+        self._lock = threading.Lock()
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0
+
+    def _disk_path(self, key: str, kind: str) -> str:
+        return os.path.join(self.disk_dir, f"{key}.{kind}.parquet")
+
+    def _disk_get(self, key: str, kind: str) -> Any:
+        path = self._disk_path(key, kind)
+        try:
+            if time.time() - os.path.getmtime(path) > self.ttl:
+                os.remove(path)
+                return None
+            value = _from_arrow(pq.read_table(path), kind)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Dropping unreadable query cache file {path}: {e}")
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+        return value
+
+    def _disk_set(self, key: str, value: Any, kind: str) -> None:
+        path = self._disk_path(key, kind)
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            pq.write_table(_to_arrow(value, kind), tmp)
+            os.replace(tmp, path)
+        except Exception as e:
+            logger.warning(f"Could not write query cache file {path}: {e}")
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            return
+        self._disk_evict()
+
+    def _disk_evict(self) -> None:
+        files = []
+        for entry in os.scandir(self.disk_dir):
+            if entry.name.endswith(".parquet"):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.disk_max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def get_or_load(self, sql: str, params: Optional[Dict[str, Any]], kind: str, loader: Callable[[], Any]) -> Any:
+        if not self.enabled:
+            return loader()
+        key = query_key(sql, params, kind)
+        value = self.memory.get(key)
+        if value is None and self.disk_dir:
+            value = self._disk_get(key, kind)
+            if value is not None:
+                with self._lock:
+                    self.disk_hits += 1
+                self.memory.set(key, value)
+        if value is not None:
+            return _copy(value, kind)
+
+        value = loader()
+        with self._lock:
+            self.loads += 1
+        self.memory.set(key, value)
+        if self.disk_dir:
+            self._disk_set(key, value, kind)
+        return _copy(value, kind)
+
+    def clear(self) -> None:
+        """Drop every cached result and start the hit/miss counters over."""
+        self.memory = MemoryLRUCache(max_items=self.memory.max_items, ttl=self.ttl)
+        with self._lock:
+            self.disk_hits = 0
+            self.loads = 0
+        if self.disk_dir:
+            for name in os.listdir(self.disk_dir):
+                if name.endswith(".parquet"):
+                    os.remove(os.path.join(self.disk_dir, name))
+        logger.info("Query result cache cleared")
+
+    def stats(self) -> Dict[str, Any]:
+        memory = self.memory.stats()
+        return {
+            "enabled": self.enabled,
+            "ttl": self.ttl,
+            "memory_hits": memory["hits"],
+            "disk_hits": self.disk_hits,
+            "misses": self.loads,
+            "size": memory["size"],
+        }
+
+
+def default_query_cache() -> QueryResultCache:
+    disk_dir = os.path.join(CACHE_ROOT, "snowflake_results") if QUERY_CACHE_DISK else None
+    return QueryResultCache(disk_dir=disk_dir)
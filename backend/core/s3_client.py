@@ -2,7 +2,7 @@
 
 import boto3
 import os
-from typing import List
+from typing import Any, Dict, List
 
 class S3FileManager:
     def __init__(self, bucket_name: str, base_path: str = ""):
@@ -20,6 +20,20 @@ class S3FileManager:
         files = [content['Key'] for content in response.get('Contents', [])]
         return files
 
+    def list_objects(self) -> List[Dict[str, Any]]:
+        """List every object under base_path with the version info used for cache keys."""
+        objects = []
+        paginator = self.s3.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket_name, Prefix=self.base_path):
+            for content in page.get("Contents", []):
+                objects.append({
+                    "key": content["Key"],
+                    "etag": content.get("ETag", "").strip('"'),
+                    "last_modified": content["LastModified"].isoformat() if content.get("LastModified") else "",
+                    "size": content.get("Size", 0),
+                })
+        return objects
+
     def load_s3_pdf(self, key: str) -> bytes:
         obj = self.s3.get_object(Bucket=self.bucket_name, Key=key)
         return obj['Body'].read()
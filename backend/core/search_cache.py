@@ -0,0 +1,136 @@
+# core/search_cache.py
+
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+from core.cache import MemoryLRUCache, DiskLRUCache, cache_path
+
+logger = logging.getLogger(__name__)
+
+HOUR = 3600
+DAY = 24 * HOUR
+
+# Trials and costs move quickly; hospital and funding listings rarely change
+SEARCH_CACHE_TTLS = {
+    "clinical_trials": 6 * HOUR,
+    "treatment_costs": 6 * HOUR,
+    "statistics": DAY,
+    "literature": DAY,
+    "funding": 7 * DAY,
+    "hospitals": 7 * DAY,
+}
+DEFAULT_SEARCH_TTL = float(os.getenv("WEB_CACHE_DEFAULT_TTL", str(HOUR)))
+# After the TTL an entry is still served (and refreshed in the background) for ttl * this ratio
+SEARCH_STALE_RATIO = float(os.getenv("WEB_CACHE_STALE_RATIO", "1.0"))
+SEARCH_CACHE_ITEMS = int(os.getenv("WEB_CACHE_ITEMS", "2000"))
+SEARCH_CACHE_DISK = os.getenv("WEB_CACHE_DISK", "false").lower() in ("1", "true", "yes")
+SEARCH_CACHE_DISK_MB = int(os.getenv("WEB_CACHE_DISK_MB", "256"))
+
+
+def category_ttl(category: Optional[str]) -> float:
+    """TTL for a search category, overridable with WEB_CACHE_TTL_<CATEGORY> (seconds)."""
+    if category is None:
+        return DEFAULT_SEARCH_TTL
+    override = os.getenv(f"WEB_CACHE_TTL_{category.upper()}")
+    return float(override) if override else SEARCH_CACHE_TTLS.get(category, DEFAULT_SEARCH_TTL)
+
+
+def search_key(payload: Dict[str, Any]) -> str:
+    """Cache key from the search options that affect results (never the API key)."""
+    normalized = {
+        "query": " ".join(str(payload.get("query", "")).lower().split()),
+        "search_depth": payload.get("search_depth"),
+        "max_results": payload.get("max_results"),
+        "include_answer": bool(payload.get("include_answer")),
+    }
+    return hashlib.sha256(json.dumps(normalized, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class SearchCache:
+    """Search responses with per-category TTLs and stale-while-revalidate.
+
+    ``get`` returns ``(response, fresh)``. A stale response is still returned
+    so the caller can answer immediately and refresh in the background;
+    ``begin_refresh`` makes sure only one refresh per key is in flight.
+    """
+
+    def __init__(self, max_items: int = SEARCH_CACHE_ITEMS, disk_path: Optional[str] = None,
+                 stale_ratio: float = SEARCH_STALE_RATIO):
+        self.memory = MemoryLRUCache(max_items=max_items)
+        self.disk = DiskLRUCache(disk_path, max_bytes=SEARCH_CACHE_DISK_MB * 1024 * 1024) if disk_path else None
+        self.stale_ratio = stale_ratio
+        self.fresh_hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self._refreshing = set()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Tuple[Optional[Dict[str, Any]], bool]:
+        entry = self.memory.get(key)
+        if entry is None and self.disk is not None:
+            raw = self.disk.get(key)
+            if raw is not None:
+                entry = json.loads(raw)
+                self.memory.set(key, entry, ttl=max(entry["expires"] - time.time(), 1))
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None, False
+            fresh = time.time() < entry["fresh_until"]
+            if fresh:
+                self.fresh_hits += 1
+            else:
+                self.stale_hits += 1
+        return entry["response"], fresh
+
+    def set(self, key: str, response: Dict[str, Any], category: Optional[str] = None) -> None:
+        ttl = category_ttl(category)
+        hard_ttl = ttl * (1 + self.stale_ratio)
+        now = time.time()
+        entry = {"response": response, "fresh_until": now + ttl, "expires": now + hard_ttl}
+        self.memory.set(key, entry, ttl=hard_ttl)
+        if self.disk is not None:
+            self.disk.set(key, json.dumps(entry).encode("utf-8"), ttl=hard_ttl)
+
+    def begin_refresh(self, key: str) -> bool:
+        with self._lock:
+            if key in self._refreshing:
+                return False
+            self._refreshing.add(key)
+            return True
+
+    def end_refresh(self, key: str) -> None:
+        with self._lock:
+            self._refreshing.discard(key)
+
+    def clear(self) -> None:
+        self.memory.clear()
+        if self.disk is not None:
+            self.disk.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "fresh_hits": self.fresh_hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "size": len(self.memory),
+        }
+
+
+_search_cache: Optional[SearchCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_search_cache() -> SearchCache:
+    global _search_cache
+    if _search_cache is None:
+        with _cache_lock:
+            if _search_cache is None:
+                disk_path = cache_path("web_search.sqlite") if SEARCH_CACHE_DISK else None
+                _search_cache = SearchCache(disk_path=disk_path)
+    return _search_cache
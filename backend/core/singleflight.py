@@ -0,0 +1,105 @@
+# core/singleflight.py
+
+import asyncio
+import logging
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class _Call:
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class _Stream:
+    def __init__(self):
+        self.events: List[Any] = []
+        self.finished = False
+        self.subscribers = 0
+        self.task: Optional[asyncio.Task] = None
+        self._changed = asyncio.Event()
+
+    async def emit(self, event: Any) -> None:
+        self.events.append(event)
+        self._wake()
+
+    def _wake(self) -> None:
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+
+class SingleFlight:
+    """Coalesce concurrent identical work onto one in-flight task per key.
+
+    ``do`` shares a coroutine's result (or exception) between every caller that
+    asks for the same key while it runs. ``stream`` does the same for an event
+    producer: later subscribers first replay the events already emitted, then
+    follow live. The shared task is cancelled only when its last caller leaves.
+    """
+
+    def __init__(self):
+        self._calls: Dict[str, _Call] = {}
+        self._streams: Dict[str, _Stream] = {}
+
+    def in_flight(self, key: str) -> bool:
+        return key in self._calls or key in self._streams
+
+    async def do(self, key: str, fn: Callable[..., Awaitable[Any]], *args: Any) -> Any:
+        call = self._calls.get(key)
+        if call is None:
+            call = _Call(asyncio.create_task(fn(*args)))
+            self._calls[key] = call
+
+            def finished(_, call=call):
+                if self._calls.get(key) is call:
+                    del self._calls[key]
+
+            call.task.add_done_callback(finished)
+        else:
+            logger.info(f"Joining in-flight call for {key!r}")
+        call.waiters += 1
+        try:
+            return await asyncio.shield(call.task)
+        finally:
+            call.waiters -= 1
+            if call.waiters == 0 and not call.task.done():
+                call.task.cancel()
+
+    async def stream(self, key: str, producer: Callable[[Callable[[Any], Awaitable[None]]], Awaitable[None]]) -> AsyncIterator[Any]:
+        """Events from ``producer(emit)`` for ``key``, shared with concurrent subscribers."""
+        shared = self._streams.get(key)
+        if shared is None:
+            shared = _Stream()
+            self._streams[key] = shared
+            shared.task = asyncio.create_task(producer(shared.emit))
+
+            def finished(_):
+                shared.finished = True
+                shared._wake()
+                if self._streams.get(key) is shared:
+                    del self._streams[key]
+
+            shared.task.add_done_callback(finished)
+        else:
+            logger.info(f"Joining in-flight stream for {key!r}")
+
+        shared.subscribers += 1
+        position = 0
+        try:
+            while True:
+                while position < len(shared.events):
+                    yield shared.events[position]
+                    position += 1
+                if shared.finished:
+                    return
+                changed = shared._changed
+                await changed.wait()
+        finally:
+            shared.subscribers -= 1
+            if shared.subscribers == 0 and not shared.task.done():
+                # Everyone went away mid-stream: stop paying for the rest of the work
+                shared.task.cancel()
+                if self._streams.get(key) is shared:
+                    del self._streams[key]
@@ -0,0 +1,117 @@
+# core/snowflake_pool.py
+
+import time
+import queue
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict
+
+import snowflake.connector
+from snowflake.connector.errors import DatabaseError, OperationalError
+
+logger = logging.getLogger(__name__)
+
+# Snowflake error codes meaning the session is gone and the connection must be replaced
+SESSION_GONE_ERRNOS = {390111, 390112, 390114}
+
+
+def is_connection_error(e: Exception) -> bool:
+    return isinstance(e, OperationalError) or (
+        isinstance(e, DatabaseError) and getattr(e, "errno", None) in SESSION_GONE_ERRNOS
+    )
+
+
+class PoolTimeoutError(Exception):
+    pass
+
+
+class SnowflakeConnectionPool:
+    """Bounded pool of Snowflake connections with checkout/return, validation and reconnect.
+
+    Connections are opened lazily, kept alive server-side with
+    ``client_session_keep_alive`` and validated with ``SELECT 1`` when they have
+    sat idle longer than ``validate_after`` seconds. A connection that is closed,
+    fails validation or raises a connection-level error is discarded and replaced.
+    """
+
+    def __init__(self, connect_kwargs: Dict[str, Any], max_size: int = 4,
+                 validate_after: float = 300, max_lifetime: float = 4 * 3600,
+                 checkout_timeout: float = 60):
+        self.connect_kwargs = {"client_session_keep_alive": True, **connect_kwargs}
+        self.max_size = max_size
+        self.validate_after = validate_after
+        self.max_lifetime = max_lifetime
+        self.checkout_timeout = checkout_timeout
+        self._idle: "queue.LifoQueue" = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._created: Dict[int, float] = {}
+        self._lock = threading.Lock()
+
+    def _open(self):
+        conn = snowflake.connector.connect(**self.connect_kwargs)
+        with self._lock:
+            self._created[id(conn)] = time.time()
+        logger.info("✅ Opened Snowflake connection")
+        return conn
+
+    def _discard(self, conn) -> None:
+        with self._lock:
+            self._created.pop(id(conn), None)
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _healthy(self, conn, last_used: float) -> bool:
+        if conn.is_closed():
+            return False
+        if time.time() - self._created.get(id(conn), 0) > self.max_lifetime:
+            return False
+        if time.time() - last_used < self.validate_after:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            return True
+        except Exception as e:
+            logger.warning(f"Idle Snowflake connection failed validation: {e}")
+            return False
+
+    def _checkout(self):
+        while True:
+            try:
+                conn, last_used = self._idle.get_nowait()
+            except queue.Empty:
+                return self._open()
+            if self._healthy(conn, last_used):
+                return conn
+            self._discard(conn)
+
+    @contextmanager
+    def connection(self):
+        if not self._slots.acquire(timeout=self.checkout_timeout):
+            raise PoolTimeoutError(f"No Snowflake connection free after {self.checkout_timeout}s")
+        conn = None
+        try:
+            conn = self._checkout()
+            yield conn
+        except Exception as e:
+            if conn is not None and (is_connection_error(e) or conn.is_closed()):
+                logger.warning(f"Dropping broken Snowflake connection: {e}")
+                self._discard(conn)
+                conn = None
+            raise
+        finally:
+            if conn is not None:
+                self._idle.put((conn, time.time()))
+            self._slots.release()
+
+    def close_all(self) -> None:
+        while True:
+            try:
+                conn, _ = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(conn)
+        logger.info("✅ Snowflake connections closed")
@@ -0,0 +1,60 @@
+# core/tokens.py
+
+import re
+import logging
+from functools import lru_cache
+from typing import List, Optional
+
+import tiktoken
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ENCODING = "cl100k_base"
+
+# Rough tokens-per-character ratio for English text, used only when tiktoken's BPE files can't be loaded
+CHARS_PER_TOKEN = 4
+_APPROX_TOKEN = re.compile(r"\w+|[^\w\s]")
+
+
+@lru_cache(maxsize=None)
+def get_encoding(name: str = DEFAULT_ENCODING) -> Optional["tiktoken.Encoding"]:
+    """tiktoken encoding, or None when it is unavailable (e.g. offline without a cached BPE file)."""
+    try:
+        return tiktoken.get_encoding(name)
+    except Exception as e:
+        logger.warning(f"tiktoken encoding {name} unavailable, falling back to estimated token counts: {e}")
+        return None
+
+
+def count_tokens(text: str, encoding_name: str = DEFAULT_ENCODING) -> int:
+    encoding = get_encoding(encoding_name)
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return max(len(_APPROX_TOKEN.findall(text)), len(text) // CHARS_PER_TOKEN)
+
+
+def truncate_tokens(text: str, max_tokens: int, encoding_name: str = DEFAULT_ENCODING) -> str:
+    encoding = get_encoding(encoding_name)
+    if encoding is not None:
+        tokens = encoding.encode(text, disallowed_special=())
+        return text if len(tokens) <= max_tokens else encoding.decode(tokens[:max_tokens])
+    return text[:max_tokens * CHARS_PER_TOKEN]
+
+
+def token_windows(text: str, size: int, overlap: int = 0, encoding_name: str = DEFAULT_ENCODING) -> List[str]:
+    """Split text into windows of at most ``size`` tokens, consecutive windows sharing ``overlap`` tokens."""
+    step = max(1, size - overlap)
+    encoding = get_encoding(encoding_name)
+    if encoding is not None:
+        tokens = encoding.encode(text, disallowed_special=())
+        return [encoding.decode(tokens[i:i + size]) for i in range(0, max(1, len(tokens) - overlap), step)]
+    # Estimated counts: character windows, shrunk until their estimate fits
+    windows, start = [], 0
+    while True:
+        end = min(len(text), start + size * CHARS_PER_TOKEN)
+        while end - start > 1 and count_tokens(text[start:end], encoding_name) > size:
+            end = start + (end - start) * 9 // 10
+        windows.append(text[start:end])
+        if end >= len(text):
+            return windows
+        start = max(start + 1, end - (end - start) * overlap // size)
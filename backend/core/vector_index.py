@@ -0,0 +1,168 @@
+# core/vector_index.py
+
+import os
+import time
+import logging
+import numpy as np
+from typing import Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Below this many vectors an exact scan is fast enough that IVF isn't worth its recall loss
+IVF_MIN_VECTORS = int(os.getenv("IVF_MIN_VECTORS", "50000"))
+IVF_NPROBE = int(os.getenv("IVF_NPROBE", "16"))
+
+
+def normalize(vecs: np.ndarray) -> np.ndarray:
+    vecs = np.asarray(vecs, dtype=np.float32)
+    norms = np.linalg.norm(vecs, axis=-1, keepdims=True)
+    return vecs / np.maximum(norms, 1e-10)
+
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k highest scores, best first, without sorting the whole array."""
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    if k < len(scores):
+        idx = np.argpartition(-scores, k - 1)[:k]
+    else:
+        idx = np.arange(len(scores))
+    return idx[np.argsort(-scores[idx], kind="stable")]
+
+
+class ExactIndex:
+    """Brute-force cosine search over pre-normalised vectors."""
+
+    mode = "exact"
+
+    def __init__(self, vectors: np.ndarray, normalized: bool = False):
+        self.vectors = vectors if normalized else normalize(vectors)
+
+    def __len__(self) -> int:
+        return len(self.vectors)
+
+    def search(self, query_vec: np.ndarray, k: int = 5) -> Tuple[np.ndarray, np.ndarray]:
+        scores = self.vectors @ normalize(query_vec)
+        idx = top_k(scores, k)
+        return idx, scores[idx]
+
+
+class IVFIndex:
+    """Inverted-file index: spherical k-means partitions, search scans the nprobe closest lists.
+
+    Lists are stored CSR-style (``order`` sorted by list, ``offsets`` per list) so the
+    index is three flat arrays that can be saved next to the embedding matrix.
+    """
+
+    mode = "ivf"
+
+    def __init__(self, vectors: np.ndarray, centroids: np.ndarray, order: np.ndarray,
+                 offsets: np.ndarray, nprobe: int = IVF_NPROBE, normalized: bool = False):
+        self.vectors = vectors if normalized else normalize(vectors)
+        self.centroids = centroids
+        self.order = order
+        self.offsets = offsets
+        self.nprobe = nprobe
+
+    def __len__(self) -> int:
+        return len(self.vectors)
+
+    @classmethod
+    def train(cls, vectors: np.ndarray, nlist: Optional[int] = None, nprobe: int = IVF_NPROBE,
+              iters: int = 10, sample_size: Optional[int] = None, seed: int = 0,
+              normalized: bool = False) -> "IVFIndex":
+        start = time.time()
+        vectors = vectors if normalized else normalize(vectors)
+        n = len(vectors)
+        nlist = min(nlist or max(1, int(4 * np.sqrt(n))), n)
+        rng = np.random.default_rng(seed)
+
+        sample_size = min(n, sample_size or nlist * 64)
+        sample = np.asarray(vectors[np.sort(rng.choice(n, sample_size, replace=False))])
+        centroids = sample[rng.choice(sample_size, nlist, replace=False)].copy()
+        for _ in range(iters):
+            assign = _assign(sample, centroids)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assign, sample)
+            empty = np.bincount(assign, minlength=nlist) == 0
+            # Re-seed empty lists from random sample points so no partition goes unused
+            sums[empty] = sample[rng.choice(sample_size, int(empty.sum()))]
+            centroids = normalize(sums)
+
+        assign = _assign(vectors, centroids)
+        order = np.argsort(assign, kind="stable").astype(np.int64)
+        offsets = np.concatenate([[0], np.cumsum(np.bincount(assign, minlength=nlist))]).astype(np.int64)
+        logger.info(f"Trained IVF index: {n} vectors, {nlist} lists in {time.time() - start:.2f}s")
+        return cls(vectors, centroids, order, offsets, nprobe=nprobe, normalized=True)
+
+    def search(self, query_vec: np.ndarray, k: int = 5, nprobe: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        query_vec = normalize(query_vec)
+        lists = top_k(self.centroids @ query_vec, nprobe or self.nprobe)
+        candidates = np.concatenate([self.order[self.offsets[c]:self.offsets[c + 1]] for c in lists])
+        if not len(candidates):
+            return candidates, np.empty(0, dtype=np.float32)
+        candidates.sort()  # sequential reads when vectors are memory-mapped
+        scores = self.vectors[candidates] @ query_vec
+        best = top_k(scores, k)
+        return candidates[best], scores[best]
+
+    def save(self, index_dir: str) -> None:
+        np.save(os.path.join(index_dir, "ivf_centroids.npy"), self.centroids)
+        np.save(os.path.join(index_dir, "ivf_order.npy"), self.order)
+        np.save(os.path.join(index_dir, "ivf_offsets.npy"), self.offsets)
+
+    @classmethod
+    def load(cls, vectors: np.ndarray, index_dir: str, nprobe: int = IVF_NPROBE) -> Optional["IVFIndex"]:
+        try:
+            centroids = np.load(os.path.join(index_dir, "ivf_centroids.npy"))
+            order = np.load(os.path.join(index_dir, "ivf_order.npy"))
+            offsets = np.load(os.path.join(index_dir, "ivf_offsets.npy"))
+        except FileNotFoundError:
+            return None
+        if len(order) != len(vectors):
+            return None
+        return cls(vectors, centroids, order, offsets, nprobe=nprobe, normalized=True)
+
+
+def _assign(vectors: np.ndarray, centroids: np.ndarray, batch_size: int = 65536) -> np.ndarray:
+    return np.concatenate([
+        np.argmax(np.asarray(vectors[i:i + batch_size]) @ centroids.T, axis=1)
+        for i in range(0, len(vectors), batch_size)
+    ]) if len(vectors) else np.empty(0, dtype=np.int64)
+
+
+def index_mode(count: int, mode: str = "auto") -> str:
+    """``mode`` with "auto" resolved by corpus size."""
+    if mode == "auto":
+        return "ivf" if count >= IVF_MIN_VECTORS else "exact"
+    if mode not in ("exact", "ivf"):
+        raise ValueError(f"Unknown vector index mode: {mode}")
+    return mode
+
+
+def build_index(vectors: np.ndarray, mode: str = "auto", normalized: bool = False,
+                index_dir: Optional[str] = None, nprobe: int = IVF_NPROBE, train: bool = True):
+    """Exact index for small corpora, IVF for large ones (``mode`` = exact | ivf | auto).
+
+    With ``index_dir`` a previously trained IVF layout is reused. If there is
+    none, ``train=False`` falls back to exact search (so serving never runs
+    k-means); otherwise a layout is trained and saved there.
+    """
+    if index_mode(len(vectors), mode) == "exact":
+        return ExactIndex(vectors, normalized=normalized)
+
+    if index_dir and normalized:
+        index = IVFIndex.load(vectors, index_dir, nprobe=nprobe)
+        if index is not None:
+            return index
+    if not train:
+        logger.warning(f"No trained IVF layout in {index_dir}, using exact search until one is built")
+        return ExactIndex(vectors, normalized=normalized)
+    index = IVFIndex.train(vectors, nprobe=nprobe, normalized=normalized)
+    if index_dir:
+        try:
+            index.save(index_dir)
+        except OSError as e:
+            logger.warning(f"Could not persist IVF layout to {index_dir}: {e}")
+    return index
@@ -0,0 +1,132 @@
+# core/vector_store.py
+
+import os
+import json
+import shutil
+import logging
+import datetime
+import numpy as np
+from typing import Any, Dict, List, Optional
+
+from core.cache import CACHE_ROOT
+from core.vector_index import IVFIndex, build_index, index_mode, normalize
+
+logger = logging.getLogger(__name__)
+
+RAG_INDEX_DIR = os.getenv("RAG_INDEX_DIR", os.path.join(CACHE_ROOT, "rag_index"))
+RAG_INDEX_MODE = os.getenv("RAG_INDEX_MODE", "auto")
+
+EMBEDDINGS_FILE = "embeddings.npy"
+METADATA_FILE = "chunks.jsonl"
+MANIFEST_FILE = "manifest.json"
+
+
+class ChunkIndexWriter:
+    """Writes an index of L2-normalised chunk embeddings (.npy) plus a JSONL metadata sidecar.
+
+    The index is built in a temporary directory and swapped in on ``commit`` so
+    readers never see a half-written index; an IVF layout, when ``mode`` calls
+    for one, is trained there too, before the swap.
+    """
+
+    def __init__(self, index_dir: str, num_chunks: int, dim: int, mode: str = RAG_INDEX_MODE):
+        self.index_dir = index_dir
+        self.mode = mode
+        self.tmp_dir = index_dir + ".tmp"
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+        os.makedirs(self.tmp_dir)
+        self.matrix = np.lib.format.open_memmap(
+            os.path.join(self.tmp_dir, EMBEDDINGS_FILE), mode="w+", dtype=np.float32, shape=(num_chunks, dim)
+        )
+        self.metadata = open(os.path.join(self.tmp_dir, METADATA_FILE), "w", encoding="utf-8")
+        self.count = 0
+
+    def add(self, embeddings: np.ndarray, metadata: List[Dict[str, Any]]) -> None:
+        end = self.count + len(metadata)
+        self.matrix[self.count:end] = normalize(embeddings)
+        for meta in metadata:
+            self.metadata.write(json.dumps(meta) + "\n")
+        self.count = end
+
+    def commit(self, manifest: Dict[str, Any]) -> None:
+        self.matrix.flush()
+        del self.matrix
+        self.metadata.close()
+        with open(os.path.join(self.tmp_dir, MANIFEST_FILE), "w", encoding="utf-8") as f:
+            json.dump({**manifest, "count": self.count}, f, indent=2)
+        train_layout(self.tmp_dir, self.mode)
+        shutil.rmtree(self.index_dir, ignore_errors=True)
+        os.replace(self.tmp_dir, self.index_dir)
+        logger.info(f"Wrote chunk index with {self.count} chunks to {self.index_dir}")
+
+
+def manifest_version(manifest: Dict[str, Any]) -> str:
+    # A layout trained after the build changes the version, so readers pick it up
+    return f"{manifest.get('created', '')}/{manifest.get('ivf_trained', '')}"
+
+
+def train_layout(index_dir: str, mode: str = RAG_INDEX_MODE) -> bool:
+    """Train and save the IVF layout of the index in ``index_dir`` if ``mode`` calls for one and it has none."""
+    matrix = np.load(os.path.join(index_dir, EMBEDDINGS_FILE), mmap_mode="r")
+    if index_mode(len(matrix), mode) != "ivf" or IVFIndex.load(matrix, index_dir) is not None:
+        return False
+    IVFIndex.train(matrix, normalized=True).save(index_dir)
+    manifest_path = os.path.join(index_dir, MANIFEST_FILE)
+    with open(manifest_path, encoding="utf-8") as f:
+        manifest = json.load(f)
+    manifest["ivf_trained"] = datetime.datetime.utcnow().isoformat()
+    with open(manifest_path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(manifest_path + ".tmp", manifest_path)
+    return True
+
+
+class ChunkIndex:
+    """Read side of the chunk index: the embedding matrix is memory-mapped, not loaded."""
+
+    def __init__(self, index_dir: str = RAG_INDEX_DIR, mode: str = RAG_INDEX_MODE):
+        self.index_dir = index_dir
+        with open(os.path.join(index_dir, MANIFEST_FILE), encoding="utf-8") as f:
+            self.manifest = json.load(f)
+        self.matrix = np.load(os.path.join(index_dir, EMBEDDINGS_FILE), mmap_mode="r")
+        with open(os.path.join(index_dir, METADATA_FILE), encoding="utf-8") as f:
+            self.metadata = [json.loads(line) for line in f]
+        # Layouts are trained offline (ingestion); until one exists, IVF mode searches exactly
+        self.index = build_index(self.matrix, mode=mode, normalized=True, index_dir=index_dir, train=False)
+
+    @property
+    def version(self) -> str:
+        return manifest_version(self.manifest)
+
+    def __len__(self) -> int:
+        return len(self.metadata)
+
+    def search(self, query_vec: np.ndarray, k: int = 5) -> List[Dict[str, Any]]:
+        if not len(self):
+            return []
+        idx, scores = self.index.search(query_vec, k)
+        return [{**self.metadata[i], "score": float(score)} for i, score in zip(idx, scores)]
+
+
+_chunk_index: Optional[ChunkIndex] = None
+
+
+def load_chunk_index(index_dir: str = RAG_INDEX_DIR) -> Optional[ChunkIndex]:
+    """Shared ChunkIndex, reloaded when the on-disk manifest changes; None if nothing is ingested."""
+    global _chunk_index
+    manifest_path = os.path.join(index_dir, MANIFEST_FILE)
+    if not os.path.exists(manifest_path):
+        return None
+    with open(manifest_path, encoding="utf-8") as f:
+        version = manifest_version(json.load(f))
+    if _chunk_index is None or _chunk_index.index_dir != index_dir or _chunk_index.version != version:
+        _chunk_index = ChunkIndex(index_dir)
+    return _chunk_index
+
+
+def read_manifest(index_dir: str = RAG_INDEX_DIR) -> Dict[str, Any]:
+    try:
+        with open(os.path.join(index_dir, MANIFEST_FILE), encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
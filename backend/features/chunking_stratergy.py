@@ -3,7 +3,25 @@
 import boto3
 import os
 import re
-from typing import List
+import itertools
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from core.tokens import DEFAULT_ENCODING, count_tokens, token_windows
+
+# Token budget per chunk and tokens repeated from the end of the previous chunk (same section only)
+CHUNK_TOKENS = int(os.getenv("CHUNK_TOKENS", "400"))
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "50"))
+# Lines without a blank line or heading are sentence-split once they pass this size, bounding memory
+PARAGRAPH_FLUSH_CHARS = 20000
+
+_HEADING = re.compile(r"^(#{1,6})\s+(.*)$")
+# Sentence end: terminal punctuation (plus closing quotes/brackets), whitespace, then a likely sentence start
+_SENTENCE_END = re.compile(r"[.!?][\"')\]]*\s+(?=[\"'(\[]?[A-Z0-9])")
+_ABBREVIATIONS = {"e.g.", "i.e.", "al.", "fig.", "figs.", "vs.", "dr.", "no.", "approx.", "ref.", "refs.",
+                  "eq.", "mr.", "ms.", "st.", "inc.", "u.s.", "ca.", "cf.", "vol.", "pp."}
+
+# (kind, text, page): kind is "heading" or "text" (a sentence, or an atomic block such as a table)
+Unit = Tuple[str, str, Optional[int]]
 
 
 def markdown_chunking(markdown_text: str, heading_level: int = 2) -> list:
@@ -27,3 +45,175 @@ def markdown_chunking(markdown_text: str, heading_level: int = 2) -> list:
         chunks.append("\n".join(current_chunk))
 
     return chunks
+
+
+def split_long_chunks(chunks: List[str], max_words: int = 300) -> List[str]:
+    """Break chunks longer than max_words into word windows so each fits an embedding request."""
+    result = []
+    for chunk in chunks:
+        words = chunk.split()
+        if not words:
+            continue
+        for i in range(0, len(words), max_words):
+            result.append(" ".join(words[i:i + max_words]))
+    return result
+
+
+def split_sentences(text: str) -> List[str]:
+    """Sentences of a paragraph, not breaking after common abbreviations or initials ('e.g.', 'et al.', 'J.')."""
+    sentences, start = [], 0
+    for m in _SENTENCE_END.finditer(text):
+        candidate = text[start:m.end()].strip()
+        last = candidate.rsplit(None, 1)[-1].lower()
+        if last in _ABBREVIATIONS or (len(last) == 2 and last[0].isalpha()):
+            continue
+        sentences.append(candidate)
+        start = m.end()
+    tail = text[start:].strip()
+    if tail:
+        sentences.append(tail)
+    return sentences
+
+
+def markdown_units(source: Union[str, Iterable[str]]) -> Iterator[Unit]:
+    """Heading and sentence units of markdown text, given whole or as an iterable of pieces (e.g. pages).
+
+    Pieces may split lines anywhere; only the current paragraph is held in memory.
+    """
+    pieces = [source] if isinstance(source, str) else source
+    paragraph: List[str] = []
+    size = 0
+    pending = ""
+    for piece in itertools.chain(pieces, [None]):
+        if piece is None:
+            lines, pending = [pending], ""
+        else:
+            lines = (pending + piece).split("\n")
+            pending = lines.pop()
+        for line in lines:
+            line = line.strip()
+            heading = _HEADING.match(line)
+            if heading or not line:
+                for sentence in split_sentences(" ".join(paragraph)):
+                    yield "text", sentence, None
+                paragraph, size = [], 0
+                if heading:
+                    yield "heading", heading.group(2).strip(), None
+                continue
+            paragraph.append(line)
+            size += len(line)
+            if size > PARAGRAPH_FLUSH_CHARS:
+                sentences = split_sentences(" ".join(paragraph))
+                for sentence in sentences[:-1]:
+                    yield "text", sentence, None
+                paragraph = sentences[-1:]
+                size = len(paragraph[0]) if paragraph else 0
+    for sentence in split_sentences(" ".join(paragraph)):
+        yield "text", sentence, None
+
+
+def block_units(blocks: Iterable[Dict[str, Any]]) -> Iterator[Unit]:
+    """Units of a layout parse (``features.pdf_layout``), carrying each block's page."""
+    for block in blocks:
+        if block["type"] == "heading":
+            yield "heading", block["text"], block["page"]
+        elif block["type"] == "table":
+            yield "text", block["text"], block["page"]
+        else:
+            for sentence in split_sentences(block["text"]):
+                yield "text", sentence, block["page"]
+
+
+class TokenChunker:
+    """Packs heading/sentence units into chunks of at most ``max_tokens`` tokens.
+
+    A heading always starts a new chunk, so chunks never straddle sections;
+    within a section each chunk repeats the trailing sentences (up to
+    ``overlap_tokens``) of the previous one. Units larger than the budget are
+    cut into token windows.
+    """
+
+    def __init__(self, max_tokens: int = CHUNK_TOKENS, overlap_tokens: int = CHUNK_OVERLAP_TOKENS,
+                 encoding_name: str = DEFAULT_ENCODING):
+        if not 0 <= overlap_tokens < max_tokens:
+            raise ValueError(f"overlap_tokens must be in [0, {max_tokens}), got {overlap_tokens}")
+        self.max_tokens = max_tokens
+        self.overlap_tokens = overlap_tokens
+        self.encoding_name = encoding_name
+        self.section: Optional[str] = None
+        self._units: List[Tuple[str, str, int, Optional[int]]] = []
+        self._tokens = 0
+
+    def _has_body(self) -> bool:
+        return any(kind != "heading" for kind, _, _, _ in self._units)
+
+    def _chunk(self) -> Dict[str, Any]:
+        text = "".join(f"{t}\n" if kind == "heading" else f"{t} " for kind, t, _, _ in self._units).strip()
+        pages = sorted({p for _, _, _, p in self._units if p is not None})
+        return {"text": text, "tokens": self._tokens, "section": self.section, "pages": pages}
+
+    def _reset(self, keep_overlap: bool) -> None:
+        tail, tokens = [], 0
+        if keep_overlap:
+            for unit in reversed(self._units):
+                if unit[0] == "heading" or tokens + unit[2] > self.overlap_tokens:
+                    break
+                tail.insert(0, unit)
+                tokens += unit[2]
+        self._units, self._tokens = tail, tokens
+
+    def add(self, unit: Unit) -> List[Dict[str, Any]]:
+        """Chunks completed by adding ``unit``."""
+        kind, text, page = unit
+        done = []
+        if kind == "heading":
+            if self._has_body():
+                done.append(self._chunk())
+                self._reset(keep_overlap=False)
+            self.section = text
+        # +1 for the separator the unit is joined with
+        tokens = count_tokens(text, self.encoding_name) + 1
+
+        if tokens > self.max_tokens:
+            if self._has_body():
+                done.append(self._chunk())
+                self._reset(keep_overlap=False)
+            # Windows leave room for leading headings, which ride along with the first one
+            room = self.max_tokens - self._tokens - 1
+            headings, heading_tokens = self._units, self._tokens
+            for window in token_windows(text, room, min(self.overlap_tokens, room // 2), self.encoding_name):
+                self._units = headings + [(kind, window, room + 1, page)]
+                self._tokens = heading_tokens + room + 1
+                done.append(self._chunk())
+                headings, heading_tokens = [], 0
+            self._reset(keep_overlap=False)
+            return done
+
+        if self._tokens + tokens > self.max_tokens and self._has_body():
+            done.append(self._chunk())
+            self._reset(keep_overlap=True)
+            while self._units and self._tokens + tokens > self.max_tokens:
+                self._tokens -= self._units.pop(0)[2]
+        self._units.append((kind, text, tokens, page))
+        self._tokens += tokens
+        return done
+
+    def finish(self) -> List[Dict[str, Any]]:
+        done = [self._chunk()] if self._units else []
+        self._reset(keep_overlap=False)
+        return done
+
+
+def iter_token_chunks(units: Iterable[Unit], max_tokens: int = CHUNK_TOKENS,
+                      overlap_tokens: int = CHUNK_OVERLAP_TOKENS) -> Iterator[Dict[str, Any]]:
+    """Stream ``{"text", "tokens", "section", "pages"}`` chunks from units as they fill up."""
+    chunker = TokenChunker(max_tokens, overlap_tokens)
+    for unit in units:
+        yield from chunker.add(unit)
+    yield from chunker.finish()
+
+
+def token_chunks(source: Union[str, Iterable[str]], max_tokens: int = CHUNK_TOKENS,
+                 overlap_tokens: int = CHUNK_OVERLAP_TOKENS) -> List[str]:
+    """Token-budgeted, sentence- and heading-aware chunks of markdown text."""
+    return [c["text"] for c in iter_token_chunks(markdown_units(source), max_tokens, overlap_tokens)]
@@ -0,0 +1,162 @@
+# features/context_assembler.py
+"""
+Token-budgeted assembly of the "All Available Data" block of the report prompt.
+
+Each section gets a token budget. Inside a section, paragraphs are scored
+against the query (share of query terms they contain, ties broken by their
+original, already relevance-ranked order) and the lowest-scoring ones are
+dropped first; a paragraph that alone exceeds the budget is truncated. If the
+whole prompt still exceeds the target window, the lowest-priority sections are
+cut further, down to their minimum. Tokens are counted with tiktoken
+(``cl100k_base``), a close estimate for Gemini's tokenizer.
+"""
+
+import os
+import re
+import logging
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from core.tokens import count_tokens, truncate_tokens
+
+logger = logging.getLogger(__name__)
+
+# Target size of the whole report prompt (instructions + query + context)
+REPORT_PROMPT_TOKENS = int(os.getenv("REPORT_PROMPT_TOKENS", "12000"))
+
+# Default per-section budgets; CONTEXT_BUDGET_<KEY> overrides (tokens)
+SECTION_BUDGETS = {
+    "epidemiology": 1500,
+    "literature": 3000,
+    "clinical_trials": 1500,
+    "funding": 1000,
+    "hospitals": 800,
+}
+# Higher priority sections are cut last when the prompt is over the target
+SECTION_PRIORITIES = {
+    "literature": 5,
+    "epidemiology": 4,
+    "clinical_trials": 3,
+    "hospitals": 2,
+    "funding": 1,
+}
+
+_TERM = re.compile(r"[a-z0-9]{3,}")
+_STOPWORDS = {"the", "and", "for", "with", "what", "are", "how", "which", "from", "about", "into", "that",
+              "this", "options", "latest", "near", "show", "give", "tell"}
+_PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+
+
+def section_budget(key: str) -> int:
+    override = os.getenv(f"CONTEXT_BUDGET_{key.upper()}")
+    return int(override) if override else SECTION_BUDGETS.get(key, 1000)
+
+
+@dataclass
+class Section:
+    key: str
+    title: str
+    text: str
+    budget: Optional[int] = None
+    priority: Optional[int] = None
+    min_tokens: int = 100
+
+    def __post_init__(self):
+        if self.budget is None:
+            self.budget = section_budget(self.key)
+        if self.priority is None:
+            self.priority = SECTION_PRIORITIES.get(self.key, 0)
+
+
+@dataclass
+class _Piece:
+    index: int
+    text: str
+    tokens: int
+    score: float
+
+
+@dataclass
+class AssembledContext:
+    text: str
+    prompt_tokens: int
+    # Per section: original / kept tokens, budget and paragraphs dropped
+    sections: Dict[str, Dict[str, int]] = field(default_factory=dict)
+
+    def summary(self) -> str:
+        parts = [f"{k} {s['kept']}/{s['original']}" for k, s in self.sections.items()]
+        return f"prompt {self.prompt_tokens} tokens; context " + ", ".join(parts)
+
+
+def query_terms(query: str) -> set:
+    return {t for t in _TERM.findall(query.lower()) if t not in _STOPWORDS}
+
+
+def _pieces(text: str, terms: set) -> List[_Piece]:
+    paragraphs = [p.strip() for p in _PARAGRAPH_BREAK.split(text) if p.strip()]
+    n = len(paragraphs)
+    pieces = []
+    for i, paragraph in enumerate(paragraphs):
+        words = set(_TERM.findall(paragraph.lower()))
+        overlap = len(terms & words) / len(terms) if terms else 0.0
+        # Earlier paragraphs come first in already-ranked lists, so they win ties
+        pieces.append(_Piece(i, paragraph, count_tokens(paragraph) + 1, overlap + 0.01 * (n - i) / n))
+    return pieces
+
+
+def _fit(pieces: List[_Piece], budget: int) -> List[_Piece]:
+    """Highest-scoring pieces within ``budget``, back in original order; a lone oversized piece is truncated."""
+    kept, used = [], 0
+    for piece in sorted(pieces, key=lambda p: -p.score):
+        if used + piece.tokens <= budget:
+            kept.append(piece)
+            used += piece.tokens
+    if not kept and pieces and budget > 0:
+        best = max(pieces, key=lambda p: p.score)
+        text = truncate_tokens(best.text, budget - 1)
+        kept = [_Piece(best.index, text, count_tokens(text) + 1, best.score)]
+    return sorted(kept, key=lambda p: p.index)
+
+
+def _render(section: Section, pieces: List[_Piece]) -> str:
+    body = "\n\n".join(p.text for p in pieces) or "No data available within the context budget."
+    return f"=== {section.title} ===\n{body}\n"
+
+
+def assemble_context(query: str, sections: List[Section], instructions: str,
+                     max_prompt_tokens: int = REPORT_PROMPT_TOKENS) -> AssembledContext:
+    """The data block for ``instructions`` (the prompt without it), within the per-section budgets and prompt target."""
+    terms = query_terms(query)
+    all_pieces = {s.key: _pieces(s.text, terms) for s in sections}
+    kept = {s.key: _fit(all_pieces[s.key], s.budget) for s in sections}
+    header_tokens = sum(count_tokens(_render(s, [])) for s in sections)
+    available = max_prompt_tokens - count_tokens(instructions) - header_tokens
+
+    def used() -> int:
+        return sum(p.tokens for pieces in kept.values() for p in pieces)
+
+    # Over the prompt target: shrink the lowest-priority sections first, down to their minimum
+    for section in sorted(sections, key=lambda s: s.priority):
+        excess = used() - available
+        if excess <= 0:
+            break
+        current = sum(p.tokens for p in kept[section.key])
+        target = max(section.min_tokens, current - excess)
+        if target < current:
+            kept[section.key] = _fit(kept[section.key], target)
+
+    text = "\n".join(_render(s, kept[s.key]) for s in sections)
+    breakdown = {
+        s.key: {
+            "original": sum(p.tokens for p in all_pieces[s.key]),
+            "kept": sum(p.tokens for p in kept[s.key]),
+            "budget": s.budget,
+            "dropped": len(all_pieces[s.key]) - len(kept[s.key]),
+        }
+        for s in sections
+    }
+    assembled = AssembledContext(text, count_tokens(instructions) + count_tokens(text), breakdown)
+    if assembled.prompt_tokens > max_prompt_tokens:
+        logger.warning(f"Report prompt is {assembled.prompt_tokens} tokens, over the {max_prompt_tokens} target "
+                       f"even with every section at its minimum")
+    return assembled
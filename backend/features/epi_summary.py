@@ -0,0 +1,227 @@
+# features/epi_summary.py
+"""
+Deterministic markdown summary of the epidemiology statistics returned by
+``SnowflakeAgent.get_cancer_statistics``: incidence rate per 100k by year with
+year-over-year change, top sites, sex split, leading areas and childhood age
+groups. Everything is computed with pandas from case counts and population,
+so the report gets exact numbers without an LLM round-trip.
+"""
+
+import logging
+import numpy as np
+import pandas as pd
+from typing import Any, List, Optional
+
+logger = logging.getLogger(__name__)
+
+TOP_N = 5
+# CDC tables carry combined rows next to their breakdowns; they must not be summed with them
+COMBINED_SEX = {"male and female", "both sexes", "all sexes", "all"}
+COMBINED_SITE = {"all cancer sites combined", "all sites", "all types of cancer", "all cancers"}
+# National totals sit next to the state rows of the by-area table
+COMBINED_AREA_PREFIX = "united states"
+NO_DATA = "No epidemiology data available for this query."
+
+
+def _frame(data: Any) -> pd.DataFrame:
+    if isinstance(data, pd.DataFrame):
+        return data.copy()
+    return pd.DataFrame(data or [])
+
+
+def _table(df: pd.DataFrame) -> str:
+    try:
+        # tabulate only treats None as missing
+        return df.astype(object).where(df.notna(), None).to_markdown(index=False, missingval="-")
+    except ImportError:
+        return df.to_string(index=False, na_rep="-")
+
+
+def _prepare(df: pd.DataFrame) -> pd.DataFrame:
+    """Numeric CASES/POPULATION and YEAR_START; rows without usable counts dropped."""
+    if df.empty or not {"CASES", "POPULATION", "YEAR"} <= set(df.columns):
+        return pd.DataFrame()
+    df["CASES"] = pd.to_numeric(df["CASES"], errors="coerce")
+    df["POPULATION"] = pd.to_numeric(df["POPULATION"], errors="coerce")
+    df["YEAR"] = df["YEAR"].astype(str)
+    df["YEAR_START"] = pd.to_numeric(df["YEAR"].str[:4], errors="coerce")
+    return df[df["CASES"].notna() & (df["POPULATION"] > 0) & df["YEAR_START"].notna()]
+
+
+def _is_in(series: pd.Series, labels: set) -> pd.Series:
+    return series.astype(str).str.strip().str.lower().isin(labels)
+
+
+def _combined(df: pd.DataFrame, column: str, labels: set) -> pd.DataFrame:
+    """Rows of the combined category when the table has one, else all rows (to be aggregated)."""
+    if column not in df.columns:
+        return df
+    mask = _is_in(df[column], labels)
+    return df[mask] if mask.any() else df
+
+
+def _rates(df: pd.DataFrame, by: List[str]) -> pd.DataFrame:
+    """Cases, population and rate per 100k summed over ``by``."""
+    out = df.groupby(by, sort=False)[["CASES", "POPULATION"]].sum().reset_index()
+    out["RATE_PER_100K"] = (out["CASES"] / out["POPULATION"] * 1e5).round(2)
+    out[["CASES", "POPULATION"]] = out[["CASES", "POPULATION"]].round().astype("int64")
+    return out
+
+
+def _with_yoy(df: pd.DataFrame, group: List[str]) -> pd.DataFrame:
+    df = df.sort_values(group + ["YEAR_START"], kind="stable")
+    previous = df.groupby(group, sort=False)["RATE_PER_100K"].shift(1) if group else df["RATE_PER_100K"].shift(1)
+    df["YOY_CHANGE_PCT"] = ((df["RATE_PER_100K"] - previous) / previous.replace(0, np.nan) * 100).round(2)
+    return df
+
+
+def _national(df: pd.DataFrame) -> pd.Series:
+    if "AREA" not in df.columns:
+        return pd.Series(False, index=df.index)
+    return df["AREA"].astype(str).str.strip().str.lower().str.startswith(COMBINED_AREA_PREFIX)
+
+
+def _single_years(df: pd.DataFrame) -> pd.DataFrame:
+    # Multi-year spans ('2017-2021') overlap the single years; trends use single years when there are any
+    single = df["YEAR"].str.fullmatch(r"\d{4}")
+    return df[single] if single.any() else df
+
+
+def _scope(series: pd.Series, labels: set, everything: str) -> str:
+    """What the rows of a (combined or aggregated) column cover, for a table heading."""
+    values = sorted(set(series.astype(str).str.strip()))
+    lowered = {v.lower() for v in values}
+    if not values or lowered <= labels or lowered == {"male", "female"}:
+        return everything
+    if len(values) <= 3:
+        return ", ".join(values)
+    return f"{len(values)} {everything.split()[-1]}"
+
+
+def rate_trend(df: pd.DataFrame, site_column: str, event_column: Optional[str],
+               title: str = "Rate per 100k by year") -> str:
+    """Rate per 100k by year with year-over-year % change, per event type.
+
+    Uses the combined site/sex rows and the national area when the table has
+    them; the heading names the sites, sexes and areas the rows actually cover,
+    so filtered statistics aren't labelled as all sites or both sexes.
+    """
+    df = _combined(_combined(df, "SEX", COMBINED_SEX), site_column, COMBINED_SITE)
+    national = _national(df)
+    df = df[national] if national.any() else df
+    df = _single_years(df)
+    scope = [_scope(df[site_column], COMBINED_SITE, "all sites") if site_column in df.columns else "all sites",
+             _scope(df["SEX"], COMBINED_SEX, "both sexes") if "SEX" in df.columns else "both sexes"]
+    if "AREA" in df.columns:
+        scope.append(_scope(df["AREA"], set(), "all areas"))
+    group = [event_column] if event_column and event_column in df.columns else []
+    trend = _with_yoy(_rates(df, group + ["YEAR_START"]), group)
+    trend = trend.rename(columns={"YEAR_START": "YEAR"})
+    trend["YEAR"] = trend["YEAR"].astype(int)
+    if group:
+        trend = trend.rename(columns={group[0]: "EVENT"})
+    table = _table(trend.sort_values([c for c in ("EVENT", "YEAR") if c in trend.columns]))
+    return f"{title} ({', '.join(scope)}):\n" + table
+
+
+def _latest(df: pd.DataFrame) -> pd.DataFrame:
+    return df[df["YEAR_START"] == df["YEAR_START"].max()]
+
+
+def top_sites(df: pd.DataFrame, site_column: str, event_column: Optional[str], n: int = TOP_N) -> Optional[str]:
+    """Highest-rate sites in the latest year (both sexes, incidence when the table mixes event types)."""
+    if site_column not in df.columns:
+        return None
+    df = _combined(df, "SEX", COMBINED_SEX)
+    df = df[~_is_in(df[site_column], COMBINED_SITE)]
+    national = _national(df)
+    df = df[national] if national.any() else df
+    if event_column and event_column in df.columns:
+        incidence = df[event_column].astype(str).str.lower().str.contains("incidence")
+        df = df[incidence] if incidence.any() else df
+    rates = _with_yoy(_rates(_single_years(df), [site_column, "YEAR_START"]), [site_column])
+    latest = _latest(rates).nlargest(n, "RATE_PER_100K")
+    if latest.empty:
+        return None
+    year = int(latest["YEAR_START"].iloc[0])
+    return f"Top {len(latest)} sites by rate ({year}):\n" + _table(latest.drop(columns="YEAR_START"))
+
+
+def sex_split(df: pd.DataFrame, site_column: str, event_column: Optional[str]) -> Optional[str]:
+    """Male vs female rate per 100k in the latest year, with the male:female ratio."""
+    if "SEX" not in df.columns:
+        return None
+    df = df[~_is_in(df["SEX"], COMBINED_SEX)]
+    if df.empty:
+        return None
+    df = _combined(df, site_column, COMBINED_SITE)
+    national = _national(df)
+    df = _latest(_single_years(df[national] if national.any() else df)).copy()
+    if not (event_column and event_column in df.columns):
+        event_column = "EVENT"
+        df[event_column] = "All events"
+    rates = _rates(df, [event_column, "SEX"])
+    if rates.empty:
+        return None
+    split = rates.pivot_table(index=event_column, columns="SEX", values="RATE_PER_100K", aggfunc="sum")
+    split = split.reset_index().rename(columns={event_column: "EVENT"})
+    split.columns.name = None
+    columns = {str(c).strip().lower(): c for c in split.columns}
+    if "male" in columns and "female" in columns:
+        split["M_F_RATIO"] = (split[columns["male"]] / split[columns["female"]].replace(0, np.nan)).round(2)
+    year = int(df["YEAR_START"].max())
+    return f"Rate per 100k by sex ({year}):\n" + _table(split)
+
+
+def top_areas(df: pd.DataFrame, n: int = TOP_N) -> Optional[str]:
+    if "AREA" not in df.columns or df["AREA"].nunique() < 2:
+        return None
+    df = _combined(_combined(df, "SEX", COMBINED_SEX), "CANCERTYPE", COMBINED_SITE)
+    df = df[~_national(df)]
+    if df.empty:
+        return None
+    rates = _latest(_single_years(df))
+    rates = _rates(rates, ["AREA"]).nlargest(n, "RATE_PER_100K")
+    return f"Areas with the highest rate ({int(df['YEAR_START'].max())}):\n" + _table(rates)
+
+
+def age_groups(df: pd.DataFrame) -> Optional[str]:
+    if "AGE" not in df.columns:
+        return None
+    latest = _latest(_single_years(df))
+    group = ["EVENT_TYPE", "AGE"] if "EVENT_TYPE" in latest.columns else ["AGE"]
+    rates = _rates(_combined(latest, "SITE", COMBINED_SITE), group)
+    if rates.empty:
+        return None
+    return f"Childhood cases by age group ({int(latest['YEAR_START'].max())}):\n" + _table(rates)
+
+
+def summarize_epidemiology(statistics: Any) -> str:
+    """Markdown tables for the report's epidemiology section; never raises."""
+    if not isinstance(statistics, dict):
+        return NO_DATA
+    parts = []
+    try:
+        by_site = _prepare(_frame(statistics.get("by_site")))
+        incident = _prepare(_frame(statistics.get("incident")))
+        child = _prepare(_frame(statistics.get("child_cases")))
+        mortality = _frame(statistics.get("mortality"))
+
+        if not by_site.empty:
+            parts.append(rate_trend(by_site, "SITE", "EVENT_TYPE"))
+            parts.append(top_sites(by_site, "SITE", "EVENT_TYPE"))
+            parts.append(sex_split(by_site, "SITE", "EVENT_TYPE"))
+        if not incident.empty:
+            parts.append(rate_trend(incident, "CANCERTYPE", "TYPE", "Incidence rate per 100k by year"))
+            parts.append(top_sites(incident, "CANCERTYPE", "TYPE"))
+            parts.append(top_areas(incident))
+            if by_site.empty:
+                parts.append(sex_split(incident, "CANCERTYPE", "TYPE"))
+        if not child.empty:
+            parts.append(age_groups(child))
+        if not mortality.empty and {"SITE", "FIRST_YEAR", "LAST_YEAR"} <= set(mortality.columns):
+            parts.append("Mortality rate records:\n" + _table(mortality.head(TOP_N)))
+    except Exception as e:
+        logger.exception(f"Could not summarise epidemiology data: {e}")
+    parts = [p for p in parts if p]
+    return "\n\n".join(parts) if parts else NO_DATA
@@ -0,0 +1,58 @@
+# features/epi_sync.py
+"""
+Snapshot the Snowflake epidemiology tables into the local Parquet store used
+when the backend runs with SNOWFLAKE_MODE=local.
+
+Run from the backend directory:
+
+    python -m features.epi_sync [--store-dir PATH]
+"""
+
+import os
+import argparse
+import datetime
+import logging
+
+from dotenv import load_dotenv
+
+from core.epi_store import STAT_TABLES, EPI_STORE_DIR, write_store
+from agents.snowflake_agent import SnowflakeAgent
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def sync(store_dir: str = EPI_STORE_DIR) -> dict:
+    agent = SnowflakeAgent(mode="remote")
+    try:
+        tables = {}
+        for name, spec in STAT_TABLES.items():
+            # Full-table snapshot; bypass the result cache so it isn't filled with whole tables
+            table = agent.execute_query_arrow(f"SELECT * FROM {spec.table}", cache=False)
+            if table is None:
+                raise RuntimeError(f"Could not read {spec.table} from Snowflake")
+            tables[name] = table.to_pandas()
+            logger.info(f"Fetched {len(tables[name])} rows from {spec.table}")
+    finally:
+        agent.close()
+
+    write_store(tables, {
+        "created": datetime.datetime.utcnow().isoformat(),
+        "database": agent.database,
+        "schema": agent.schema,
+    }, store_dir)
+    return {name: len(df) for name, df in tables.items()}
+
+
+def main():
+    load_dotenv(os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), '.env'))
+    parser = argparse.ArgumentParser(description="Snapshot the Snowflake epidemiology tables to local Parquet.")
+    parser.add_argument("--store-dir", default=os.getenv("EPI_STORE_DIR", EPI_STORE_DIR))
+    args = parser.parse_args()
+
+    counts = sync(args.store_dir)
+    logger.info(f"Sync finished: {counts}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+# features/ingestion.py
+"""
+Offline ingestion: parse every PDF in the S3 bucket, chunk it and store the
+chunk embeddings in the on-disk index read by the RAG agent.
+
+Run from the backend directory:
+
+    python -m features.ingestion [--prefix research/] [--index-dir PATH] [--force]
+"""
+
+import os
+import argparse
+import datetime
+import logging
+from typing import Any, Dict, List
+
+from dotenv import load_dotenv
+
+from core.s3_client import S3FileManager
+from core.embeddings import get_embeddings, EMBED_MODEL
+from core.vector_store import ChunkIndexWriter, RAG_INDEX_DIR, read_manifest, train_layout
+from features.mistral_parser import load_parsed_pdf, start_parse_pool, shutdown_parse_pool, PDF_PARSE_MODE
+from features.chunking_stratergy import (
+    iter_token_chunks, markdown_units, block_units, CHUNK_TOKENS, CHUNK_OVERLAP_TOKENS,
+)
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+EMBED_BATCH_SIZE = 256
+
+
+def collect_chunks(s3_client: S3FileManager, pdf_objects: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    chunks = []
+    for obj in pdf_objects:
+        try:
+            parsed = load_parsed_pdf(s3_client, obj)
+        except Exception:
+            logger.exception(f"Error parsing PDF {obj['key']}, skipping")
+            continue
+        # Layout parses keep block pages, so their chunks can cite them
+        units = block_units(parsed["blocks"]) if parsed.get("blocks") else markdown_units(parsed["markdown"])
+        count = 0
+        for i, piece in enumerate(iter_token_chunks(units)):
+            chunk = {"key": obj["key"], "etag": obj["etag"], "chunk": i, "text": piece["text"]}
+            if piece["section"]:
+                chunk["section"] = piece["section"]
+            if piece["pages"]:
+                chunk["pages"] = piece["pages"]
+            chunks.append(chunk)
+            count += 1
+        logger.info(f"Chunked {obj['key']} into {count} chunks")
+    return chunks
+
+
+def ingest(bucket: str, prefix: str = "", index_dir: str = RAG_INDEX_DIR, force: bool = False) -> int:
+    s3_client = S3FileManager(bucket, prefix)
+    pdf_objects = [o for o in s3_client.list_objects() if o["key"].endswith(".pdf")]
+    versions = {o["key"]: o["etag"] for o in pdf_objects}
+
+    manifest = read_manifest(index_dir)
+    chunking = {"max_tokens": CHUNK_TOKENS, "overlap_tokens": CHUNK_OVERLAP_TOKENS}
+    if (not force and manifest.get("objects") == versions and manifest.get("model") == EMBED_MODEL
+            and manifest.get("parse_mode", "simple") == PDF_PARSE_MODE and manifest.get("chunking") == chunking):
+        logger.info("Index is up to date with the bucket, nothing to ingest")
+        # e.g. RAG_INDEX_MODE switched to ivf since the last build
+        if train_layout(index_dir):
+            logger.info(f"Trained the IVF layout for {index_dir}")
+        return manifest.get("count", 0)
+
+    chunks = collect_chunks(s3_client, pdf_objects)
+    if not chunks:
+        logger.warning("No chunks produced, index left unchanged")
+        return 0
+
+    writer = None
+    for start in range(0, len(chunks), EMBED_BATCH_SIZE):
+        batch = chunks[start:start + EMBED_BATCH_SIZE]
+        embeddings = get_embeddings([c["text"] for c in batch])
+        if writer is None:
+            writer = ChunkIndexWriter(index_dir, len(chunks), embeddings.shape[1])
+        writer.add(embeddings, batch)
+        logger.info(f"Embedded {start + len(batch)}/{len(chunks)} chunks")
+
+    writer.commit({
+        "created": datetime.datetime.utcnow().isoformat(),
+        "bucket": bucket,
+        "prefix": prefix,
+        "model": EMBED_MODEL,
+        "parse_mode": PDF_PARSE_MODE,
+        "chunking": chunking,
+        "objects": versions,
+    })
+    return len(chunks)
+
+
+def main():
+    load_dotenv(os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), '.env'))
+    parser = argparse.ArgumentParser(description="Build the RAG chunk embedding index from S3 PDFs.")
+    parser.add_argument("--bucket", default=os.getenv("AWS_BUCKET_NAME"))
+    parser.add_argument("--prefix", default="")
+    parser.add_argument("--index-dir", default=RAG_INDEX_DIR)
+    parser.add_argument("--force", action="store_true", help="Rebuild even if no object changed")
+    args = parser.parse_args()
+    if not args.bucket:
+        parser.error("--bucket or AWS_BUCKET_NAME is required")
+
+    start_parse_pool()
+    try:
+        count = ingest(args.bucket, args.prefix, args.index_dir, args.force)
+    finally:
+        shutdown_parse_pool()
+    logger.info(f"Ingestion finished: {count} chunks indexed")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,133 @@
 # features/mistral_parser.py
 
+import os
+import io
+import logging
+import tempfile
+import threading
+import multiprocessing
 import fitz  # PyMuPDF
-from typing import Tuple
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
 
-def pdf_mistralocr_converter(pdf_bytes: bytes, base_path: str, s3_client) -> Tuple[str, str]:
+logger = logging.getLogger(__name__)
+
+# Documents with at least this many pages are parsed in page ranges across processes
+PDF_PARSE_WORKERS = int(os.getenv("PDF_PARSE_WORKERS", str(min(4, os.cpu_count() or 1))))
+PDF_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "64"))
+PDF_PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", "16"))
+# Caps for oversized documents; 0 means unlimited
+PDF_MAX_PAGES = int(os.getenv("PDF_MAX_PAGES", "0"))
+PDF_MAX_CHARS = int(os.getenv("PDF_MAX_CHARS", "0"))
+# "simple" (line-based markdown) or "layout" (font-size headings, tables, no running headers)
+PDF_PARSE_MODE = os.getenv("PDF_PARSE_MODE", "simple").lower()
+
+
+def page_markdown(page_text: str) -> str:
+    """Simple conversion: each line is a paragraph, a line ending in ':' a ### heading."""
+    lines = []
+    for line in page_text.splitlines():
+        line = line.strip()
+        if line:
+            lines.append(f"\n### {line}\n" if line.endswith(":") else f"{line}\n")
+    return "".join(lines)
+
+
+# Parse pool shared by all requests. Workers are spawned, not forked: the server forks
+# nothing from its threads, and a worker holds no copy of the parent's clients or locks.
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def start_parse_pool(workers: int = PDF_PARSE_WORKERS) -> Optional[ProcessPoolExecutor]:
+    """Start the process pool for large documents (at app startup); no-op with one worker."""
+    global _pool
+    with _pool_lock:
+        if _pool is None and workers > 1:
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+            logger.info(f"Started PDF parse pool with {workers} processes")
+        return _pool
+
+
+def shutdown_parse_pool() -> None:
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+_worker_doc: Tuple[Optional[str], Any] = (None, None)
+
+
+def _open_worker_doc(path: str) -> fitz.Document:
+    # A worker keeps the last document open across the ranges it is given
+    global _worker_doc
+    if _worker_doc[0] != path:
+        if _worker_doc[1] is not None:
+            _worker_doc[1].close()
+        _worker_doc = (path, fitz.open(path))
+    return _worker_doc[1]
+
+
+def _parse_range(path: str, page_fn: Callable[[fitz.Page], Any], start: int, stop: int) -> List[Any]:
+    """``page_fn`` applied to pages [start, stop) of the PDF at ``path``; runs in a worker process."""
+    doc = _open_worker_doc(path)
+    return [page_fn(doc[i]) for i in range(start, stop)]
+
+
+def _page_limit(page_count: int, max_pages: Optional[int]) -> int:
+    return min(page_count, max_pages) if max_pages else page_count
+
+
+def _simple_page(page: fitz.Page) -> Tuple[str, str]:
+    text = page.get_text()
+    return text, page_markdown(text)
+
+
+def map_pages(pdf_bytes: bytes, page_fn: Callable[[fitz.Page], Any], max_pages: Optional[int] = PDF_MAX_PAGES,
+              workers: int = PDF_PARSE_WORKERS) -> Iterator[Any]:
+    """Yield ``page_fn(page)`` per page, in order.
+
+    Once ``start_parse_pool`` has run, large documents are split into page
+    ranges parsed in the pool (``page_fn`` must be a module-level function);
+    ranges are yielded as they complete in order, so the caller can stop early
+    (e.g. at a character cap) without waiting for the whole document.
+    """
+    with fitz.open(stream=pdf_bytes, filetype="pdf") as doc:
+        page_count = _page_limit(doc.page_count, max_pages)
+        pool = _pool
+        if pool is None or workers <= 1 or page_count < PDF_PARALLEL_MIN_PAGES:
+            for i in range(page_count):
+                yield page_fn(doc[i])
+            return
+
+    starts = list(range(0, page_count, PDF_PAGES_PER_TASK))
+    stops = [min(s + PDF_PAGES_PER_TASK, page_count) for s in starts]
+    logger.info(f"Parsing {page_count} pages in {len(starts)} ranges on the parse pool")
+    # Workers read the PDF from a temp file instead of receiving the bytes with every range
+    with tempfile.NamedTemporaryFile(suffix=".pdf") as tmp:
+        tmp.write(pdf_bytes)
+        tmp.flush()
+        futures = [pool.submit(_parse_range, tmp.name, page_fn, start, stop) for start, stop in zip(starts, stops)]
+        try:
+            for future in futures:
+                yield from future.result()
+        finally:
+            # Stopped early (cap reached or consumer gone): don't parse the remaining ranges
+            for future in futures:
+                future.cancel()
+
+
+def iter_pages(pdf_bytes: bytes, max_pages: Optional[int] = PDF_MAX_PAGES,
+               workers: int = PDF_PARSE_WORKERS) -> Iterator[Tuple[str, str]]:
+    """Yield (text, markdown) per page, in order."""
+    return map_pages(pdf_bytes, _simple_page, max_pages, workers)
+
+
+def pdf_mistralocr_converter(pdf_bytes: bytes, base_path: str, s3_client,
+                             max_pages: Optional[int] = PDF_MAX_PAGES,
+                             max_chars: Optional[int] = PDF_MAX_CHARS) -> Tuple[str, str]:
     """
     Convert PDF bytes into Markdown format text.
 
@@ -11,26 +135,66 @@ def pdf_mistralocr_converter(pdf_bytes: bytes, base_path: str, s3_client) -> Tup
         pdf_bytes (bytes): The raw PDF content.
         base_path (str): Unused but kept for compatibility.
         s3_client: Unused but kept for compatibility.
+        max_pages (int, optional): Parse at most this many pages (0/None for all).
+        max_chars (int, optional): Stop once the plain text reaches this many characters (0/None for no cap).
 
     Returns:
         Tuple[str, str]: (Plain extracted text, Markdown converted text)
     """
-    doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+    full_text = io.StringIO()
+    markdown_text = io.StringIO()
+    chars = 0
+
+    for page_count, (page_text, page_md) in enumerate(iter_pages(pdf_bytes, max_pages), start=1):
+        if max_chars and chars + len(page_text) >= max_chars:
+            keep = max_chars - chars
+            full_text.write(page_text[:keep])
+            markdown_text.write(page_markdown(page_text[:keep]))
+            logger.warning(f"PDF text capped at {max_chars} characters after {page_count} pages")
+            break
+        full_text.write(page_text)
+        full_text.write("\n")
+        markdown_text.write(page_md)
+        chars += len(page_text) + 1
+
+    return full_text.getvalue().strip(), markdown_text.getvalue().strip()
+
+
+def parse_pdf(pdf_bytes: bytes, mode: str = PDF_PARSE_MODE) -> Dict[str, Any]:
+    """Parsed document for the doc cache: text and markdown, plus positioned blocks in layout mode."""
+    if mode == "layout":
+        from features.pdf_layout import pdf_layout_converter
+        parsed = pdf_layout_converter(pdf_bytes, max_pages=PDF_MAX_PAGES, max_chars=PDF_MAX_CHARS)
+    else:
+        text, markdown = pdf_mistralocr_converter(pdf_bytes, "research-papers", None)
+        parsed = {"text": text, "markdown": markdown}
+    return {**parsed, "mode": mode}
+
+
+def parse_variant(mode: str = PDF_PARSE_MODE) -> str:
+    """Doc cache variant for a parse mode and its settings; the plain parser keeps the original key."""
+    if mode == "layout":
+        from features.pdf_layout import LAYOUT_VERSION
+        variant = f"layout-v{LAYOUT_VERSION}"
+    else:
+        variant = ""
+    if PDF_MAX_PAGES or PDF_MAX_CHARS:
+        variant += f":p{PDF_MAX_PAGES}:c{PDF_MAX_CHARS}"
+    return variant
 
-    full_text = ""
-    markdown_text = ""
 
-    for page in doc:
-        page_text = page.get_text()
-        full_text += page_text + "\n"
+def load_parsed_pdf(s3_client, obj: dict, mode: str = PDF_PARSE_MODE) -> dict:
+    """Parse an S3 PDF listed by ``S3FileManager.list_objects``, reusing the doc cache while its ETag is unchanged."""
+    from core.doc_cache import get_doc_cache
 
-        # Simple conversion: Treat each line as paragraph
-        for line in page_text.splitlines():
-            line = line.strip()
-            if len(line) > 0:
-                if line.endswith(":"):
-                    markdown_text += f"\n### {line}\n"
-                else:
-                    markdown_text += f"{line}\n"
+    doc_cache = get_doc_cache()
+    version = obj.get("etag") or obj.get("last_modified", "")
+    variant = parse_variant(mode)
+    cached = doc_cache.get(s3_client.bucket_name, obj["key"], version, variant)
+    if cached is not None:
+        return cached
 
-    return full_text.strip(), markdown_text.strip()
+    pdf_content = s3_client.load_s3_pdf(obj["key"])
+    parsed = parse_pdf(pdf_content, mode)
+    doc_cache.put(s3_client.bucket_name, obj["key"], version, parsed, variant)
+    return parsed
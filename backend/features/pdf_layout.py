@@ -0,0 +1,254 @@
+# features/pdf_layout.py
+"""
+Layout-aware PDF to markdown conversion.
+
+Instead of guessing headings from trailing colons, every text line is read
+from PyMuPDF's ``get_text("dict")`` with its span font sizes:
+
+- the body size is the size most characters are set in; lines clearly larger
+  become headings, one markdown level per distinct size (largest first), so
+  sections come out as ``##`` and ``markdown_chunking`` can split on them
+- running headers and footers (the same text in the page margins on many
+  pages, page numbers) are dropped
+- two-column pages are read column by column
+- tables found by ``page.find_tables()`` become markdown tables
+
+The result keeps every block with its page and bbox so chunking and citations
+can work from the cached structure without re-parsing the PDF.
+"""
+
+import os
+import re
+import logging
+from collections import Counter, defaultdict
+from typing import Any, Dict, List, Optional
+
+import fitz  # PyMuPDF
+
+from features.mistral_parser import map_pages, PDF_MAX_PAGES, PDF_MAX_CHARS
+
+logger = logging.getLogger(__name__)
+
+# Bump when the conversion changes so cached layout parses are redone
+LAYOUT_VERSION = 1
+
+HEADING_SIZE_RATIO = float(os.getenv("PDF_HEADING_SIZE_RATIO", "1.15"))
+HEADING_MAX_WORDS = 20
+MAX_HEADING_LEVEL = 4
+# Top/bottom fraction of the page searched for running headers and footers
+MARGIN_RATIO = 0.08
+# A margin line repeated on at least this share of pages is a running header/footer
+REPEAT_RATIO = 0.5
+PDF_DETECT_TABLES = os.getenv("PDF_DETECT_TABLES", "true").lower() in ("1", "true", "yes")
+
+_DIGITS = re.compile(r"\d+")
+_PAGE_NUMBER = re.compile(r"^(page\s*)?\d+(\s*(of|/)\s*\d+)?$", re.IGNORECASE)
+_BOLD = 16  # span flags bit
+
+
+def _round_size(size: float) -> float:
+    return round(size * 2) / 2
+
+
+def _inside(bbox, area) -> bool:
+    x = (bbox[0] + bbox[2]) / 2
+    y = (bbox[1] + bbox[3]) / 2
+    return area[0] <= x <= area[2] and area[1] <= y <= area[3]
+
+
+def page_layout(page: fitz.Page) -> Dict[str, Any]:
+    """Text lines (with font size, bold flag and source block) and tables of one page, as plain data."""
+    tables = []
+    if PDF_DETECT_TABLES:
+        try:
+            for table in page.find_tables().tables:
+                markdown = table.to_markdown().strip()
+                if markdown:
+                    tables.append({"bbox": [round(v, 1) for v in table.bbox], "markdown": markdown})
+        except Exception as e:
+            logger.warning(f"Table detection failed on page {page.number + 1}: {e}")
+
+    lines = []
+    for b, block in enumerate(page.get_text("dict")["blocks"]):
+        if block.get("type") != 0:
+            continue
+        for line in block["lines"]:
+            spans = [s for s in line["spans"] if s["text"].strip()]
+            if not spans:
+                continue
+            text = "".join(s["text"] for s in line["spans"]).strip()
+            bbox = [round(v, 1) for v in line["bbox"]]
+            if any(_inside(bbox, t["bbox"]) for t in tables):
+                continue
+            sizes = Counter()
+            for s in spans:
+                sizes[_round_size(s["size"])] += len(s["text"].strip())
+            lines.append({
+                "text": text,
+                "bbox": bbox,
+                "size": sizes.most_common(1)[0][0],
+                "bold": all(s["flags"] & _BOLD for s in spans),
+                "block": b,
+                "block_lines": len(block["lines"]),
+            })
+    return {"page": page.number + 1, "width": page.rect.width, "height": page.rect.height,
+            "lines": lines, "tables": tables}
+
+
+def _margin_key(line: Dict[str, Any], page: Dict[str, Any]) -> Optional[str]:
+    y0, y1 = line["bbox"][1], line["bbox"][3]
+    if y1 > page["height"] * MARGIN_RATIO and y0 < page["height"] * (1 - MARGIN_RATIO):
+        return None
+    # Page numbers inside running headers vary; compare the text with digits masked
+    return _DIGITS.sub("#", " ".join(line["text"].lower().split()))
+
+
+def strip_running_text(pages: List[Dict[str, Any]]) -> int:
+    """Drop page numbers and margin lines repeated across pages, in place; returns lines removed."""
+    counts = Counter()
+    for page in pages:
+        counts.update({k for k in (_margin_key(l, page) for l in page["lines"]) if k})
+    min_pages = max(2, int(len(pages) * REPEAT_RATIO))
+    removed = 0
+    for page in pages:
+        kept = []
+        for line in page["lines"]:
+            key = _margin_key(line, page)
+            if key and (_PAGE_NUMBER.match(line["text"].strip()) or (len(pages) > 1 and counts[key] >= min_pages)):
+                removed += 1
+                continue
+            kept.append(line)
+        page["lines"] = kept
+    return removed
+
+
+def heading_levels(pages: List[Dict[str, Any]]) -> Dict[float, int]:
+    """Markdown level per heading font size; the body size is the one most characters use."""
+    chars, occurrences = Counter(), defaultdict(set)
+    for page in pages:
+        for line in page["lines"]:
+            chars[line["size"]] += len(line["text"])
+            occurrences[line["size"]].add((page["page"], line["block"]))
+    if not chars:
+        return {}
+    body = chars.most_common(1)[0][0]
+    sizes = sorted((s for s in chars if s >= body * HEADING_SIZE_RATIO), reverse=True)
+    # A largest size used once on the first page is the title (#); sections then start at ##
+    start = 2
+    if sizes and len(occurrences[sizes[0]]) == 1 and next(iter(occurrences[sizes[0]]))[0] == 1:
+        start = 1
+    return {size: min(start + i, MAX_HEADING_LEVEL) for i, size in enumerate(sizes)}
+
+
+def _is_heading_line(line: Dict[str, Any], levels: Dict[float, int], bold_level: int) -> Optional[int]:
+    if len(line["text"].split()) > HEADING_MAX_WORDS:
+        return None
+    if line["size"] in levels:
+        return levels[line["size"]]
+    # A short bold line standing alone as its own block reads as a run-in subheading
+    if line["bold"] and line["block_lines"] == 1 and not line["text"].endswith("."):
+        return bold_level
+    return None
+
+
+def _join_lines(texts: List[str]) -> str:
+    out = ""
+    for text in texts:
+        if out.endswith("-") and text[:1].islower():
+            out = out[:-1] + text  # re-join a word hyphenated across lines
+        else:
+            out = f"{out} {text}" if out else text
+    return out
+
+
+def _bbox_union(boxes: List[List[float]]) -> List[float]:
+    return [min(b[0] for b in boxes), min(b[1] for b in boxes), max(b[2] for b in boxes), max(b[3] for b in boxes)]
+
+
+def page_blocks(page: Dict[str, Any], levels: Dict[float, int], bold_level: int) -> List[Dict[str, Any]]:
+    """Headings, paragraphs and tables of one page, unordered."""
+    blocks = []
+    current: Optional[Dict[str, Any]] = None
+
+    def flush():
+        nonlocal current
+        if current:
+            blocks.append({
+                "page": page["page"], "bbox": _bbox_union(current["boxes"]), "type": current["type"],
+                "text": _join_lines(current["texts"]), **({"level": current["level"]} if current["type"] == "heading" else {}),
+            })
+        current = None
+
+    for line in page["lines"]:
+        level = _is_heading_line(line, levels, bold_level)
+        kind = "heading" if level else "paragraph"
+        same = (current and current["type"] == kind and current["block"] == line["block"]
+                and current.get("level") == level)
+        if not same:
+            flush()
+            current = {"type": kind, "level": level, "block": line["block"], "texts": [], "boxes": []}
+        current["texts"].append(line["text"])
+        current["boxes"].append(line["bbox"])
+    flush()
+
+    for table in page["tables"]:
+        blocks.append({"page": page["page"], "bbox": table["bbox"], "type": "table", "text": table["markdown"]})
+    return blocks
+
+
+def reading_order(blocks: List[Dict[str, Any]], width: float) -> List[Dict[str, Any]]:
+    """Top to bottom, reading two-column stretches left column first; full-width blocks split the stretches."""
+    middle = width / 2
+    ordered, left, right = [], [], []
+    for block in sorted(blocks, key=lambda b: (b["bbox"][1], b["bbox"][0])):
+        x0, x1 = block["bbox"][0], block["bbox"][2]
+        if x1 <= middle + 5:
+            left.append(block)
+        elif x0 >= middle - 5:
+            right.append(block)
+        else:
+            ordered.extend(left + right)
+            left, right = [], []
+            ordered.append(block)
+    return ordered + left + right
+
+
+def block_markdown(block: Dict[str, Any]) -> str:
+    if block["type"] == "heading":
+        return f"{'#' * block['level']} {block['text']}"
+    return block["text"]
+
+
+def pdf_layout_converter(pdf_bytes: bytes, max_pages: Optional[int] = PDF_MAX_PAGES,
+                         max_chars: Optional[int] = PDF_MAX_CHARS) -> Dict[str, Any]:
+    """
+    Convert PDF bytes into structured markdown.
+
+    Returns:
+        dict: ``text`` and ``markdown`` like the simple parser, plus ``blocks``:
+        ``{"page", "bbox", "type": heading|paragraph|table, "text", "level"}``
+        in reading order.
+    """
+    pages = list(map_pages(pdf_bytes, page_layout, max_pages))
+    removed = strip_running_text(pages)
+    levels = heading_levels(pages)
+    bold_level = min(max(levels.values(), default=1) + 1, MAX_HEADING_LEVEL)
+    logger.info(f"Layout: {len(pages)} pages, heading sizes {levels}, {removed} header/footer lines dropped")
+
+    blocks, chars = [], 0
+    for page in pages:
+        for block in reading_order(page_blocks(page, levels, bold_level), page["width"]):
+            if max_chars and chars + len(block["text"]) > max_chars:
+                logger.warning(f"PDF text capped at {max_chars} characters on page {page['page']}")
+                break
+            blocks.append(block)
+            chars += len(block["text"]) + 1
+        else:
+            continue
+        break
+
+    return {
+        "text": "\n".join(b["text"] for b in blocks),
+        "markdown": "\n\n".join(block_markdown(b) for b in blocks),
+        "blocks": blocks,
+    }
@@ -0,0 +1,196 @@
+# features/web_extraction.py
+"""
+Structured fields pulled out of Tavily search results: clinical trial phase,
+status, NCT IDs and enrollment; hospital addresses and ratings; the location
+named in a query.
+
+Patterns are compiled once at import, and each result is lower-cased once so
+the trial patterns can run case-sensitively; substring checks skip patterns
+whose keywords do not appear at all. This is not faster than the ad-hoc
+regexes it replaced: trials take about twice as long (they now yield NCT IDs,
+enrollment and a normalised status as well), hospitals about 1.3x and the
+location the same (benchmarks/bench_web_extraction.py). At a few microseconds
+per result that is negligible next to the Tavily round-trip.
+"""
+
+import re
+from typing import Any, Dict, Iterable, List, Optional
+
+_ROMAN = {"i": 1, "ii": 2, "iii": 3, "iv": 4}
+
+# Sub-phase letters ('Phase 1b', 'Phase Ib/II', 'Phase 2a') count as their phase
+PHASE_PATTERN = re.compile(
+    r"\bphase\s*(iv|iii|ii|i|[1-4])[ab]?\b(?:\s*(?:/|-|and|to)\s*(?:phase\s*)?(iv|iii|ii|i|[1-4])[ab]?\b)?"
+)
+EARLY_PHASE_PATTERN = re.compile(r"early\s+phase\s*(?:1|i)\b")
+
+# ClinicalTrials.gov overall status vocabulary; longer phrases must win over their substrings
+TRIAL_STATUSES = {
+    "not yet recruiting": "Not yet recruiting",
+    "active, not recruiting": "Active, not recruiting",
+    "active not recruiting": "Active, not recruiting",
+    "enrolling by invitation": "Enrolling by invitation",
+    "recruiting": "Recruiting",
+    "completed": "Completed",
+    "terminated": "Terminated",
+    "withdrawn": "Withdrawn",
+    "suspended": "Suspended",
+    "active": "Active",
+}
+STATUS_PATTERN = re.compile("|".join(re.escape(p) for p in sorted(TRIAL_STATUSES, key=len, reverse=True)))
+
+NCT_PATTERN = re.compile(r"nct\d{8}\b")
+ENROLLMENT_PATTERN = re.compile(
+    r"enrol(?:l?ment|ling|led|l)?\b(?:\s*\((?:estimated|actual|anticipated)\))?\s*[:\-]?\s*"
+    r"(?:of\s+|up\s+to\s+|approximately\s+|about\s+)?(\d{1,3}(?:,\d{3})+|\d+)"
+)
+# Without an enrollment label only '<n> participants' counts: 'a trial in 2023 patients' is a date
+_PARTICIPANT_WORD = "participants"
+# Matched backwards from the participant word found with str.find, e.g. '1,200 participants'
+_COUNT_BEFORE = re.compile(r"(?<![\w,])(\d{1,3}(?:,\d{3})+|\d+)\s+$")
+_YEAR_LIKE = re.compile(r"(?:19|20)\d\d")
+
+_STREET_SUFFIX = (r"(?:Street|St|Avenue|Ave|Road|Rd|Boulevard|Blvd|Drive|Dr|Lane|Ln|Way|Parkway|Pkwy|"
+                  r"Place|Pl|Court|Ct|Circle|Cir|Highway|Hwy|Plaza|Square|Sq|Terrace|Pike|Turnpike)")
+ADDRESS_PATTERN = re.compile(
+    r"\b\d{1,5}\s+(?:[NSEW]\.?\s+)?(?:[A-Z0-9][\w.'-]*\s+){0,5}" + _STREET_SUFFIX + r"\b\.?(?:\s+(?:NE|NW|SE|SW|N|S|E|W)\b\.?)?"
+    r"(?:,?\s+(?:Suite|Ste|Floor|Fl|Building|Bldg|Room|Rm)\.?\s*[\w-]+)?"
+    r"(?:,\s*[A-Z][A-Za-z.'-]*(?:\s+[A-Z][A-Za-z.'-]*){0,3})?"
+    r"(?:,?\s*[A-Z]{2}\s+\d{5}(?:-\d{4})?)?"
+)
+# The leading word boundary is checked on each match: a \b there makes the search scan much slower
+RATING_PATTERN = re.compile(r"([0-5](?:\.\d)?)\s*(?:/\s*5|[Oo]ut\s+of\s+5|[Ss]tars?)\b")
+
+# First 'in X', else 'at X', else 'near X'; the words must stand alone ('Brain Cancer' is not 'in Cancer'),
+# which is checked per match like the rating boundary
+LOCATION_PATTERNS = [re.compile(rf"{word}\s+([A-Z][\w\s,]+)") for word in ("in", "at", "near")]
+DEFAULT_LOCATION = "United States"
+
+
+def _phase_number(token: str) -> int:
+    return _ROMAN.get(token) or int(token)
+
+
+def _is_word_at(text: str, start: int, end: int) -> bool:
+    return (start == 0 or not text[start - 1].isalnum()) and (end == len(text) or not text[end].isalnum())
+
+
+def _starts_word(text: str, start: int) -> bool:
+    return start == 0 or not (text[start - 1].isalnum() or text[start - 1] in "._")
+
+
+def _phase(lower: str) -> str:
+    if "phase" not in lower:
+        return "Unknown"
+    if "early" in lower and EARLY_PHASE_PATTERN.search(lower):
+        return "Early Phase 1"
+    m = PHASE_PATTERN.search(lower)
+    if m is None:
+        return "Unknown"
+    first = _phase_number(m.group(1))
+    if m.group(2):
+        second = _phase_number(m.group(2))
+        if second != first:
+            return f"Phase {min(first, second)}/{max(first, second)}"
+    return f"Phase {first}"
+
+
+def _status(lower: str, start: int = 0) -> str:
+    # Earliest whole-word match; the alternation lists longer phrases first so they win at the same position
+    m = STATUS_PATTERN.search(lower, start)
+    while m and not _is_word_at(lower, m.start(), m.end()):
+        m = STATUS_PATTERN.search(lower, m.start() + 1)
+    return TRIAL_STATUSES[m.group(0)] if m else "Unknown"
+
+
+def _nct_ids(lower: str) -> List[str]:
+    if "nct" not in lower:
+        return []
+    return list(dict.fromkeys(m.upper() for m in NCT_PATTERN.findall(lower)))
+
+
+def _participants(lower: str, start: int) -> Optional[str]:
+    pos = lower.find(_PARTICIPANT_WORD, start)
+    while pos != -1:
+        m = _COUNT_BEFORE.search(lower, max(start, pos - 24), pos)
+        if m and _is_word_at(lower, pos, pos + len(_PARTICIPANT_WORD)) and not _YEAR_LIKE.fullmatch(m.group(1)):
+            return m.group(1)
+        pos = lower.find(_PARTICIPANT_WORD, pos + 1)
+    return None
+
+
+def _enrollment(lower: str, start: int = 0) -> Optional[int]:
+    m = ENROLLMENT_PATTERN.search(lower, start) if "enrol" in lower else None
+    count = m.group(1) if m else _participants(lower, start)
+    return int(count.replace(",", "")) if count else None
+
+
+def normalize_phase(text: str) -> str:
+    """'phase II/III', 'Phase 2-3', 'phase ii and iii' -> 'Phase 2/3'; 'Unknown' when absent."""
+    return _phase(text.lower())
+
+
+def normalize_status(text: str) -> str:
+    return _status(text.lower())
+
+
+def find_nct_ids(text: str) -> List[str]:
+    return _nct_ids(text.lower())
+
+
+def find_enrollment(text: str) -> Optional[int]:
+    return _enrollment(text.lower())
+
+
+def find_address(text: str) -> Optional[str]:
+    m = ADDRESS_PATTERN.search(text)
+    return " ".join(m.group(0).split()).rstrip(",") if m else None
+
+
+def find_rating(text: str) -> Optional[float]:
+    for m in RATING_PATTERN.finditer(text):
+        if _starts_word(text, m.start()):
+            return float(m.group(1))
+    return None
+
+
+def extract_location(query: str) -> str:
+    for pattern in LOCATION_PATTERNS:
+        for m in pattern.finditer(query):
+            if _starts_word(query, m.start()):
+                return m.group(1).strip()
+    return DEFAULT_LOCATION
+
+
+def extract_trials(results: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    trials = []
+    for res in results:
+        title = res.get("title", "")
+        content = res.get("content", "")
+        url = res.get("url", "")
+        # One lower-cased copy per result; status and enrollment only look past the title
+        lower = f"{title} {content} {url}".lower()
+        body = len(title) + 1
+        trials.append({
+            "title": title,
+            "description": content,
+            "phase": _phase(lower),
+            "status": _status(lower[:body + len(content)], body),
+            "nct_ids": _nct_ids(lower),
+            "enrollment": _enrollment(lower[:body + len(content)], body),
+            "source_url": url,
+        })
+    return trials
+
+
+def extract_hospitals(results: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    hospitals = []
+    for res in results:
+        content = res.get("content", "")
+        hospitals.append({
+            "name": res.get("title", "Unknown"),
+            "address": find_address(content) or "Unknown address",
+            "rating": find_rating(content),
+            "source_url": res.get("url", ""),
+        })
+    return hospitals
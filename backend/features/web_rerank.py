@@ -0,0 +1,133 @@
+# features/web_rerank.py
+"""
+Post-processing of web search results before they are summarised: canonical
+URLs, SimHash near-duplicate removal (syndicated copies of one article), then
+relevance reranking against the query with the cached embedding service, so
+the few slots per category go to distinct, on-topic items.
+"""
+
+import os
+import re
+import hashlib
+import logging
+import numpy as np
+from typing import Any, Dict, List, Sequence, Tuple
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+from core.embeddings import get_embeddings
+from core.vector_index import normalize, top_k
+
+logger = logging.getLogger(__name__)
+
+SIMHASH_BITS = 64
+# Fingerprints this many bits apart or closer are treated as the same article. Snippets are
+# short, so the usual threshold of 3 for full pages misses lightly edited copies; on snippet
+# pairs 10 catches copies with a reworded phrase while keeping templated listings for
+# different trials (about 13 apart) distinct.
+SIMHASH_MAX_DISTANCE = int(os.getenv("WEB_SIMHASH_MAX_DISTANCE", "10"))
+SHINGLE_SIZE = 2
+
+TRACKING_PARAMS = re.compile(r"^(utm_\w+|gclid|fbclid|mc_cid|mc_eid|ref|ref_src|source|cmpid|_ga|igshid)$", re.IGNORECASE)
+_MOBILE_HOST = re.compile(r"^(www\d*|m|amp|mobile)\.")
+_WORD = re.compile(r"\w+")
+
+# Text fields compared for duplicates/relevance, and the URL field, per result shape
+TEXT_FIELDS = ("title", "name", "description", "snippet", "address")
+URL_FIELDS = ("source_url", "url")
+
+
+def canonicalize_url(url: str) -> str:
+    """https, bare host, no tracking params, fragment, AMP suffix or trailing slash; params sorted."""
+    if not url:
+        return ""
+    try:
+        parts = urlsplit(url.strip())
+    except ValueError:
+        return url.strip()
+    host = _MOBILE_HOST.sub("", (parts.hostname or "").lower())
+    if parts.port and parts.port not in (80, 443):
+        host = f"{host}:{parts.port}"
+    path = re.sub(r"/(amp|amp\.html)$", "", parts.path or "", flags=re.IGNORECASE).rstrip("/") or "/"
+    query = urlencode(sorted((k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+                             if not TRACKING_PARAMS.match(k)))
+    return urlunsplit(("https", host, path, query, ""))
+
+
+def simhash(text: str, bits: int = SIMHASH_BITS) -> int:
+    """SimHash fingerprint of the text's word shingles."""
+    words = _WORD.findall(text.lower())
+    shingles = [" ".join(words[i:i + SHINGLE_SIZE]) for i in range(max(1, len(words) - SHINGLE_SIZE + 1))]
+    hashes = np.array([
+        int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=bits // 8).digest(), "little")
+        for s in shingles
+    ], dtype=np.uint64)
+    # One row of bits per shingle; each bit votes +1 / -1 and the fingerprint keeps the majority
+    bit_matrix = np.unpackbits(hashes.view(np.uint8).reshape(-1, bits // 8), axis=1, bitorder="little")
+    votes = (2 * bit_matrix.astype(np.int32) - 1).sum(axis=0)
+    return int.from_bytes(np.packbits(votes > 0, bitorder="little").tobytes(), "little")
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+def item_text(item: Dict[str, Any]) -> str:
+    return " ".join(str(item[f]) for f in TEXT_FIELDS if item.get(f))
+
+
+def item_url(item: Dict[str, Any]) -> str:
+    return next((item[f] for f in URL_FIELDS if item.get(f)), "")
+
+
+def dedupe(items: Sequence[Dict[str, Any]], max_distance: int = SIMHASH_MAX_DISTANCE) -> List[Dict[str, Any]]:
+    """Drop repeats of a canonical URL and near-duplicate text, keeping the earliest (best-ranked) copy."""
+    seen_urls, fingerprints, kept = set(), [], []
+    for item in items:
+        url = canonicalize_url(item_url(item))
+        if url and url in seen_urls:
+            continue
+        text = item_text(item)
+        fingerprint = simhash(text) if text else None
+        if fingerprint is not None and any(hamming(fingerprint, f) <= max_distance for f in fingerprints):
+            continue
+        if url:
+            seen_urls.add(url)
+        if fingerprint is not None:
+            fingerprints.append(fingerprint)
+        kept.append(item)
+    return kept
+
+
+def select_web_results(query: str, groups: Dict[str, List[Dict[str, Any]]], top_n: int = 3) -> Dict[str, List[Dict[str, Any]]]:
+    """The ``top_n`` most query-relevant distinct items of each result group.
+
+    Every group's items and the query are embedded in a single request (served
+    from the embedding cache when seen before). If embedding fails the deduped
+    items keep their search-engine order.
+    """
+    deduped = {name: dedupe(items) for name, items in groups.items()}
+    for name, items in groups.items():
+        if len(deduped[name]) < len(items):
+            logger.info(f"Web results '{name}': dropped {len(items) - len(deduped[name])} duplicates")
+
+    spans: List[Tuple[str, int, int]] = []
+    texts: List[str] = []
+    for name, items in deduped.items():
+        if len(items) > top_n:
+            spans.append((name, len(texts), len(texts) + len(items)))
+            texts.extend(item_text(item) or item_url(item) for item in items)
+    if not spans:
+        return {name: items[:top_n] for name, items in deduped.items()}
+
+    try:
+        embeddings = normalize(get_embeddings(texts + [query]))
+    except Exception as e:
+        logger.warning(f"Could not rerank web results, keeping search order: {e}")
+        return {name: items[:top_n] for name, items in deduped.items()}
+
+    query_vec = embeddings[-1]
+    selected = {name: items[:top_n] for name, items in deduped.items()}
+    for name, start, end in spans:
+        scores = embeddings[start:end] @ query_vec
+        selected[name] = [deduped[name][i] for i in top_k(scores, top_n)]
+    return selected
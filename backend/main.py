@@ -1,21 +1,39 @@
 
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
+from typing import Any, Dict, Optional
 from dotenv import load_dotenv
 import os
+import json
+import asyncio
 import sys
 import logging
 import traceback
 import uvicorn
+from contextlib import asynccontextmanager
 
 load_dotenv()
 
-app = FastAPI(title="Cancer Research Backend", debug=True)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    start_parse_pool()
+    await jobs.start()
+    yield
+    await jobs.stop()
+    await asyncio.to_thread(shutdown_parse_pool)
+    mcp.snowflake_agent.close()
+    await mcp.web_agent.aclose()
+
+app = FastAPI(title="Cancer Research Backend", debug=True, lifespan=lifespan)
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from mcp.mcp import CancerResearchMCP
+from core.jobs import JobManager, QueueFullError
+from features.mistral_parser import start_parse_pool, shutdown_parse_pool
 
 mcp = CancerResearchMCP()
+jobs = JobManager(mcp.run_stream)
 
 class ResearchRequest(BaseModel):
     query: str
@@ -23,6 +41,20 @@ class ResearchRequest(BaseModel):
 class ResearchResponse(BaseModel):
     report: str
 
+class JobSubmitResponse(BaseModel):
+    job_id: str
+    status: str
+
+class JobStatusResponse(BaseModel):
+    job_id: str
+    query: str
+    status: str
+    stage: Optional[str] = None
+    progress: Dict[str, Any] = {}
+    error: Optional[str] = None
+    created: float
+    updated: float
+
 @app.post("/generate_report", response_model=ResearchResponse)
 async def generate_report(request: ResearchRequest):
     if not request.query:
@@ -36,6 +68,64 @@ async def generate_report(request: ResearchRequest):
         logging.error(traceback.format_exc())
         raise HTTPException(status_code=500, detail=f"Error generating report: {str(e)}")
 
+@app.post("/generate_report/stream")
+async def generate_report_stream(request: ResearchRequest):
+    """Stream agent progress and then report tokens as newline-delimited JSON events."""
+    if not request.query:
+        raise HTTPException(status_code=400, detail="Query cannot be empty.")
+    logging.info(f"Received streaming query: {request.query}")
+
+    async def ndjson():
+        async for event in mcp.run_stream(request.query):
+            yield json.dumps(event) + "\n"
+
+    return StreamingResponse(ndjson(), media_type="application/x-ndjson")
+
+@app.post("/jobs", response_model=JobSubmitResponse, status_code=202)
+async def submit_job(request: ResearchRequest):
+    """Queue a report; poll /jobs/{job_id} and fetch /jobs/{job_id}/result when it succeeds."""
+    if not request.query:
+        raise HTTPException(status_code=400, detail="Query cannot be empty.")
+    try:
+        job_id = await jobs.submit(request.query)
+    except QueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    logging.info(f"Queued job {job_id} for query: {request.query}")
+    return {"job_id": job_id, "status": "queued"}
+
+@app.get("/jobs/{job_id}", response_model=JobStatusResponse)
+async def get_job(job_id: str):
+    job = await jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    return {**job, "job_id": job_id}
+
+@app.get("/jobs/{job_id}/result", response_model=ResearchResponse)
+async def get_job_result(job_id: str):
+    job = await jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    if job["status"] == "failed":
+        raise HTTPException(status_code=500, detail=job["error"] or "Report generation failed.")
+    if job["status"] != "succeeded":
+        raise HTTPException(status_code=409, detail=f"Job is {job['status']}.")
+    return {"report": job["result"]}
+
+@app.get("/cache/stats")
+async def cache_stats():
+    """Hit/miss counters for the Snowflake, web search and final report caches."""
+    return {
+        "snowflake": mcp.snowflake_agent.cache.stats(),
+        "web": mcp.web_agent.cache.stats(),
+        "reports": mcp.report_cache.stats(),
+    }
+
+@app.post("/cache/refresh")
+async def cache_refresh():
+    """Drop cached Snowflake results and re-warm the unfiltered statistics."""
+    await asyncio.to_thread(mcp.snowflake_agent.refresh_statistics)
+    return {"snowflake": mcp.snowflake_agent.cache.stats()}
+
 if __name__ == "__main__":
     uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
 
@@ -0,0 +1,58 @@
+import json
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+# Backend modules import each other as core.*, features.*, agents.*; the orchestrator is mcp.mcp at the repo root
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(1, os.path.dirname(BACKEND_DIR))
+
+
+class StubTavily(BaseHTTPRequestHandler):
+    """Answers every search with one trial; the first ``failures`` requests get ``status``."""
+
+    result = {
+        "title": "Phase II/III study of a new glioma therapy",
+        "content": "Status: Recruiting. NCT01234567 plans to enroll 120 participants.",
+        "url": "https://clinicaltrials.gov/study/NCT01234567",
+    }
+    failures = 0
+    status = 503
+    requests = []
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        StubTavily.requests.append(json.loads(self.rfile.read(length)))
+        if len(StubTavily.requests) <= StubTavily.failures:
+            self.send_response(StubTavily.status)
+            self.end_headers()
+            return
+        body = json.dumps({"results": [StubTavily.result]}).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stub_endpoint(monkeypatch):
+    """A local Tavily stand-in; the agents are pointed at it through TAVILY_ENDPOINT."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubTavily)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    StubTavily.failures = 0
+    StubTavily.status = 503
+    StubTavily.requests = []
+    monkeypatch.setenv("TAVILY_API_KEY", "test-key")
+    monkeypatch.setenv("TAVILY_ENDPOINT", f"http://127.0.0.1:{server.server_port}/search")
+    yield StubTavily
+    server.shutdown()
+    server.server_close()
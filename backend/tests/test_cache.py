@@ -0,0 +1,73 @@
+import pytest
+
+from core import cache
+from core.cache import DiskLRUCache, MemoryLRUCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache.time, "time", lambda: now[0])
+    return now
+
+
+def test_memory_ttl_default_and_per_entry(clock):
+    c = MemoryLRUCache(ttl=10)
+    c.set("a", 1)
+    c.set("b", 2, ttl=100)
+    clock[0] += 11
+    assert c.get("a") is None
+    assert c.get("b") == 2
+    assert c.stats() == {"hits": 1, "misses": 1, "size": 1}
+
+
+def test_memory_without_ttl_never_expires(clock):
+    c = MemoryLRUCache()
+    c.set("a", 1)
+    clock[0] += 10 ** 9
+    assert c.get("a") == 1
+
+
+def test_memory_evicts_least_recently_used():
+    c = MemoryLRUCache(max_items=2)
+    c.set("a", 1)
+    c.set("b", 2)
+    c.get("a")
+    c.set("c", 3)
+    assert c.get("b") is None
+    assert c.get("a") == 1 and c.get("c") == 3
+
+
+@pytest.fixture
+def disk(tmp_path):
+    return DiskLRUCache(str(tmp_path / "cache.sqlite"), max_bytes=100)
+
+
+def test_disk_ttl(disk, clock):
+    disk.set("a", b"1", ttl=10)
+    disk.set("b", b"2")
+    clock[0] += 11
+    assert disk.get("a") is None
+    assert disk.get("b") == b"2"
+
+
+def test_disk_new_tagged_version_drops_the_old_ones(disk):
+    disk.set("report.pdf@v1", b"old", tag="report.pdf")
+    disk.set("other.pdf@v1", b"other", tag="other.pdf")
+    disk.set("report.pdf@v2", b"new", tag="report.pdf")
+    assert disk.get("report.pdf@v1") is None
+    assert disk.get("report.pdf@v2") == b"new"
+    assert disk.get("other.pdf@v1") == b"other"
+
+
+def test_disk_evicts_least_recently_accessed_over_budget(disk, clock):
+    for key in "abc":
+        disk.set(key, b"x" * 40)
+        clock[0] += 1
+    assert disk.get("a") is None
+    assert disk.total_bytes() <= 100
+    disk.get("b")
+    clock[0] += 1
+    disk.set("d", b"x" * 40)
+    assert disk.get("c") is None
+    assert disk.get("b") is not None and disk.get("d") is not None
@@ -0,0 +1,61 @@
+import re
+
+import pytest
+
+from core.tokens import count_tokens, token_windows
+from features.chunking_stratergy import TokenChunker, iter_token_chunks, markdown_units
+
+RESULTS = [f"Sentence {i} reports tumour growth in cohort {i}." for i in range(30)]
+METHODS = [f"Method {i} was applied." for i in range(5)]
+TEXT = "## Results:\n" + " ".join(RESULTS) + "\n## Methods:\n" + " ".join(METHODS)
+SENTENCE = re.compile(r"(?:Sentence|Method) \d+[^.]*\.")
+
+
+def chunks(max_tokens, overlap_tokens):
+    return list(iter_token_chunks(markdown_units(TEXT), max_tokens, overlap_tokens))
+
+
+@pytest.mark.parametrize("overlap", [0, 20])
+def test_chunks_fit_the_budget_and_cover_every_sentence(overlap):
+    result = chunks(60, overlap)
+    assert all(c["tokens"] <= 60 for c in result)
+    seen = []
+    for c in result:
+        seen += [s for s in SENTENCE.findall(c["text"]) if s not in seen]
+    assert seen == RESULTS + METHODS
+
+
+def test_overlap_repeats_trailing_sentences_within_a_section():
+    result = [c for c in chunks(60, 20) if c["section"] == "Results:"]
+    assert len(result) > 2
+    for previous, current in zip(result, result[1:]):
+        before, after = SENTENCE.findall(previous["text"]), SENTENCE.findall(current["text"])
+        shared = [s for s in after if s in before]
+        assert shared and after[:len(shared)] == before[-len(shared):]
+        assert sum(count_tokens(s) + 1 for s in shared) <= 20
+
+
+def test_no_overlap_without_overlap_tokens():
+    sentences = [s for c in chunks(60, 0) for s in SENTENCE.findall(c["text"])]
+    assert len(sentences) == len(set(sentences))
+
+
+def test_headings_start_new_chunks_without_overlap():
+    methods = [c for c in chunks(60, 20) if c["section"] == "Methods:"]
+    assert len(methods) == 1
+    assert methods[0]["text"].startswith("Methods:\n")
+    assert SENTENCE.findall(methods[0]["text"]) == METHODS
+
+
+def test_long_units_are_windowed_with_overlap():
+    long_text = " ".join(f"word{i}" for i in range(400))
+    windows = token_windows(long_text, 50, 10)
+    assert all(count_tokens(w) <= 50 for w in windows)
+    assert len(windows) > 1
+    for previous, current in zip(windows, windows[1:]):
+        assert previous.split()[-1] in current
+
+
+def test_overlap_must_be_smaller_than_the_budget():
+    with pytest.raises(ValueError):
+        TokenChunker(max_tokens=50, overlap_tokens=50)
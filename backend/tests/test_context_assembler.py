@@ -0,0 +1,67 @@
+import logging
+
+from core.tokens import count_tokens
+from features.context_assembler import Section, assemble_context
+
+QUERY = "glioma immunotherapy trials"
+
+
+def paragraphs(topic, n, words=30):
+    return "\n\n".join(f"Paragraph {i} about {topic}. " + " ".join(f"detail{i}x{j}" for j in range(words))
+                       for i in range(n))
+
+
+def test_section_is_cut_to_its_budget_keeping_the_most_relevant_paragraphs_in_order():
+    text = paragraphs("hospital parking", 6) + "\n\nGlioma immunotherapy trials enrolling now." \
+        + "\n\n" + paragraphs("cafeteria menus", 2)
+    result = assemble_context(QUERY, [Section("literature", "LIT", text, budget=120)], "Instructions.")
+    stats = result.sections["literature"]
+    assert stats["kept"] <= 120 < stats["original"]
+    assert stats["dropped"] > 0
+    assert "Glioma immunotherapy trials enrolling now." in result.text
+    # Among equally relevant paragraphs the earlier ones win, and kept paragraphs stay in order
+    assert result.text.index("Paragraph 0 about hospital") < result.text.index("Glioma immunotherapy")
+
+
+def test_oversized_paragraph_is_truncated_not_dropped():
+    text = " ".join(f"word{i}" for i in range(2000))
+    result = assemble_context(QUERY, [Section("literature", "LIT", text, budget=100)], "Instructions.")
+    assert 0 < result.sections["literature"]["kept"] <= 100
+    assert "word0 word1" in result.text
+
+
+def test_lowest_priority_sections_are_cut_first_when_the_prompt_is_short():
+    sections = [
+        Section("literature", "LIT", paragraphs("glioma", 10), budget=1000),
+        Section("funding", "FUND", paragraphs("grants", 10), budget=1000),
+    ]
+    full = assemble_context(QUERY, sections, "Instructions.", max_prompt_tokens=100000)
+    target = full.prompt_tokens - full.sections["funding"]["kept"] // 2
+    result = assemble_context(QUERY, sections, "Instructions.", max_prompt_tokens=target)
+    assert result.prompt_tokens <= target
+    assert result.sections["literature"]["kept"] == full.sections["literature"]["kept"]
+    assert result.sections["funding"]["kept"] < full.sections["funding"]["kept"]
+
+
+def test_sections_keep_their_minimum_when_instructions_exceed_the_budget(caplog):
+    instructions = "Follow these instructions. " * 200
+    sections = [
+        Section("literature", "LIT", paragraphs("glioma", 10), min_tokens=120),
+        Section("funding", "FUND", paragraphs("grants", 10), min_tokens=60),
+    ]
+    with caplog.at_level(logging.WARNING, logger="features.context_assembler"):
+        result = assemble_context(QUERY, sections, instructions, max_prompt_tokens=count_tokens(instructions))
+    assert 0 < result.sections["literature"]["kept"] <= 120
+    assert 0 < result.sections["funding"]["kept"] <= 60
+    assert result.prompt_tokens > count_tokens(instructions)
+    assert "over the" in caplog.text
+
+
+def test_summary_breaks_down_kept_and_original_tokens():
+    sections = [Section("epidemiology", "EPI", "Rates rose."), Section("hospitals", "HOSP", "")]
+    result = assemble_context(QUERY, sections, "Instructions.")
+    epi, hosp = result.sections["epidemiology"], result.sections["hospitals"]
+    assert hosp == {"original": 0, "kept": 0, "budget": 800, "dropped": 0}
+    assert result.summary() == (f"prompt {result.prompt_tokens} tokens; "
+                                f"context epidemiology {epi['kept']}/{epi['original']}, hospitals 0/0")
+    assert "=== HOSP ===\nNo data available within the context budget." in result.text
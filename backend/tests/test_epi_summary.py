@@ -0,0 +1,68 @@
+import pandas as pd
+import pytest
+
+from features.epi_summary import NO_DATA, rate_trend, summarize_epidemiology, _prepare
+
+# Cases per 1M people; the combined site and sex rows sit next to their breakdowns, as in the CDC tables
+CASES = {
+    ("All Cancer Sites Combined", "Male and Female"): (400, 500),
+    ("Lung and Bronchus", "Male and Female"): (60, 70),
+    ("Brain and Other Nervous System", "Male and Female"): (10, 12),
+    ("Melanoma of the Skin", "Male and Female"): (25, 30),
+    ("All Cancer Sites Combined", "Male"): (220, 300),
+    ("All Cancer Sites Combined", "Female"): (180, 200),
+}
+
+
+def rows(cases=CASES, years=("2019", "2020")):
+    return [
+        {"SITE": site, "SEX": sex, "YEAR": year, "EVENT_TYPE": "Incidence", "AREA": "United States",
+         "CASES": counts[i], "POPULATION": 1_000_000}
+        for (site, sex), counts in cases.items()
+        for i, year in enumerate(years)
+    ]
+
+
+def section(summary, heading):
+    start = summary.index(heading)
+    end = summary.find("\n\n", start)
+    return summary[start:end if end != -1 else None]
+
+
+def test_trend_heading_without_filters():
+    summary = summarize_epidemiology({"by_site": rows()})
+    trend = section(summary, "Rate per 100k by year")
+    assert trend.splitlines()[0] == "Rate per 100k by year (all sites, both sexes, United States):"
+    assert "|   2020 |     500 |      1000000 |              50 |               25 |" in trend
+
+
+@pytest.mark.parametrize("site, sex, heading", [
+    ("Brain and Other Nervous System", "Male and Female", "(Brain and Other Nervous System, both sexes, United States)"),
+    ("All Cancer Sites Combined", "Female", "(all sites, Female, United States)"),
+])
+def test_trend_heading_reflects_the_filters(site, sex, heading):
+    filtered = [r for r in rows() if r["SITE"] == site and r["SEX"] == sex]
+    trend = rate_trend(_prepare(pd.DataFrame(filtered)), "SITE", "EVENT_TYPE")
+    assert trend.splitlines()[0] == f"Rate per 100k by year {heading}:"
+
+
+def test_top_sites_and_sex_split_are_deterministic():
+    summary = summarize_epidemiology({"by_site": rows()})
+    assert summary == summarize_epidemiology({"by_site": list(reversed(rows()))})
+    top = section(summary, "Top 3 sites by rate (2020):").splitlines()
+    assert [line.split("|")[1].strip() for line in top[3:]] == [
+        "Lung and Bronchus", "Melanoma of the Skin", "Brain and Other Nervous System"]
+    split = section(summary, "Rate per 100k by sex (2020):").splitlines()
+    assert split[1].split() == ["|", "EVENT", "|", "Female", "|", "Male", "|", "M_F_RATIO", "|"]
+    assert split[3].split() == ["|", "Incidence", "|", "20", "|", "30", "|", "1.5", "|"]
+
+
+@pytest.mark.parametrize("statistics", [
+    None,
+    {},
+    {"by_site": [], "incident": [], "mortality": [], "child_cases": []},
+    {"by_site": pd.DataFrame()},
+    {"by_site": [{"SITE": "Brain", "YEAR": "2020", "CASES": None, "POPULATION": 0}]},
+])
+def test_empty_input(statistics):
+    assert summarize_epidemiology(statistics) == NO_DATA
@@ -0,0 +1,92 @@
+import asyncio
+
+import pytest
+
+from core.jobs import FAILED, QUEUED, RUNNING, SUCCEEDED, JobManager, JobStore, QueueFullError
+
+
+async def report(query):
+    yield {"event": "stage", "stage": "agents"}
+    yield {"event": "agent", "name": "rag", "status": "done"}
+    yield {"event": "token", "text": "Report on "}
+    yield {"event": "token", "text": query}
+    yield {"event": "done"}
+
+
+async def broken(query):
+    yield {"event": "stage", "stage": "agents"}
+    yield {"event": "error", "message": "quota exceeded"}
+
+
+@pytest.fixture
+def store(tmp_path):
+    return JobStore(str(tmp_path / "jobs.sqlite"))
+
+
+def run_jobs(manager, *queries):
+    async def main():
+        await manager.start()
+        try:
+            job_ids = [await manager.submit(q) for q in queries]
+            await manager._queue.join()
+            return [await manager.get(job_id) for job_id in job_ids]
+        finally:
+            await manager.stop()
+
+    return asyncio.run(main())
+
+
+def test_submitted_job_runs_to_a_result(store):
+    job, = run_jobs(JobManager(report, store), "glioma")
+    assert job["status"] == SUCCEEDED and job["stage"] == "done"
+    assert job["result"] == "Report on glioma"
+    assert job["progress"] == {"agents": {"rag": "done"}}
+
+
+def test_error_event_fails_the_job(store):
+    job, = run_jobs(JobManager(broken, store), "glioma")
+    assert job["status"] == FAILED and job["error"] == "quota exceeded"
+
+
+def test_unknown_job(store):
+    async def main():
+        return await JobManager(report, store).get("missing")
+
+    assert asyncio.run(main()) is None
+
+
+def test_concurrent_submits_cannot_overfill_the_queue(store):
+    # No workers, so nothing leaves the queue
+    manager = JobManager(report, store, workers=0, queue_max=2)
+
+    async def main():
+        await manager.start()
+        results = await asyncio.gather(*(manager.submit(f"q{i}") for i in range(5)), return_exceptions=True)
+        await manager.stop()
+        return results
+
+    results = asyncio.run(main())
+    assert sum(isinstance(r, QueueFullError) for r in results) == 3
+    assert store.count(QUEUED) == 2
+
+
+def test_queued_and_interrupted_jobs_resume_after_restart(store):
+    queued = store.create("melanoma")
+    interrupted = store.create("glioma")
+    store.update(interrupted, status=RUNNING, stage="summaries")
+    # More pending jobs than queue slots: the rest wait for room instead of overflowing
+    extra = [store.create(f"extra {i}") for i in range(3)]
+
+    async def main():
+        manager = JobManager(report, store, queue_max=2)
+        await manager.start()
+        try:
+            while store.count(SUCCEEDED) < 5:
+                await asyncio.sleep(0.01)
+        finally:
+            await manager.stop()
+
+    asyncio.run(asyncio.wait_for(main(), 10))
+    assert store.get(queued)["result"] == "Report on melanoma"
+    assert store.get(interrupted)["result"] == "Report on glioma"
+    assert all(store.get(job_id)["status"] == SUCCEEDED for job_id in extra)
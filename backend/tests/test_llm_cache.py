@@ -0,0 +1,55 @@
+import asyncio
+
+import numpy as np
+
+from core.llm_cache import LLMResponseCache, SemanticIndex, namespace
+
+
+def test_semantic_search_respects_the_threshold():
+    index = SemanticIndex()
+    index.add("ns", "a", [1.0, 0.0])
+    index.add("ns", "b", [0.0, 1.0])
+    key, score = index.search("ns", [0.9, 0.1], threshold=0.95)
+    assert key == "a" and score > 0.95
+    assert index.search("ns", [1.0, 1.0], threshold=0.95) is None
+    assert index.search("ns", [0.0, 0.0], threshold=0.0) is None
+
+
+def test_semantic_namespaces_are_isolated():
+    index = SemanticIndex()
+    index.add("gemini", "a", [1.0, 0.0])
+    assert index.search("openai", [1.0, 0.0], threshold=0.5) is None
+    assert index.search("gemini", [1.0, 0.0], threshold=0.5)[0] == "a"
+
+
+def test_semantic_index_is_lru_bounded_and_removable():
+    index = SemanticIndex(max_items=2)
+    index.add("ns", "a", [1.0, 0.0, 0.0])
+    index.add("ns", "b", [0.0, 1.0, 0.0])
+    index.search("ns", [1.0, 0.0, 0.0], threshold=0.9)
+    index.add("ns", "c", [0.0, 0.0, 1.0])
+    assert len(index) == 2
+    assert index.search("ns", [0.0, 1.0, 0.0], threshold=0.9) is None
+    index.remove("a")
+    assert index.search("ns", [1.0, 0.0, 0.0], threshold=0.9) is None
+    assert index.search("ns", [0.0, 0.0, 1.0], threshold=0.9)[0] == "c"
+
+
+def test_lookup_matches_on_match_text_within_a_scope():
+    vectors = {"what causes glioma?": [1.0, 0.0], "what causes a glioma": [0.99, 0.05], "melanoma survival": [0.0, 1.0]}
+    cache = LLMResponseCache(semantic=True, threshold=0.97, embed=lambda texts: [np.array(vectors[t]) for t in texts])
+    docs_a = namespace("openai", "gpt", {}, scope="docs-a")
+    docs_b = namespace("openai", "gpt", {}, scope="docs-b")
+
+    async def main():
+        key, text, vec = await cache.lookup(docs_a, "context A\nwhat causes glioma?", True, "what causes glioma?")
+        assert text is None
+        cache.store(docs_a, key, "answer", vec)
+        hit = await cache.lookup(docs_a, "context A\nwhat causes a glioma", True, "what causes a glioma")
+        other_docs = await cache.lookup(docs_b, "context B\nwhat causes a glioma", True, "what causes a glioma")
+        other_question = await cache.lookup(docs_a, "context A\nmelanoma survival", True, "melanoma survival")
+        exact_only = await cache.lookup(docs_a, "context A\nwhat causes a glioma", False)
+        return hit[1], other_docs[1], other_question[1], exact_only[1]
+
+    assert asyncio.run(main()) == ("answer", None, None, None)
+    assert cache.stats()["semantic_hits"] == 1
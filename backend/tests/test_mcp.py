@@ -0,0 +1,117 @@
+import asyncio
+import time
+
+import pytest
+
+import mcp.mcp as orchestrator
+from core import embeddings
+from core.cache import MemoryLRUCache
+from core.llm import FakeEmbeddingClient, FakeProvider
+from core.llm_cache import CachedProvider
+from core.search_cache import SearchCache
+from core.singleflight import SingleFlight
+
+STATISTICS = {
+    "by_site": [{"SITE": "Brain and Other Nervous System", "SEX": "Male and Female", "YEAR": "2020",
+                 "EVENT_TYPE": "Incidence", "CASES": 120, "POPULATION": 1000000}],
+    "incident": [], "mortality": [], "child_cases": [],
+}
+
+
+class StubSnowflake:
+    def get_cancer_statistics(self, query, columnar=False):
+        return STATISTICS
+
+
+@pytest.fixture
+def research(stub_endpoint, monkeypatch):
+    """An orchestrator with the real web agent on the Tavily stub and offline Snowflake, RAG and LLM."""
+    monkeypatch.setattr("backend.agents.web_agent.TAVILY_BACKOFF_BASE", 0.01)
+    monkeypatch.setattr(embeddings, "_embedding_service",
+                        embeddings.EmbeddingService(model="fake-embedding", client=FakeEmbeddingClient()))
+
+    async def rag(query):
+        return "Glioma trials report improved survival. " * 20
+
+    monkeypatch.setattr(orchestrator, "get_rag_response", rag)
+    research = object.__new__(orchestrator.CancerResearchMCP)
+    research.snowflake_agent = StubSnowflake()
+    research.web_agent = orchestrator.AsyncWebAgent(cache=SearchCache(), max_retries=1, raise_errors=True)
+    research.llm = CachedProvider(FakeProvider(latency=0), None)
+    research._flights = SingleFlight()
+    research.report_cache = MemoryLRUCache(ttl=60)
+    research.report_disk = None
+    return research
+
+
+def collect(research, query):
+    async def run():
+        try:
+            return [event async for event in research.run_stream(query)]
+        finally:
+            await research.web_agent.aclose()
+
+    return asyncio.run(run())
+
+
+def agent_statuses(events):
+    return {e["name"]: e["status"] for e in events if e["event"] == "agent"}
+
+
+def test_report_is_cached_when_every_agent_succeeds(research):
+    events = collect(research, "glioma trials")
+    assert set(agent_statuses(events).values()) == {"done"}
+    assert events[-1] == {"event": "done"}
+    assert len(research.report_cache) == 1
+
+
+def test_report_is_not_cached_when_tavily_fails(research, stub_endpoint):
+    stub_endpoint.failures = 10 ** 6
+    stub_endpoint.status = 500
+    events = collect(research, "glioma trials")
+    statuses = agent_statuses(events)
+    assert statuses["snowflake"] == statuses["rag"] == "done"
+    assert statuses["clinical_trials"] == statuses["funding"] == statuses["hospitals"] == "failed"
+    assert events[-1] == {"event": "done"}
+    assert len(research.report_cache) == 0
+
+
+def test_fan_out_runs_agents_concurrently_with_timeouts_and_fallbacks(monkeypatch):
+    monkeypatch.setitem(orchestrator.AGENT_TIMEOUTS, "hung", 0.2)
+
+    async def slow(query):
+        await asyncio.sleep(0.3)
+        return f"stats for {query}"
+
+    def blocking(query):
+        time.sleep(0.3)
+        return [query]
+
+    async def hung(query):
+        await asyncio.sleep(10)
+
+    def broken(query):
+        raise RuntimeError("backend down")
+
+    async def main():
+        events = []
+
+        async def emit(event):
+            events.append(event)
+
+        start = time.monotonic()
+        results = await orchestrator.fan_out({
+            "slow": (slow, ("glioma",), {}),
+            "blocking": (blocking, ("glioma",), []),
+            "hung": (hung, ("glioma",), "no data"),
+            "broken": (broken, ("glioma",), []),
+        }, emit=emit)
+        return results, events, time.monotonic() - start
+
+    results, events, elapsed = asyncio.run(main())
+    # Concurrent: about as long as the slowest agent, not the sum of all of them
+    assert 0.3 <= elapsed < 0.6
+    assert results == {"slow": "stats for glioma", "blocking": ["glioma"], "hung": "no data", "broken": []}
+    assert agent_statuses(events) == {"slow": "done", "blocking": "done", "hung": "failed", "broken": "failed"}
+    # Events arrive as each agent finishes
+    assert [e["name"] for e in events][:2] == ["broken", "hung"]
@@ -0,0 +1,138 @@
+import os
+import time
+
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+from core import cache
+from core.query_cache import QueryResultCache, normalize_sql, query_key
+
+SQL = "SELECT SITE, SUM(CASES) AS CASES FROM CANCER_BY_SITE WHERE SITE = %(site)s GROUP BY SITE"
+FRAME = pd.DataFrame({"SITE": ["Brain", "Lung"], "CASES": [10, 60]})
+
+
+class Loader:
+    def __init__(self, value):
+        self.value = value
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return self.value
+
+
+def test_normalize_sql_ignores_layout_but_not_literals():
+    assert normalize_sql("SELECT *\n  FROM t\tWHERE a = 1;") == "SELECT * FROM t WHERE a = 1"
+    assert normalize_sql("SELECT 'a  b'  FROM t") == "SELECT 'a  b' FROM t"
+    assert normalize_sql("SELECT 'a  b' FROM t") != normalize_sql("SELECT 'a b' FROM t")
+
+
+def test_key_equivalence():
+    reformatted = SQL.replace(" ", "\n    ") + ";"
+    assert query_key(SQL, {"site": "Brain"}, "df") == query_key(reformatted, {"site": "Brain"}, "df")
+    assert query_key(SQL, {"site": "Brain"}, "df") != query_key(SQL, {"site": "Lung"}, "df")
+    assert query_key(SQL, {"site": "Brain"}, "df") != query_key(SQL, {"site": "Brain"}, "rows")
+
+    results = QueryResultCache(ttl=60)
+    load = Loader([{"SITE": "Brain", "CASES": 10}])
+    results.get_or_load(SQL, {"site": "Brain"}, "rows", load)
+    results.get_or_load(reformatted, {"site": "Brain"}, "rows", load)
+    assert load.calls == 1
+
+
+def test_results_are_copies():
+    results = QueryResultCache(ttl=60)
+    first = results.get_or_load(SQL, None, "df", Loader(FRAME.copy()))
+    first["CASES"] = 0
+    assert results.get_or_load(SQL, None, "df", Loader(None))["CASES"].tolist() == [10, 60]
+
+
+def test_memory_ttl_expiry(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache.time, "time", lambda: now[0])
+    results = QueryResultCache(ttl=60)
+    load = Loader([{"SITE": "Brain"}])
+    results.get_or_load(SQL, None, "rows", load)
+    now[0] += 59
+    results.get_or_load(SQL, None, "rows", load)
+    assert load.calls == 1
+    now[0] += 2
+    results.get_or_load(SQL, None, "rows", load)
+    assert load.calls == 2
+
+
+def test_memory_eviction():
+    results = QueryResultCache(ttl=60, max_items=2)
+    loads = {site: Loader([{"SITE": site}]) for site in ("Brain", "Lung", "Skin")}
+    for site, load in loads.items():
+        results.get_or_load(SQL, {"site": site}, "rows", load)
+    results.get_or_load(SQL, {"site": "Brain"}, "rows", loads["Brain"])
+    assert loads["Brain"].calls == 2
+    results.get_or_load(SQL, {"site": "Skin"}, "rows", loads["Skin"])
+    assert loads["Skin"].calls == 1
+
+
+def test_failed_loads_are_not_cached():
+    results = QueryResultCache(ttl=60)
+
+    def fail():
+        raise RuntimeError("warehouse suspended")
+
+    with pytest.raises(RuntimeError):
+        results.get_or_load(SQL, None, "rows", fail)
+    assert results.get_or_load(SQL, None, "rows", Loader([{"SITE": "Brain"}])) == [{"SITE": "Brain"}]
+
+
+@pytest.mark.parametrize("kind, value", [
+    ("df", FRAME),
+    ("arrow", pa.Table.from_pandas(FRAME, preserve_index=False)),
+    ("rows", FRAME.to_dict("records")),
+])
+def test_disk_tier_round_trip(tmp_path, kind, value):
+    QueryResultCache(ttl=60, disk_dir=str(tmp_path)).get_or_load(SQL, None, kind, Loader(value))
+    assert len(list(tmp_path.glob(f"*.{kind}.parquet"))) == 1
+
+    # A new process: memory is empty, the Parquet file answers
+    restarted = QueryResultCache(ttl=60, disk_dir=str(tmp_path))
+    load = Loader(None)
+    cached = restarted.get_or_load(SQL, None, kind, load)
+    assert load.calls == 0 and restarted.stats()["disk_hits"] == 1
+    if kind == "df":
+        pd.testing.assert_frame_equal(cached, value)
+    elif kind == "arrow":
+        assert cached.equals(value)
+    else:
+        assert cached == value
+
+
+def test_expired_disk_entries_are_dropped(tmp_path):
+    QueryResultCache(ttl=60, disk_dir=str(tmp_path)).get_or_load(SQL, None, "df", Loader(FRAME))
+    path, = tmp_path.glob("*.parquet")
+    old = time.time() - 120
+    os.utime(path, (old, old))
+    load = Loader(FRAME)
+    QueryResultCache(ttl=60, disk_dir=str(tmp_path)).get_or_load(SQL, None, "df", load)
+    assert load.calls == 1
+
+
+def test_clear_resets_entries_and_stats(tmp_path):
+    results = QueryResultCache(ttl=60, disk_dir=str(tmp_path))
+    load = Loader(FRAME)
+    results.get_or_load(SQL, None, "df", load)
+    results.get_or_load(SQL, None, "df", load)
+    assert results.stats()["memory_hits"] == 1 and results.stats()["misses"] == 1
+
+    results.clear()
+    assert results.stats() == {"enabled": True, "ttl": 60, "memory_hits": 0, "disk_hits": 0, "misses": 0, "size": 0}
+    assert not list(tmp_path.glob("*.parquet"))
+    results.get_or_load(SQL, None, "df", load)
+    assert load.calls == 2
+
+
+def test_zero_ttl_disables_caching():
+    results = QueryResultCache(ttl=0)
+    load = Loader([{"SITE": "Brain"}])
+    results.get_or_load(SQL, None, "rows", load)
+    results.get_or_load(SQL, None, "rows", load)
+    assert load.calls == 2 and not results.stats()["enabled"]
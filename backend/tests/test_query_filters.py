@@ -0,0 +1,59 @@
+import pandas as pd
+import pytest
+
+from agents.snowflake_agent import parse_query_filters, build_statistics_queries
+from core.epi_store import rate_frame
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("lung cancer treatment in Ohio", ["%lung%"]),
+    ("ovarian cancer survival", ["%ovar%"]),
+    ("uterine cancer incidence", ["%uter%"]),
+    ("cancers of the bones", ["%bone%"]),
+    ("skin cancer", ["%melanoma%", "%skin%"]),
+])
+def test_site_keywords(query, expected):
+    assert parse_query_filters(query).site_patterns == expected
+
+
+@pytest.mark.parametrize("query", [
+    "drug delivery for cancer",
+    "computer models of tumour growth",
+    "outer membrane proteins",
+    "jawbone",
+])
+def test_site_keywords_need_a_word_boundary(query):
+    assert parse_query_filters(query).site_patterns == []
+
+
+def test_area_sex_and_years():
+    filters = parse_query_filters("breast cancer in women in West Virginia from 2010 to 2015")
+    assert filters.area == "West Virginia"
+    assert filters.sex == "Female"
+    assert (filters.year_from, filters.year_to) == (2010, 2015)
+
+
+def test_single_year_direction():
+    assert parse_query_filters("lung cancer since 2012").year_from == 2012
+    assert parse_query_filters("lung cancer since 2012").year_to is None
+    assert parse_query_filters("lung cancer before 2012").year_to == 2012
+
+
+def test_rate_query_orders_yoy_over_single_years():
+    sql, _ = build_statistics_queries(parse_query_filters("lung cancer"))["by_site"]
+    assert "ORDER BY TRY_TO_NUMBER(YEAR)" in sql
+    assert "ORDER BY YEAR)" not in sql
+
+
+def test_local_yoy_skips_span_rows():
+    df = pd.DataFrame({
+        "SITE": ["Lung"] * 4,
+        "YEAR": ["2016", "2016-2020", "2017", "2018"],
+        "COUNT": [10, 50, 20, 40],
+        "POPULATION": [1000] * 4,
+    })
+    out = rate_frame(df, ["SITE", "YEAR"], "COUNT", 10).set_index("YEAR")["YOY_CHANGE_PCT"]
+    assert pd.isna(out["2016-2020"])
+    assert pd.isna(out["2016"])
+    assert out["2017"] == 100.0
+    assert out["2018"] == 100.0
@@ -0,0 +1,112 @@
+import asyncio
+
+import pytest
+
+from core.singleflight import SingleFlight
+
+
+def test_concurrent_calls_share_one_run():
+    flight = SingleFlight()
+    runs = []
+
+    async def work(value):
+        runs.append(value)
+        await asyncio.sleep(0.01)
+        return value * 2
+
+    async def main():
+        results = await asyncio.gather(*(flight.do("k", work, 21) for _ in range(5)))
+        assert not flight.in_flight("k")
+        # Once finished, the next call runs again
+        return results, await flight.do("k", work, 1)
+
+    results, again = asyncio.run(main())
+    assert results == [42] * 5 and again == 2
+    assert runs == [21, 1]
+
+
+def test_exception_is_shared():
+    flight = SingleFlight()
+    runs = []
+
+    async def fail():
+        runs.append(1)
+        await asyncio.sleep(0.01)
+        raise RuntimeError("boom")
+
+    async def main():
+        return await asyncio.gather(flight.do("k", fail), flight.do("k", fail), return_exceptions=True)
+
+    results = asyncio.run(main())
+    assert [str(r) for r in results] == ["boom", "boom"] and len(runs) == 1
+
+
+def test_work_is_cancelled_only_when_the_last_caller_leaves():
+    flight = SingleFlight()
+    finished = []
+
+    async def work():
+        await asyncio.sleep(0.05)
+        finished.append(1)
+        return "done"
+
+    async def main():
+        first = asyncio.create_task(flight.do("k", work))
+        second = asyncio.create_task(flight.do("k", work))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        assert await second == "done"
+        third = asyncio.create_task(flight.do("k", work))
+        await asyncio.sleep(0.01)
+        third.cancel()
+        await asyncio.sleep(0.06)
+        with pytest.raises(asyncio.CancelledError):
+            await third
+
+    asyncio.run(main())
+    assert finished == [1]
+
+
+def test_late_stream_subscriber_replays_then_follows():
+    flight = SingleFlight()
+    runs = []
+
+    async def producer(emit):
+        runs.append(1)
+        for i in range(4):
+            await emit(i)
+            await asyncio.sleep(0.01)
+
+    async def collect(delay):
+        await asyncio.sleep(delay)
+        return [event async for event in flight.stream("k", producer)]
+
+    async def main():
+        return await asyncio.gather(collect(0), collect(0.025))
+
+    early, late = asyncio.run(main())
+    assert early == late == [0, 1, 2, 3]
+    assert len(runs) == 1
+
+
+def test_stream_is_cancelled_when_every_subscriber_leaves():
+    flight = SingleFlight()
+    emitted = []
+
+    async def producer(emit):
+        for i in range(100):
+            emitted.append(i)
+            await emit(i)
+            await asyncio.sleep(0.01)
+
+    async def main():
+        events = flight.stream("k", producer)
+        async for event in events:
+            if event == 2:
+                break
+        await events.aclose()
+        await asyncio.sleep(0.05)
+        assert not flight.in_flight("k")
+
+    asyncio.run(main())
+    assert len(emitted) <= 4
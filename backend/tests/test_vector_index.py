@@ -0,0 +1,68 @@
+import logging
+
+import numpy as np
+import pytest
+
+from core.vector_index import ExactIndex, IVFIndex, build_index, index_mode, normalize
+
+
+@pytest.fixture(scope="module")
+def vectors():
+    # Clustered like real embeddings, so partitions are meaningful
+    rng = np.random.default_rng(42)
+    centers = rng.normal(size=(20, 32))
+    points = centers[rng.integers(0, 20, 4000)] + 0.3 * rng.normal(size=(4000, 32))
+    return normalize(points)
+
+
+@pytest.fixture(scope="module")
+def queries(vectors):
+    rng = np.random.default_rng(7)
+    return vectors[rng.choice(len(vectors), 50, replace=False)] + 0.05 * rng.normal(size=(50, 32))
+
+
+def test_exact_search_returns_best_first():
+    index = ExactIndex(np.array([[1.0, 0.0], [0.0, 1.0], [0.7, 0.7]]))
+    idx, scores = index.search(np.array([1.0, 0.1]), k=2)
+    assert list(idx) == [0, 2]
+    assert scores[0] >= scores[1]
+
+
+def test_ivf_recall_against_exact(vectors, queries):
+    exact = ExactIndex(vectors, normalized=True)
+    ivf = IVFIndex.train(vectors, nprobe=8, normalized=True)
+    k = 10
+    found = [len(set(exact.search(q, k)[0]) & set(ivf.search(q, k)[0])) for q in queries]
+    assert sum(found) / (k * len(queries)) >= 0.9
+
+
+def test_ivf_layout_save_load_round_trip(vectors, queries, tmp_path):
+    trained = IVFIndex.train(vectors, normalized=True)
+    trained.save(str(tmp_path))
+    loaded = IVFIndex.load(vectors, str(tmp_path))
+    assert loaded is not None
+    np.testing.assert_array_equal(loaded.order, trained.order)
+    for q in queries[:5]:
+        np.testing.assert_array_equal(loaded.search(q, 5)[0], trained.search(q, 5)[0])
+    # A layout for a different number of vectors is ignored
+    assert IVFIndex.load(vectors[:-1], str(tmp_path)) is None
+
+
+def test_build_index_modes(vectors, tmp_path):
+    assert index_mode(10) == "exact"
+    assert isinstance(build_index(vectors, mode="exact", normalized=True), ExactIndex)
+    with pytest.raises(ValueError):
+        build_index(vectors, mode="hnsw")
+    built = build_index(vectors, mode="ivf", normalized=True, index_dir=str(tmp_path))
+    assert isinstance(built, IVFIndex) and (tmp_path / "ivf_order.npy").exists()
+    # The saved layout is reused rather than retrained
+    reused = build_index(vectors, mode="ivf", normalized=True, index_dir=str(tmp_path), train=False)
+    np.testing.assert_array_equal(reused.centroids, built.centroids)
+
+
+def test_build_index_without_a_layout_falls_back_to_exact(vectors, tmp_path, caplog):
+    with caplog.at_level(logging.WARNING, logger="core.vector_index"):
+        index = build_index(vectors, mode="ivf", normalized=True, index_dir=str(tmp_path), train=False)
+    assert isinstance(index, ExactIndex)
+    assert not list(tmp_path.iterdir())
+    assert "No trained IVF layout" in caplog.text
@@ -0,0 +1,64 @@
+import asyncio
+
+from agents.web_agent import AsyncWebAgent
+from core.search_cache import SearchCache
+
+
+def test_clinical_trials_from_stub(stub_endpoint):
+    agent = AsyncWebAgent(cache=SearchCache())
+
+    async def run():
+        try:
+            return await agent.get_clinical_trials("glioma")
+        finally:
+            await agent.aclose()
+
+    trials = asyncio.run(run())
+    assert stub_endpoint.requests[0]["query"] == "active clinical trials glioma cancer treatment"
+    assert trials == [{
+        "title": stub_endpoint.result["title"],
+        "description": stub_endpoint.result["content"],
+        "phase": "Phase 2/3",
+        "status": "Recruiting",
+        "nct_ids": ["NCT01234567"],
+        "enrollment": 120,
+        "source_url": stub_endpoint.result["url"],
+    }]
+
+
+def test_retries_then_serves_from_cache(stub_endpoint, monkeypatch):
+    monkeypatch.setattr("agents.web_agent.TAVILY_BACKOFF_BASE", 0.01)
+    stub_endpoint.failures = 1
+    agent = AsyncWebAgent(cache=SearchCache())
+
+    async def run():
+        try:
+            first = await agent.get_hospitals_by_location("Boston")
+            second = await agent.get_hospitals_by_location("Boston")
+            return first, second
+        finally:
+            await agent.aclose()
+
+    first, second = asyncio.run(run())
+    assert first == second and first[0]["name"] == stub_endpoint.result["title"]
+    # One 503, one retry, then the repeat search is a cache hit
+    assert len(stub_endpoint.requests) == 2
+
+
+def test_one_client_per_loop_closed_on_aclose(stub_endpoint):
+    agent = AsyncWebAgent(cache=SearchCache())
+
+    async def search(condition):
+        await agent.get_clinical_trials(condition)
+        return agent._ensure_client()[0]
+
+    first = asyncio.run(search("glioma"))
+    loop = asyncio.new_event_loop()
+    try:
+        second = loop.run_until_complete(search("melanoma"))
+        assert second is not first
+        loop.run_until_complete(agent.aclose())
+    finally:
+        loop.close()
+    assert second.is_closed
+    assert len(agent._clients) == 0
@@ -0,0 +1,61 @@
+import pytest
+
+from features.web_extraction import (
+    normalize_phase, normalize_status, find_enrollment, find_nct_ids, find_rating, extract_location,
+)
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("Phase II/III randomized study", "Phase 2/3"),
+    ("phase 2-3", "Phase 2/3"),
+    ("Phase 1b dose escalation", "Phase 1"),
+    ("Phase Ib/II trial", "Phase 1/2"),
+    ("phase 2a", "Phase 2"),
+    ("Early Phase 1", "Early Phase 1"),
+    ("Phase IV", "Phase 4"),
+    ("multiphase 2 imaging", "Unknown"),
+    ("no phase listed", "Unknown"),
+])
+def test_normalize_phase(text, expected):
+    assert normalize_phase(text) == expected
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("Status: Active, not recruiting", "Active, not recruiting"),
+    ("Not yet recruiting", "Not yet recruiting"),
+    ("Recruiting now", "Recruiting"),
+    ("interactive session", "Unknown"),
+])
+def test_normalize_status(text, expected):
+    assert normalize_status(text) == expected
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("Estimated Enrollment: 1,200 participants", 1200),
+    ("enrolling 300 patients", 300),
+    ("450 participants enrolled", 450),
+    ("Phase 2 trial in 2023 patients", None),
+    ("results reported for 2021 participants", None),
+])
+def test_find_enrollment(text, expected):
+    assert find_enrollment(text) == expected
+
+
+def test_find_nct_ids_dedupes_in_order():
+    assert find_nct_ids("NCT01234567 and nct07654321, again NCT01234567") == ["NCT01234567", "NCT07654321"]
+
+
+def test_find_rating_needs_a_standalone_number():
+    assert find_rating("Patients rate it 4.5/5") == 4.5
+    assert find_rating("version v1.5/5") is None
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("Brain cancer treatment options in Ohio", "Ohio"),
+    ("pediatric leukemia trials at Mayo Clinic in Rochester", "Rochester"),
+    ("lung cancer hospitals near Boston", "Boston"),
+    ("Brain Cancer", "United States"),
+    ("breast cancer survival rates", "United States"),
+])
+def test_extract_location(query, expected):
+    assert extract_location(query) == expected
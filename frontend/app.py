@@ -21,6 +21,7 @@
 import os
 import io
 import re
+import json
 import base64
 import requests
 import markdown2
@@ -56,6 +57,28 @@ def generate_report(query: str) -> str:
     return data.get("report", "")
 
 
+def stream_report(query: str):
+    """Yield progress and token events from the backend's streaming endpoint."""
+    with requests.post(
+        f"{BACKEND_URL}/generate_report/stream",
+        json={"query": query},
+        stream=True,
+        timeout=(10, 500),  # connect, then max gap between streamed lines
+    ) as response:
+        response.raise_for_status()
+        for line in response.iter_lines(decode_unicode=True):
+            if line:
+                yield json.loads(line)
+
+
+STAGE_LABELS = {
+    "agents": "Fetching data from agents…",
+    "summaries": "Summarising sections…",
+    "report": "Writing report…",
+    "cached": "Loaded a recently generated report",
+}
+
+
 def convert_md_to_html(report_md: str) -> str:
     """Convert Markdown to HTML with styling, embed images, and strip front-matter."""
     # Use the 'metadata' extra to drop any YAML/front-matter at the top
@@ -127,29 +150,58 @@ if st.button("Generate Report"):
     if not query:
         st.error("Please enter a query before generating the report.")
     else:
-        with st.spinner("Generating report, please wait…"):
+        try:
+            status = st.status("Generating report…", expanded=True)
+            report_area = st.empty()
+            tokens = []
+            error = None
             try:
-                report_md = generate_report(query)
-                if not report_md:
-                    st.warning("No report content returned from backend.")
+                for event in stream_report(query):
+                    kind = event.get("event")
+                    if kind == "stage":
+                        status.write(STAGE_LABELS.get(event["stage"], event["stage"]))
+                    elif kind == "agent":
+                        icon = "✅" if event["status"] == "done" else "⚠️"
+                        status.write(f"{icon} {event['name']} ({event['elapsed']}s)")
+                    elif kind == "token":
+                        tokens.append(event["text"])
+                        report_area.markdown("".join(tokens))
+                    elif kind == "error":
+                        error = event["message"]
+            except RequestException:
+                if tokens:
+                    raise
+                # Streaming endpoint unreachable (e.g. a proxy that buffers or drops it): ask for the whole report
+                status.write("Streaming unavailable, waiting for the full report…")
+                tokens = [generate_report(query)]
+            report_md = "".join(tokens)
+
+            if error:
+                status.update(label="Report generation failed", state="error")
+                st.error(error)
+            elif not report_md:
+                status.update(label="No report returned", state="error")
+                st.warning("No report content returned from backend.")
+            else:
+                status.update(label="Report ready", state="complete", expanded=False)
+                report_area.empty()
+                html_report = convert_md_to_html(report_md)
+
+                # Render full HTML (with CSS) in an iframe-like component
+                st_html(html_report, height=800, scrolling=True)
+
+                # Provide a PDF download of the same content
+                pdf_data = convert_html_to_pdf(html_report)
+                if pdf_data:
+                    st.download_button(
+                        label="⬇️ Download Report as PDF",
+                        data=pdf_data,
+                        file_name="cancer_research_report.pdf",
+                        mime="application/pdf"
+                    )
                 else:
-                    html_report = convert_md_to_html(report_md)
-
-                    # Render full HTML (with CSS) in an iframe-like component
-                    st_html(html_report, height=800, scrolling=True)
-
-                    # Provide a PDF download of the same content
-                    pdf_data = convert_html_to_pdf(html_report)
-                    if pdf_data:
-                        st.download_button(
-                            label="⬇️ Download Report as PDF",
-                            data=pdf_data,
-                            file_name="cancer_research_report.pdf",
-                            mime="application/pdf"
-                        )
-                    else:
-                        st.error("PDF generation failed.")
-            except Timeout:
-                st.error("The request to the backend timed out. Try again later.")
-            except RequestException as e:
-                st.error(f"Request to backend failed: {e}")
+                    st.error("PDF generation failed.")
+        except Timeout:
+            st.error("The request to the backend timed out. Try again later.")
+        except RequestException as e:
+            st.error(f"Request to backend failed: {e}")
@@ -479,155 +479,152 @@
 
 
 import os
-import json
-import pandas as pd
-import numpy as np
-from typing import Dict, Any, List
-from openai import OpenAI
-from google import genai
+from typing import Dict, Any
 import logging
 import datetime
 import time
+import asyncio
+import functools
+import re
+from concurrent.futures import ThreadPoolExecutor
 
 logger = logging.getLogger(__name__)
 
 from backend.agents.snowflake_agent import SnowflakeAgent
 from backend.agents.rag_agent import get_rag_response
-from backend.agents.web_agent import WebAgent
-
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-EMBED_MODEL = "text-embedding-ada-002"
-
-def get_embeddings(texts: List[str]) -> np.ndarray:
-    client = OpenAI(api_key=OPENAI_API_KEY)
-    resp = client.embeddings.create(input=texts, model=EMBED_MODEL)
-    return np.array([r.embedding for r in resp.data])
-
-def cosine_similarity(vecs, query_vec):
-    return np.dot(vecs, query_vec) / (np.linalg.norm(vecs, axis=1) * np.linalg.norm(query_vec) + 1e-10)
-
-def chunk_text(text, max_words=500):
-    words = text.split()
-    return [' '.join(words[i:i+max_words]) for i in range(0, len(words), max_words)]
-
-def summarize_text(chat, text, section_label, max_words=1000, max_recursion=1, depth=0):
-    """Summarize only if needed, and avoid recursive explosion."""
+from backend.agents.web_agent import AsyncWebAgent
+from core.embeddings import get_embeddings
+from core.llm import is_rate_limit_error, REPORT_LLM_PROVIDER
+from core.llm_cache import get_cached_provider, CachedProvider
+from core.vector_index import ExactIndex
+from core.vector_store import read_manifest
+from core.cache import MemoryLRUCache, DiskLRUCache, cache_path
+from core.singleflight import SingleFlight
+from features.web_rerank import select_web_results
+from features.chunking_stratergy import token_chunks, CHUNK_TOKENS
+from features.context_assembler import assemble_context, Section
+from features.epi_summary import summarize_epidemiology
+
+# === Agent Fan-out ===
+
+DEFAULT_AGENT_TIMEOUT = float(os.getenv("AGENT_TIMEOUT", "120"))
+AGENT_TIMEOUTS = {
+    "snowflake": float(os.getenv("SNOWFLAKE_AGENT_TIMEOUT", DEFAULT_AGENT_TIMEOUT)),
+    "rag": float(os.getenv("RAG_AGENT_TIMEOUT", "300")),
+    "clinical_trials": float(os.getenv("WEB_AGENT_TIMEOUT", "60")),
+    "funding": float(os.getenv("WEB_AGENT_TIMEOUT", "60")),
+    "hospitals": float(os.getenv("WEB_AGENT_TIMEOUT", "60")),
+}
+
+# Shared pool bridging the blocking agent clients (Snowflake, boto3, requests) onto the event loop
+AGENT_EXECUTOR = ThreadPoolExecutor(
+    max_workers=int(os.getenv("AGENT_MAX_WORKERS", "16")),
+    thread_name_prefix="agent",
+)
+
+# Concurrent reports asking an agent the same thing share one call
+AGENT_FLIGHTS = SingleFlight()
+
+async def _call_agent(func, *args) -> Any:
+    if asyncio.iscoroutinefunction(func):
+        return await func(*args)
+    return await asyncio.get_running_loop().run_in_executor(AGENT_EXECUTOR, functools.partial(func, *args))
+
+async def run_agent(name: str, func, *args, fallback: Any = None, timeout: float = None) -> Any:
+    """Run one agent call with its own timeout: coroutine functions are awaited on
+    the event loop, blocking ones run in the thread pool.
+
+    Failures and timeouts are logged and replaced by ``fallback`` so one slow or
+    broken backend never sinks the whole report.
+    """
+    timeout = timeout or AGENT_TIMEOUTS.get(name, DEFAULT_AGENT_TIMEOUT)
+    start = time.time()
+    try:
+        call = AGENT_FLIGHTS.do(f"{name}:{args!r}", _call_agent, func, *args)
+        result = await asyncio.wait_for(call, timeout=timeout)
+        logger.info(f"Agent '{name}' finished in {time.time() - start:.2f}s")
+        return result
+    except asyncio.TimeoutError:
+        logger.warning(f"Agent '{name}' timed out after {timeout:.0f}s, using fallback")
+    except Exception as e:
+        logger.exception(f"Agent '{name}' failed: {e}")
+    return fallback
+
+async def fan_out(calls: Dict[str, tuple], emit=None) -> Dict[str, Any]:
+    """Start every agent call at once; ``calls`` maps name -> (func, args, fallback).
+
+    ``emit`` (optional async callback) receives an ``agent`` progress event as each call finishes.
+    """
+    start = time.time()
+    names = list(calls)
+
+    async def tracked(name, func, args, fallback):
+        result = await run_agent(name, func, *args, fallback=fallback)
+        if emit is not None:
+            status = "failed" if result is fallback else "done"
+            await emit({"event": "agent", "name": name, "status": status, "elapsed": round(time.time() - start, 2)})
+        return result
+
+    results = await asyncio.gather(*[
+        tracked(name, func, args, fallback)
+        for name, (func, args, fallback) in calls.items()
+    ])
+    logger.info(f"Agent fan-out finished in {time.time() - start:.2f}s")
+    return dict(zip(names, results))
+
+def chunk_text(text, max_tokens=CHUNK_TOKENS, overlap_tokens=0):
+    """Token-budgeted chunks that end on sentence boundaries and start new chunks at headings."""
+    return token_chunks(text, max_tokens, overlap_tokens)
+
+# === Summarisation ===
+
+SUMMARY_CONCURRENCY = int(os.getenv("SUMMARY_CONCURRENCY", "4"))
+# Map step chunk size (~1000 words) and the RAG text chunks ranked against the query (~500 words)
+SUMMARY_CHUNK_TOKENS = int(os.getenv("SUMMARY_CHUNK_TOKENS", "1300"))
+RAG_CONTEXT_CHUNK_TOKENS = int(os.getenv("RAG_CONTEXT_CHUNK_TOKENS", "650"))
+RAG_CONTEXT_OVERLAP_TOKENS = int(os.getenv("RAG_CONTEXT_OVERLAP_TOKENS", "50"))
+# Distinct, most query-relevant web results per category passed on to summarisation
+WEB_TOP_N = int(os.getenv("WEB_TOP_N", "3"))
+
+async def summarize_text(llm: CachedProvider, text, section_label, max_words=1000, max_recursion=1, depth=0, semaphore=None):
+    """Map-reduce summary: chunks are summarised concurrently (bounded by ``semaphore``), then joined.
+
+    Text under ``max_words`` is returned as-is, and the joined summaries are
+    re-summarised at most ``max_recursion`` times.
+    """
     if len(text.split()) < max_words or depth >= max_recursion:
         return text
-    chunks = chunk_text(text, max_words)
-    summaries = []
-    for chunk in chunks:
+    semaphore = semaphore or asyncio.Semaphore(SUMMARY_CONCURRENCY)
+
+    async def summarize_chunk(chunk):
         prompt = f"Summarize this {section_label} section for an oncology report:\n{chunk}"
-        while True:
+        async with semaphore:
             try:
-                summary = chat.send_message(prompt).text
-                break
+                # The same snippets recur across reports; near-identical ones may reuse a summary
+                return await llm.generate(prompt, semantic=True)
             except Exception as e:
-                if "RESOURCE_EXHAUSTED" in str(e) or "429" in str(e):
-                    logger.warning("Hit Gemini quota/rate limit, sleeping for 60s before retry...")
-                    time.sleep(60)
-                else:
-                    logger.exception(f"Unexpected LLM error: {e}")
-                    summary = "Summarization failed."
-                    break
-        summaries.append(summary)
+                logger.exception(f"Unexpected LLM error: {e}")
+                return "Summarization failed."
+
+    summaries = await asyncio.gather(*[summarize_chunk(chunk) for chunk in chunk_text(text, SUMMARY_CHUNK_TOKENS)])
     joined = "\n".join(summaries)
     if len(joined.split()) > max_words and depth < max_recursion:
         # Only one recursive summarization allowed!
-        return summarize_text(chat, joined, section_label, max_words, max_recursion, depth+1)
+        return await summarize_text(llm, joined, section_label, max_words, max_recursion, depth+1, semaphore)
     return joined
 
 def format_top(json_list, keys, label, n=3):
     return "\n\n".join([
-        "\n".join([f"{k.capitalize()}: {item.get(k, '')}" for k in keys if k in item])
+        # Fields the extractor couldn't find (None / empty) are left out rather than printed as blanks
+        "\n".join([f"{k.capitalize()}: {item[k]}" for k in keys if item.get(k) not in (None, "", [])])
         for item in json_list[:n]
     ]) or f"No {label} found."
 
 
-class CancerResearchMCP:
-    def __init__(self):
-        self.snowflake_agent = SnowflakeAgent()
-        self.web_agent = WebAgent()
-
-    async def run(self, query: str) -> Dict[str, Any]:
-        try:
-            # === Fetch Data from Each Agent ===
-            snowflake_data = self.snowflake_agent.get_cancer_statistics()
-            if isinstance(snowflake_data, list):
-                snowflake_df = pd.DataFrame(snowflake_data)
-            elif isinstance(snowflake_data, dict):
-                snowflake_df = pd.DataFrame([snowflake_data])
-            else:
-                snowflake_df = pd.DataFrame()
-
-            rag_summary = await get_rag_response(query)
-            clinical_trials = self.web_agent.get_clinical_trials(query)
-            funding = self.web_agent.get_funding_opportunities(query)
-            hospitals = self.web_agent.get_hospitals_by_location(query)
-
-            gemini_key = os.getenv("GEMINI_API_KEY")
-            client = genai.Client(api_key=gemini_key)
-            chat = client.chats.create(model="gemini-2.0-flash-001")
-
-            # === Build Hybrid Context with Reduced Gemini Usage ===
-
-            # 1. Snowflake (Tabular)
-            try:
-                summary = snowflake_df.describe(include="all").to_string()
-                try:
-                    top_rows = snowflake_df.head(5).to_markdown(index=False)
-                except ImportError:
-                    top_rows = snowflake_df.head(5).to_string(index=False)
-                snowflake_section = f"{summary}\n\nTop rows:\n{top_rows}"
-                # Only summarize if very large!
-                snowflake_short = summarize_text(chat, snowflake_section, "Epidemiology Table", max_words=1000)
-            except Exception as e:
-                snowflake_short = f"Could not process table: {e}"
-
-            # 2. RAG (Unstructured)
-            rag_chunks = chunk_text(rag_summary, max_words=500)
-            chunk_embeddings = get_embeddings(rag_chunks)
-            query_embedding = get_embeddings([query])[0]
-            sims = cosine_similarity(chunk_embeddings, query_embedding)
-            top_idx = sims.argsort()[::-1][:3]
-            rag_relevant = "\n\n".join([rag_chunks[i] for i in top_idx])
-            rag_short = summarize_text(chat, rag_relevant, "Literature Summary", max_words=1000)
-
-            # 3. Web Agent Data (JSON)
-            clinical_str = format_top(clinical_trials, ["title", "description", "phase", "status", "source_url"], "Clinical Trials")
-            clinical_short = summarize_text(chat, clinical_str, "Clinical Trials", max_words=1000)
-
-            funding_str = format_top(funding, ["title", "description", "source_url"], "Funding")
-            funding_short = summarize_text(chat, funding_str, "Funding", max_words=1000)
-
-            hospital_str = format_top(hospitals, ["name", "address", "rating", "source_url"], "Hospitals")
-            hospital_short = summarize_text(chat, hospital_str, "Hospitals", max_words=1000)
-
-            context = f"""
-=== EPIDEMIOLOGY SUMMARY ===
-{snowflake_short}
+# === Report Prompt ===
 
-=== LITERATURE SUMMARY (RAG) ===
-{rag_short}
-
-=== CLINICAL TRIALS (Top 3) ===
-{clinical_short}
-
-=== FUNDING (Top 3) ===
-{funding_short}
-
-=== HOSPITALS (Top 3) ===
-{hospital_short}
-"""
-
-            logger.info("\n===== SNOWFLAKE DATA =====\n%s", snowflake_short)
-            # logger.info("\n===== RAG DATA =====\n%s", rag_short)
-            # logger.info("\n===== CLINICAL TRIALS DATA =====\n%s", clinical_short)
-            # logger.info("\n===== FUNDING DATA =====\n%s", funding_short)
-            # logger.info("\n===== HOSPITALS DATA =====\n%s", hospital_short)
-
-            today = datetime.date.today().isoformat()
-            prompt = f"""
+# Static instructions; the token-budgeted data block is appended after "All Available Data"
+REPORT_PROMPT = """
 You are an AI-powered Cancer Research Assistant tasked with producing an exceptionally comprehensive, peer-reviewed style oncology report. Use Markdown headings and tables. Use formal academic English, adopt “we” to describe analyses, and target each main section at 300–500 words. Include numbered lists, detailed figures, and exhaustive bullet summaries. For each Results section, cite numeric values and sources directly from the context below.
 
 EXECUTIVE SUMMARY:
@@ -726,21 +723,182 @@ APPENDICES:
 {query}
 
 **All Available Data:**
-{context}
 """
 
-            logger.info("Prompt size: %d words", len(prompt.split()))
+# === Report Cache ===
+
+REPORT_CACHE_TTL = float(os.getenv("REPORT_CACHE_TTL", str(6 * 3600)))
+REPORT_CACHE_ITEMS = int(os.getenv("REPORT_CACHE_ITEMS", "200"))
+REPORT_CACHE_DISK = os.getenv("REPORT_CACHE_DISK", "false").lower() in ("1", "true", "yes")
+
+def normalize_query(query: str) -> str:
+    """Case, punctuation and spacing don't change the report a query gets."""
+    return " ".join(re.sub(r"[^\w\s-]", " ", query.lower()).split())
+
+class CancerResearchMCP:
+    def __init__(self):
+        # Agents raise on failure so run_agent substitutes the fallback and the report isn't cached
+        self.snowflake_agent = SnowflakeAgent(raise_errors=True)
+        self.web_agent = AsyncWebAgent(raise_errors=True)
+        self.llm = get_cached_provider(REPORT_LLM_PROVIDER)
+        self._flights = SingleFlight()
+        self.report_cache = MemoryLRUCache(max_items=REPORT_CACHE_ITEMS, ttl=REPORT_CACHE_TTL)
+        self.report_disk = DiskLRUCache(cache_path("reports.sqlite")) if REPORT_CACHE_DISK else None
+
+    async def run(self, query: str) -> Dict[str, Any]:
+        tokens = []
+        async for event in self.run_stream(query):
+            if event["event"] == "token":
+                tokens.append(event["text"])
+            elif event["event"] == "error":
+                return {"report": event["message"]}
+        return {"report": "".join(tokens)}
+
+    def data_version(self) -> str:
+        """Version of the data a report is built from: the local epidemiology snapshot and RAG index."""
+        store = getattr(self.snowflake_agent, "store", None)
+        epi = store.version if store is not None else "live"
+        return f"{epi}|{read_manifest().get('created', 'none')}"
+
+    def _cached_report(self, key: str):
+        report = self.report_cache.get(key)
+        if report is None and self.report_disk is not None:
+            raw = self.report_disk.get(key)
+            if raw is not None:
+                report = raw.decode("utf-8")
+                self.report_cache.set(key, report)
+        return report
+
+    def _store_report(self, key: str, report: str) -> None:
+        self.report_cache.set(key, report)
+        if self.report_disk is not None:
+            self.report_disk.set(key, report.encode("utf-8"), ttl=REPORT_CACHE_TTL)
+
+    async def run_stream(self, query: str):
+        """Async generator of report events: ``stage`` and ``agent`` progress, then ``token``
+        chunks of the report as the LLM produces them, ending with ``done`` or ``error``.
+
+        Finished reports are cached per normalised query and data version, and concurrent
+        requests for the same report share one pipeline run. The run is cancelled only
+        once every client has gone away. A report built while an agent failed or timed out
+        is served to the requests sharing its run but not cached.
+        """
+        key = f"{normalize_query(query)}@{self.data_version()}"
+        cached = self._cached_report(key)
+        if cached is not None:
+            logger.info(f"Serving cached report for: {query}")
+            yield {"event": "stage", "stage": "cached"}
+            yield {"event": "token", "text": cached}
+            yield {"event": "done"}
+            return
+
+        async def produce(emit):
+            tokens, failed = [], []
+
+            async def record(event):
+                if event["event"] == "token":
+                    tokens.append(event["text"])
+                elif event["event"] == "agent" and event["status"] != "done":
+                    failed.append(event["name"])
+                elif event["event"] == "done":
+                    if failed:
+                        logger.warning(f"Not caching report for '{query}': agents used fallbacks ({', '.join(failed)})")
+                    else:
+                        self._store_report(key, "".join(tokens))
+                await emit(event)
+
+            await self._generate(query, record)
+
+        async for event in self._flights.stream(key, produce):
+            yield event
+
+    async def _generate(self, query: str, emit) -> None:
+        try:
+            # === Fetch Data from Each Agent (concurrently) ===
+            await emit({"event": "stage", "stage": "agents"})
+            agent_results = await fan_out({
+                "snowflake": (self.snowflake_agent.get_cancer_statistics, (query, True), {}),
+                "rag": (get_rag_response, (query,), "No documents found for the query."),
+                "clinical_trials": (self.web_agent.get_clinical_trials, (query,), []),
+                "funding": (self.web_agent.get_funding_opportunities, (query,), []),
+                "hospitals": (self.web_agent.get_hospitals_by_location, (query,), []),
+            }, emit=emit)
+            snowflake_data = agent_results["snowflake"]
+            rag_summary = agent_results["rag"]
+            clinical_trials = agent_results["clinical_trials"]
+            funding = agent_results["funding"]
+            hospitals = agent_results["hospitals"]
+
+            llm = self.llm
+            semaphore = asyncio.Semaphore(SUMMARY_CONCURRENCY)
+
+            # === Build Hybrid Context with Reduced Gemini Usage (sections in parallel) ===
+            await emit({"event": "stage", "stage": "summaries"})
+
+            # 1. Snowflake (Tabular): exact rates computed with pandas, no LLM call
+            async def epidemiology_section():
+                loop = asyncio.get_running_loop()
+                return await loop.run_in_executor(AGENT_EXECUTOR, summarize_epidemiology, snowflake_data)
+
+            # 2. RAG (Unstructured)
+            async def literature_section():
+                rag_chunks = chunk_text(rag_summary, RAG_CONTEXT_CHUNK_TOKENS, RAG_CONTEXT_OVERLAP_TOKENS)
+                # One request for the chunks and the query together, off the event loop
+                loop = asyncio.get_running_loop()
+                embeddings = await loop.run_in_executor(AGENT_EXECUTOR, get_embeddings, rag_chunks + [query])
+                chunk_embeddings, query_embedding = embeddings[:-1], embeddings[-1]
+                top_idx, _ = ExactIndex(chunk_embeddings).search(query_embedding, 3)
+                rag_relevant = "\n\n".join([rag_chunks[i] for i in top_idx])
+                return await summarize_text(llm, rag_relevant, "Literature Summary", max_words=1000, semaphore=semaphore)
+
+            # 3. Web Agent Data (JSON): duplicates dropped and reranked against the query first
+            loop = asyncio.get_running_loop()
+            web = await loop.run_in_executor(AGENT_EXECUTOR, select_web_results, query, {
+                "clinical_trials": clinical_trials, "funding": funding, "hospitals": hospitals,
+            }, WEB_TOP_N)
+            clinical_str = format_top(web["clinical_trials"], ["title", "description", "phase", "status", "nct_ids", "enrollment", "source_url"], "Clinical Trials", n=WEB_TOP_N)
+            funding_str = format_top(web["funding"], ["title", "description", "source_url"], "Funding", n=WEB_TOP_N)
+            hospital_str = format_top(web["hospitals"], ["name", "address", "rating", "source_url"], "Hospitals", n=WEB_TOP_N)
+
+            snowflake_short, rag_short, clinical_short, funding_short, hospital_short = await asyncio.gather(
+                epidemiology_section(),
+                literature_section(),
+                summarize_text(llm, clinical_str, "Clinical Trials", max_words=1000, semaphore=semaphore),
+                summarize_text(llm, funding_str, "Funding", max_words=1000, semaphore=semaphore),
+                summarize_text(llm, hospital_str, "Hospitals", max_words=1000, semaphore=semaphore),
+            )
+
+            logger.info("\n===== SNOWFLAKE DATA =====\n%s", snowflake_short)
+
+            # === Fit the data into the prompt's token budget, least relevant content first ===
+            instructions = REPORT_PROMPT.format(today=datetime.date.today().isoformat(), query=query)
+            assembled = assemble_context(query, [
+                Section("epidemiology", "EPIDEMIOLOGY SUMMARY", snowflake_short),
+                Section("literature", "LITERATURE SUMMARY (RAG)", rag_short),
+                Section("clinical_trials", f"CLINICAL TRIALS (Top {WEB_TOP_N})", clinical_short),
+                Section("funding", f"FUNDING (Top {WEB_TOP_N})", funding_short),
+                Section("hospitals", f"HOSPITALS (Top {WEB_TOP_N})", hospital_short),
+            ], instructions)
+            prompt = instructions + assembled.text
+
+            logger.info(f"Report prompt: {assembled.summary()}")
+            await emit({"event": "context", "prompt_tokens": assembled.prompt_tokens, "sections": assembled.sections})
+            await emit({"event": "stage", "stage": "report"})
             try:
-                response = chat.send_message(prompt)
+                # Exact matches only: the query is a small part of the prompt, so its embedding barely moves with it
+                async for text in llm.stream(prompt):
+                    await emit({"event": "token", "text": text})
             except Exception as e:
-                if "RESOURCE_EXHAUSTED" in str(e) or "429" in str(e):
-                    logger.warning("Gemini API quota exceeded or rate limit hit. Ask user to try again later.")
-                    return {"report": "Gemini API quota exceeded, please wait and try again in a minute."}
+                if is_rate_limit_error(e):
+                    logger.warning(f"{llm.label} API quota exceeded or rate limit hit. Ask user to try again later.")
+                    await emit({"event": "error", "message": f"{llm.label} API quota exceeded, please wait and try again in a minute."})
+                    return
                 logger.exception("LLM call failed")
-                return {"report": f"Error generating report: {str(e)}"}
+                await emit({"event": "error", "message": f"Error generating report: {str(e)}"})
+                return
 
-            return {"report": response.text}
+            await emit({"event": "done"})
 
         except Exception as e:
             logger.exception("Error during full report generation")
-            return {"report": f"Error generating report: {str(e)}"}
+            await emit({"event": "error", "message": f"Error generating report: {str(e)}"})